@@ -0,0 +1,221 @@
+# Description: Admission control and backpressure for the MJPEG streaming server
+# - MemoryBudget: one byte budget shared by the frame buffers and queues (viewer frame cache,
+#   /predict queue, event pre-buffer); whoever cannot reserve drops or rejects instead of growing
+# - ViewerHub: at most max_viewers /video_feed clients. The producer only swaps in the newest
+#   JPEG (never waits for viewers). Every client streams drop-to-latest with a small socket send
+#   buffer, and a client whose writes take longer than its frame interval is moved down a
+#   ladder of lower frame rates and then half resolution; it moves back up once it keeps up.
+#   When the server is busy (more than shed_viewers clients) new clients start one level down.
+#   With a frame_trace.Tracer every socket write is stamped and can carry an X-Frame-Trace header.
+# Viewers are always shed before anything that slows the detection loop.
+
+import socket
+import threading
+import time
+
+import cv2
+
+# (scale, fps divisor) per quality level, 0 = full resolution at the producer rate
+LEVELS = [(1.0, 1), (1.0, 2), (0.5, 2), (0.5, 4)]
+
+
+class MemoryBudget:
+    """Byte budget shared by frame pools and queues (limit 0 = unlimited)."""
+
+    def __init__(self, limit_bytes=0):
+        self.limit = int(limit_bytes)
+        self.used = 0
+        self.peak = 0
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        with self._lock:
+            if self.limit and self.used + nbytes > self.limit:
+                self.refused += 1
+                return False
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+            return True
+
+    def release(self, nbytes):
+        with self._lock:
+            self.used = max(0, self.used - nbytes)
+
+    def snapshot(self):
+        with self._lock:
+            return {"limit_mb": round(self.limit / 1e6, 1), "used_mb": round(self.used / 1e6, 2),
+                    "peak_mb": round(self.peak / 1e6, 2), "refused": self.refused}
+
+
+class ViewerHub:
+    """Latest-frame fan-out to a bounded number of adaptive MJPEG viewers."""
+
+    def __init__(self, max_viewers=8, shed_viewers=4, send_buffer=256 * 1024, budget=None, quality=80,
+                 tracer=None):
+        self.max_viewers = max_viewers
+        self.shed_viewers = shed_viewers
+        self.send_buffer = send_buffer
+        self.budget = budget or MemoryBudget()
+        self.quality = quality
+        self.tracer = tracer
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._jpeg = None
+        self._frame = None        # annotated BGR frame, only kept while someone needs half size
+        self._trace = None        # FrameTrace of the current frame
+        self._small = (0, None)   # (seq, jpeg) cache of the half-size variant
+        self._small_lock = threading.Lock()  # guards _small only, never held while encoding
+        self._reserved = 0
+        self._viewers = {}
+        self._next_id = 0
+        self.rejected = 0
+        self.stopped = False
+
+    # --- producer side ----------------------------------------------------------------------
+
+    def wants_frame(self):
+        """True if some viewer is on a reduced-resolution level (publish() needs the BGR frame)."""
+        return any(v["level"] >= 2 for v in list(self._viewers.values()))
+
+    def publish(self, jpeg, frame=None, seq=None, trace=None):
+        """Swap in the newest frame (seq: the producer's frame number). O(1), never blocks on viewers."""
+        keep = frame if frame is not None and self.wants_frame() else None
+        nbytes = len(jpeg) + (keep.nbytes if keep is not None else 0)
+        with self._cond:
+            self.budget.release(self._reserved)
+            self._reserved = 0  # only what was actually reserved is released next time
+            if self.budget.reserve(nbytes):
+                self._reserved = nbytes
+            else:
+                # the full JPEG alone is always kept, counted only if it still fits
+                keep = None
+                if nbytes != len(jpeg) and self.budget.reserve(len(jpeg)):
+                    self._reserved = len(jpeg)
+            self._seq = self._seq + 1 if seq is None else seq
+            self._jpeg = jpeg
+            self._frame = keep
+            self._trace = trace
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self.stopped = True
+            self._cond.notify_all()
+
+    def latest(self, after=None, timeout=0.0):
+        """(seq, jpeg) of the newest frame; with `after`, wait up to timeout for a newer one."""
+        with self._cond:
+            if after is not None:
+                self._cond.wait_for(lambda: self._seq > after or self.stopped, timeout)
+            return self._seq, self._jpeg
+
+    # --- viewer side ------------------------------------------------------------------------
+
+    def admit(self, environ=None):
+        """Register a viewer or return None when max_viewers are already streaming.
+
+        The slot is freed when stream() ends or by release(); a response whose body is never
+        iterated (HEAD, client gone before the first chunk) must call release() on close.
+        """
+        with self._cond:
+            if len(self._viewers) >= self.max_viewers:
+                self.rejected += 1
+                return None
+            self._next_id += 1
+            vid = self._next_id
+            level = 1 if len(self._viewers) >= self.shed_viewers else 0
+            self._viewers[vid] = {"level": level, "sent": 0, "skipped": 0, "slow": 0, "fast": 0,
+                                  "since": time.time()}
+        sock = (environ or {}).get("werkzeug.socket")
+        if sock is not None and self.send_buffer:
+            try:
+                # small kernel buffer: a slow client blocks our write instead of queueing frames
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+            except OSError:
+                pass
+        return vid
+
+    def _small_jpeg(self, seq, frame, jpeg):
+        """Half-size JPEG of frame `seq`, encoded outside _cond so publish() never waits on it."""
+        with self._small_lock:
+            cached_seq, cached = self._small
+        if cached_seq == seq:
+            return cached
+        if frame is None:
+            return jpeg
+        small = cv2.resize(frame, (frame.shape[1] // 2, frame.shape[0] // 2), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode('.jpg', small, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        out = buf.tobytes() if ok else jpeg
+        with self._small_lock:
+            if seq > self._small[0]:
+                self._small = (seq, out)
+        return out
+
+    def _adapt(self, v, write_s, interval):
+        if write_s > interval:
+            v["slow"] += 1
+            v["fast"] = 0
+            if v["slow"] >= 3 and v["level"] < len(LEVELS) - 1:
+                v["level"] += 1
+                v["slow"] = 0
+        elif write_s < 0.3 * interval:
+            v["fast"] += 1
+            v["slow"] = 0
+            busy = len(self._viewers) > self.shed_viewers
+            if v["fast"] >= 50 and v["level"] > (1 if busy else 0):
+                v["level"] -= 1
+                v["fast"] = 0
+
+    def release(self, vid):
+        """Free the slot of an admitted viewer (idempotent)."""
+        with self._cond:
+            self._viewers.pop(vid, None)
+
+    def stream(self, vid, boundary=b'--frame\r\nContent-Type: image/jpeg\r\n\r\n', base_fps=30.0):
+        """Multipart generator for one admitted viewer: newest frame only, adaptive level."""
+        v = self._viewers.get(vid)
+        if v is None:
+            return  # already released
+        last_seq = 0
+        next_due = 0.0
+        try:
+            while True:
+                with self._cond:
+                    while self._seq == last_seq and not self.stopped:
+                        self._cond.wait(1.0)
+                    if self.stopped:
+                        return
+                    seq, jpeg, frame, trace = self._seq, self._jpeg, self._frame, self._trace
+                v["skipped"] += max(0, seq - last_seq - 1)
+                last_seq = seq
+                scale, divisor = LEVELS[v["level"]]
+                interval = divisor / base_fps
+                now = time.monotonic()
+                if now < next_due:
+                    time.sleep(next_due - now)
+                    continue  # a newer frame is probably there by now
+                if scale < 1.0:
+                    jpeg = self._small_jpeg(seq, frame, jpeg)
+                part = boundary
+                if self.tracer is not None and self.tracer.headers:
+                    part = boundary[:-2] + self.tracer.part_header(trace) + b'\r\n'
+                t0 = time.monotonic()
+                yield part + jpeg + b'\r\n'
+                t1 = time.monotonic()
+                write_s = t1 - t0
+                if self.tracer is not None:
+                    self.tracer.delivered(trace, vid, t0, t1)
+                v["sent"] += 1
+                next_due = t0 + interval
+                self._adapt(v, write_s, interval)
+        finally:
+            self.release(vid)
+
+    def snapshot(self):
+        with self._cond:
+            viewers = [{"id": k, "level": v["level"], "scale": LEVELS[v["level"]][0],
+                        "fps_divisor": LEVELS[v["level"]][1], "sent": v["sent"], "skipped": v["skipped"],
+                        "connected_s": round(time.time() - v["since"], 1)} for k, v in self._viewers.items()]
+        return {"viewers": viewers, "max_viewers": self.max_viewers, "shed_viewers": self.shed_viewers,
+                "rejected": self.rejected, "memory": self.budget.snapshot()}
@@ -0,0 +1,106 @@
+# Description: Lightweight one-pass annotator
+# Replaces r.plot() followed by manual cv2.putText calls. Everything (boxes, labels, FPS box,
+# detection list) is drawn in one pass from the compact xyxy/conf/cls(/id) arrays.
+# Label images are rendered once per (class, confidence bucket) and pasted afterwards, and the
+# frame can be drawn at the client's display width instead of the full camera resolution.
+
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def class_colors(n=256):
+    """Deterministic, reasonably saturated BGR colour per class id."""
+    hues = (np.arange(n) * 47) % 180
+    hsv = np.stack([hues, np.full(n, 200), np.full(n, 255)], axis=1).astype(np.uint8)[None]
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0]
+
+
+COLORS = class_colors()
+
+
+class Annotator:
+    """Draw detections, FPS and text lines on a frame from NumPy detection arrays."""
+
+    def __init__(self, names, font_scale=0.5, thickness=1, conf_step=0.05, max_cache=4096):
+        self.names = names
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.conf_step = conf_step
+        self.max_cache = max_cache
+        self._glyphs = OrderedDict()
+
+    def _glyph(self, text, fg, bg, scale, thickness):
+        """Rendered text image with background, cached by content (LRU)."""
+        key = (text, fg, bg, scale, thickness)
+        img = self._glyphs.get(key)
+        if img is not None:
+            self._glyphs.move_to_end(key)
+            return img
+        (tw, th), base = cv2.getTextSize(text, FONT, scale, thickness)
+        img = np.empty((th + base + 4, tw + 4, 3), dtype=np.uint8)
+        img[:] = bg
+        cv2.putText(img, text, (2, th + 2), FONT, scale, fg, thickness, cv2.LINE_AA)
+        self._glyphs[key] = img
+        if len(self._glyphs) > self.max_cache:
+            self._glyphs.popitem(last=False)
+        return img
+
+    def label_glyph(self, cls_id, conf, track_id=None):
+        """Label image for a class and confidence bucket (e.g. 'cup 0.85')."""
+        bucket = int(conf / self.conf_step) * self.conf_step
+        text = f"{self.names.get(int(cls_id), cls_id)} {bucket:.2f}"
+        if track_id is not None:
+            text = f"#{int(track_id)} {text}"
+        color = tuple(int(c) for c in COLORS[int(cls_id) % len(COLORS)])
+        return self._glyph(text, (255, 255, 255), color, self.font_scale, self.thickness)
+
+    @staticmethod
+    def _paste(frame, img, x, y):
+        h, w = frame.shape[:2]
+        gh, gw = img.shape[:2]
+        x = min(max(0, x), max(0, w - gw))
+        y = min(max(0, y), max(0, h - gh))
+        gh, gw = min(gh, h - y), min(gw, w - x)
+        frame[y:y + gh, x:x + gw] = img[:gh, :gw]
+
+    def draw(self, frame, dets=None, fps=None, lines=(), out_width=None, regions=()):
+        """Annotate frame in one pass and return it.
+
+        out_width: draw at this display width (the frame is downscaled first, boxes are scaled),
+        otherwise the frame is annotated in place at source resolution.
+        regions: optional (x1, y1, x2, y2) inference regions (ROI / tiles) to outline.
+        """
+        scale = 1.0
+        if out_width and out_width < frame.shape[1]:
+            scale = out_width / frame.shape[1]
+            frame = cv2.resize(frame, (out_width, int(round(frame.shape[0] * scale))), interpolation=cv2.INTER_LINEAR)
+
+        for x1, y1, x2, y2 in regions:
+            cv2.rectangle(frame, (int(x1 * scale), int(y1 * scale)), (int(x2 * scale) - 1, int(y2 * scale) - 1),
+                          (255, 128, 0), 1)
+
+        if dets is not None and len(dets["conf"]):
+            boxes = np.round(np.asarray(dets["xyxy"]) * scale).astype(np.int32)
+            ids = dets.get("id")
+            thick = max(1, int(round(2 * max(scale, 0.5))))
+            for i, (x1, y1, x2, y2) in enumerate(boxes):
+                k = int(dets["cls"][i])
+                color = tuple(int(c) for c in COLORS[k % len(COLORS)])
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, thick)
+                glyph = self.label_glyph(k, float(dets["conf"][i]), None if ids is None else ids[i])
+                self._paste(frame, glyph, x1, y1 - glyph.shape[0])
+
+        if fps is not None:
+            glyph = self._glyph(f"FPS: {fps:.1f}", (0, 255, 0), (0, 0, 0), 0.9, 2)
+            self._paste(frame, glyph, 8, 8)
+
+        y = 60
+        for text in lines:
+            glyph = self._glyph(text, (0, 0, 170), (255, 255, 255), 0.5, 1)
+            self._paste(frame, glyph, 20, y - glyph.shape[0])
+            y += glyph.shape[0] + 6
+        return frame
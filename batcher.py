@@ -0,0 +1,128 @@
+# Description: Dynamic micro-batching for the /predict endpoint
+# Request threads submit one image each and block on a Future. A single worker thread owns
+# the model: it takes the first waiting request, keeps collecting until max_batch requests
+# are queued or max_wait_ms has passed, runs them as one batch and resolves every Future.
+# Under load batches fill up and throughput rises; a lone request waits at most max_wait_ms.
+# With an admission.MemoryBudget, queued images count against it and requests that do not fit
+# are rejected like a full queue.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+
+class Overloaded(Exception):
+    """The request queue is full; callers should answer 503."""
+
+
+class MicroBatcher:
+    """Gather single-item calls into batches for fn(list_of_items) -> list_of_results."""
+
+    def __init__(self, fn, max_batch=8, max_wait_ms=10.0, max_queue=256, budget=None):
+        self.fn = fn
+        self.budget = budget
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "rejected": 0, "errors": 0, "sizes": {}}
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue one item, return a Future resolving to (result, info dict)."""
+        fut = Future()
+        nbytes = getattr(item, "nbytes", 0)
+        if self.budget is not None and not self.budget.reserve(nbytes):
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise Overloaded("memory budget exhausted")
+        try:
+            self._queue.put_nowait((time.perf_counter(), item, fut))
+        except queue.Full:
+            if self.budget is not None:
+                self.budget.release(nbytes)
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise Overloaded(f"{self._queue.qsize()} requests waiting")
+        return fut
+
+    def __call__(self, item, timeout=30.0):
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            t0 = time.perf_counter()
+            try:
+                results = self.fn([item for _, item, _ in batch])
+            except Exception as e:
+                self._release(batch)
+                with self._lock:
+                    self.stats["errors"] += len(batch)
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            t1 = time.perf_counter()
+            self._release(batch)
+            n = len(batch)
+            with self._lock:
+                self.stats["requests"] += n
+                self.stats["batches"] += 1
+                self.stats["sizes"][n] = self.stats["sizes"].get(n, 0) + 1
+            for (queued, _, fut), result in zip(batch, results):
+                fut.set_result((result, {"batch_size": n, "queue_ms": round((t0 - queued) * 1000.0, 2),
+                                         "batch_ms": round((t1 - t0) * 1000.0, 2)}))
+
+    def _release(self, batch):
+        if self.budget is not None:
+            self.budget.release(sum(getattr(item, "nbytes", 0) for _, item, _ in batch))
+
+    def snapshot(self):
+        with self._lock:
+            st = dict(self.stats, sizes=dict(self.stats["sizes"]))
+        st["queued"] = self._queue.qsize()
+        st["mean_batch"] = round(st["requests"] / st["batches"], 2) if st["batches"] else 0.0
+        st["max_batch"] = self.max_batch
+        st["max_wait_ms"] = self.max_wait * 1000.0
+        return st
+
+
+def decode_upload(data, content_type="", shape=None, dtype="uint8"):
+    """Image from request bytes: JPEG/PNG, a .npy array, or a raw array with an explicit shape."""
+    if shape:
+        img = np.frombuffer(data, dtype=dtype).reshape(shape)
+    elif content_type.startswith("application/x-npy") or data[:6] == b"\x93NUMPY":
+        import io
+        try:
+            img = np.load(io.BytesIO(data), allow_pickle=False)
+        except (OSError, EOFError) as e:
+            raise ValueError(f"cannot read .npy array: {e}")
+    else:
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("cannot decode image (expected JPEG/PNG, .npy or raw bytes with ?shape=h,w,3)")
+        return img
+    # raw arrays: BGR uint8 like cv2.imread, grey and BGRA are converted
+    if img.dtype != np.uint8:
+        raise ValueError(f"array dtype must be uint8, got {img.dtype}")
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    if img.ndim != 3 or img.shape[2] not in (3, 4):
+        raise ValueError(f"array shape must be (h, w), (h, w, 3) or (h, w, 4), got {img.shape}")
+    return img if img.shape[2] == 3 else cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
@@ -0,0 +1,490 @@
+# Description: Benchmark harness for the pieces of the streaming pipeline
+# Each subcommand times one stage in isolation and prints a small table (ms per call).
+#
+#   python /app/benchmark.py annotate --image /app/test_image.jpg --detections 20
+#   python /app/benchmark.py capture --samples /results/samples [--live]
+#   python /app/benchmark.py source 0 synthetic:1920x1080@30 "gst:..." --frames 300
+#   python /app/benchmark.py predict --model /app/yolov8n.engine --imgsz 320
+#   python /app/benchmark.py batch /data/stills --batches 1,4,8,16
+#   python /app/benchmark.py load --url http://localhost:5001/predict --concurrency 1,4,16
+#   python /app/benchmark.py live --source synthetic:1280x720@30 --seconds 10
+#   python /app/benchmark.py filter --classes cup,person --detections 100
+
+import argparse
+import itertools
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+def timeit(fn, runs=100, warmup=5):
+    """Call fn() runs times after warmup, return per-call stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(runs)
+    for i in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = (time.perf_counter() - t0) * 1000.0
+    return {
+        "mean": float(samples.mean()),
+        "p50": float(np.percentile(samples, 50)),
+        "p95": float(np.percentile(samples, 95)),
+    }
+
+
+def print_table(title, rows):
+    """rows: list of (name, stats dict) pairs."""
+    print(f"\n=== {title} ===")
+    print(f"{'case':<40} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max fps':>9}")
+    for name, st in rows:
+        fps = 1000.0 / st['mean'] if st['mean'] > 0 else float('inf')
+        print(f"{name:<40} {st['mean']:>9.2f} {st['p50']:>9.2f} {st['p95']:>9.2f} {fps:>9.1f}")
+
+
+def load_image(path, width):
+    img = cv2.imread(path)
+    if img is None:
+        print(f"Cannot read {path}, using a synthetic frame")
+        img = np.random.default_rng(0).integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+    if width and img.shape[1] != width:
+        img = cv2.resize(img, (width, int(img.shape[0] * width / img.shape[1])))
+    return img
+
+
+def synthetic_detections(n, shape, n_classes=80, seed=0):
+    """n random boxes inside a frame of the given shape as xyxy/conf/cls arrays."""
+    rng = np.random.default_rng(seed)
+    h, w = shape[:2]
+    xy = rng.uniform(0, 1, (n, 2)) * (w * 0.8, h * 0.8)
+    wh = rng.uniform(0.05, 0.2, (n, 2)) * (w, h)
+    return {
+        "xyxy": np.concatenate([xy, xy + wh], axis=1).astype(np.float32),
+        "conf": rng.uniform(0.3, 1.0, n).astype(np.float32),
+        "cls": rng.integers(0, n_classes, n),
+    }
+
+
+def bench_annotate(args):
+    from annotator import Annotator
+
+    img = load_image(args.image, args.source_width)
+    names = {i: f"class{i}" for i in range(80)}
+    names[41] = "cup"
+    dets = synthetic_detections(args.detections, img.shape)
+    annotator = Annotator(names)
+    lines = [f"{names[int(k)]}: {c:.1%}" for k, c in zip(dets["cls"], dets["conf"])]
+    rows = [
+        (f"annotator @ {img.shape[1]}px",
+         timeit(lambda: annotator.draw(img.copy(), dets, fps=25.0, lines=lines), args.runs)),
+        (f"annotator @ {args.display_width}px",
+         timeit(lambda: annotator.draw(img, dets, fps=25.0, lines=lines, out_width=args.display_width), args.runs)),
+        ("frame copy only (baseline)", timeit(lambda: img.copy(), args.runs)),
+    ]
+
+    try:
+        import torch
+        from ultralytics.engine.results import Results
+    except ImportError:
+        print("ultralytics/torch not installed, skipping r.plot() comparison")
+    else:
+        data = np.concatenate([dets["xyxy"], dets["conf"][:, None], dets["cls"][:, None]], axis=1)
+        result = Results(img, path="bench", names=names, boxes=torch.from_numpy(data.astype(np.float32)))
+
+        def plot_and_text():
+            # what the producers did before: r.plot() and then FPS box + detection text
+            frame = result.plot()
+            (tw, th), _ = cv2.getTextSize("FPS: 25.0", cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2)
+            cv2.rectangle(frame, (8, 8), (12 + tw, 14 + th), (0, 0, 0), -1)
+            cv2.putText(frame, "FPS: 25.0", (10, 12 + th), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2, cv2.LINE_AA)
+            y = 60
+            for text in lines:
+                cv2.putText(frame, text, (20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 170), 2)
+                y += 25
+
+        rows.insert(0, (f"r.plot() @ {img.shape[1]}px", timeit(result.plot, args.runs)))
+        rows.insert(1, ("r.plot() + putText (old producer)", timeit(plot_and_text, args.runs)))
+
+    print_table(f"annotation, {args.detections} detections", rows)
+
+
+def bench_capture(args):
+    from capture_format import FormatCapture, decode_mjpeg, letterbox, load_samples, yuyv_to_bgr
+
+    if args.samples and os.path.isdir(args.samples):
+        for meta, buffers in load_samples(args.samples):
+            fmt, w, h = meta["format"], meta["width"], meta["height"]
+            frames = itertools.cycle(buffers)
+            canvas = np.empty((args.imgsz, args.imgsz, 3), dtype=np.uint8)
+            rows = []
+            if fmt == "MJPG":
+                for scale in (1, 2, 4):
+                    rows.append((f"decode 1/{scale}", timeit(lambda: decode_mjpeg(next(frames), scale), args.runs)))
+                    rows.append((f"decode 1/{scale} + letterbox {args.imgsz}", timeit(
+                        lambda: letterbox(decode_mjpeg(next(frames), scale), args.imgsz, canvas), args.runs)))
+            else:
+                for reduce in (1, 2):
+                    rows.append((f"yuyv->bgr 1/{reduce}", timeit(lambda: yuyv_to_bgr(next(frames), w, h, reduce), args.runs)))
+                    rows.append((f"yuyv->bgr 1/{reduce} + letterbox {args.imgsz}", timeit(
+                        lambda: letterbox(yuyv_to_bgr(next(frames), w, h, reduce), args.imgsz, canvas), args.runs)))
+            cam = f", camera delivered {meta['capture_fps']} fps" if meta.get("capture_fps") else ""
+            print_table(f"{fmt} {w}x{h} sample{cam}", rows)
+    elif not args.live:
+        print(f"No sample streams in {args.samples}; create some with capture_format.py record/synthesize")
+
+    if args.live:
+        from camera_probe import probe
+        source = int(args.source) if args.source.isdigit() else args.source
+        caps = probe(args.source)
+        print(f"\n=== live camera {caps['device']} ===")
+        print(f"{'format':<8} {'size':<11} {'decode':<7} {'fps':>7} {'read ms':>8} {'decode ms':>10}")
+        for fmt, sizes in caps["formats"].items():
+            if fmt not in ("MJPG", "YUYV"):
+                continue
+            for size in sizes:
+                for scale in ((1, 2) if fmt == "YUYV" else (1, 2, 4)):
+                    cap = FormatCapture(source, size["width"], size["height"], pixel_format=fmt, decode_scale=scale)
+                    if not cap.isOpened():
+                        continue
+                    for _ in range(5):
+                        cap.read()
+                    cap.stats = {"frames": 0, "read_s": 0.0, "decode_s": 0.0}
+                    t0 = time.perf_counter()
+                    for _ in range(args.frames):
+                        if not cap.read()[0]:
+                            break
+                    dt = time.perf_counter() - t0
+                    st = cap.stats
+                    cap.release()
+                    n = max(1, st["frames"])
+                    print(f"{fmt:<8} {size['width']}x{size['height']:<6} 1/{scale:<5} {st['frames'] / dt:>7.1f} "
+                          f"{st['read_s'] / n * 1000:>8.2f} {st['decode_s'] / n * 1000:>10.2f}")
+
+
+def bench_source(args):
+    from frame_source import open_source
+
+    print(f"\n=== frame sources, {args.frames} frames each ===")
+    print(f"{'source':<40} {'backend':<10} {'size':<10} {'fps':>7} {'read ms':>8} {'p95 ms':>8} {'zero-copy':>10}")
+    for spec in args.specs:
+        try:
+            source = open_source(spec, args.width, args.height, zero_copy=args.zero_copy)
+        except (ImportError, RuntimeError, ValueError) as e:
+            print(f"{spec[:40]:<40} cannot open: {e}")
+            continue
+        if not source.isOpened():
+            print(f"{spec[:40]:<40} cannot open")
+            continue
+        size = ""
+        try:
+            for i, (frame, ts) in enumerate(source):
+                size = f"{frame.shape[1]}x{frame.shape[0]}"
+                if i + 1 >= args.frames:
+                    break
+        finally:
+            source.release()
+        st = source.stats()
+        print(f"{spec[:40]:<40} {st['backend']:<10} {size:<10} {st['fps']:>7.1f} {st['read_ms_mean']:>8.2f} "
+              f"{st['read_ms_p95']:>8.2f} {str(st['zero_copy']):>10}")
+
+
+def bench_predict(args):
+    from device_pipeline import DeviceDetector, NumpyBackend, make_backend
+
+    img = load_image(args.image, args.source_width)
+    backend = NumpyBackend(args.imgsz)
+    rows = [
+        ("cv2.resize 320x240 (old)", timeit(lambda: cv2.resize(img, (320, 240)), args.runs)),
+        (f"letterbox {args.imgsz} into reusable input", timeit(lambda: backend.preprocess(img), args.runs)),
+    ]
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        print("ultralytics not installed, only preprocessing is measured")
+        print_table("per-frame preprocessing", rows)
+        return
+
+    model = YOLO(args.model)
+
+    def old_generator():
+        # what camera_inference.py did: a fresh predict generator (and predictor setup) per frame
+        resized = cv2.resize(img, (320, 240))
+        for _ in model.predict(source=resized, save=False, project='/results', name='video_output',
+                               exist_ok=True, verbose=False, stream=True):
+            pass
+
+    rows.append(("predict(stream=True) generator per frame (old)", timeit(old_generator, args.runs)))
+    rows.append(("model.predict(frame) (warm predictor, Results)",
+                 timeit(lambda: model.predict(img, imgsz=args.imgsz, verbose=False), args.runs)))
+    for name in ("numpy", "torch"):
+        try:
+            b = make_backend(name, imgsz=args.imgsz, device=args.device)
+        except (ImportError, RuntimeError) as e:
+            print(f"skipping {name} backend: {e}")
+            continue
+        detector = DeviceDetector(model, b)
+        frame = b.wrap(img)
+        rows.append((f"DeviceDetector {name} (compact n x 6)", timeit(lambda: detector(frame), args.runs)))
+    print_table(f"per-frame inference, imgsz {args.imgsz}", rows)
+
+
+def bench_batch(args):
+    from ultralytics import YOLO
+
+    from device_pipeline import export_max_batch
+    from inference import list_images, run_batch
+
+    limit = export_max_batch(args.model)
+    batches = [b for b in args.batches if limit is None or b <= limit]
+    if len(batches) < len(args.batches):
+        print(f"skipping batch sizes above {limit}, the export batch of {args.model} "
+              "(re-export with batch=N dynamic=True)")
+    if not batches:
+        return
+    files = list_images([args.input])[:args.limit]
+    model = YOLO(args.model)
+    run_batch(model, files[:max(batches)], max(batches), args.workers, save=False, imgsz=args.imgsz)  # warm-up
+    print(f"\n=== batch inference, {len(files)} images, no output writes ===")
+    print(f"{'batch':>6} {'images/s':>9} {'decode ms':>10} {'infer ms/img':>13} {'predict ms/batch':>17}")
+    for b in batches:
+        st = run_batch(model, files, b, args.workers, save=False, imgsz=args.imgsz)
+        stages = st["stages"]
+        print(f"{b:>6} {st['images_per_s']:>9.1f} {stages['decode']['mean']:>10.2f} "
+              f"{stages['inference']['mean']:>13.2f} {stages['batch']['mean']:>17.2f}")
+
+
+def bench_load(args):
+    """Load generator for POST /predict: closed loop, `concurrency` clients sending back to back."""
+    import json
+    import urllib.error
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    img = load_image(args.image, args.source_width)
+    body = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+    def one(_):
+        req = urllib.request.Request(args.url, data=body, headers={"Content-Type": "image/jpeg"})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                data = json.loads(resp.read())
+            return (time.perf_counter() - t0) * 1000.0, data.get("batch_size", 1), None
+        except urllib.error.HTTPError as e:
+            return (time.perf_counter() - t0) * 1000.0, 0, e.code
+        except OSError as e:
+            return (time.perf_counter() - t0) * 1000.0, 0, str(e)
+
+    one(0)  # first request loads the model on the server
+    print(f"\n=== /predict load, {len(body) // 1024} KB JPEG, {args.requests} requests per level ===")
+    print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean batch':>11} {'errors':>7}")
+    for c in args.concurrency:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(c) as pool:
+            res = list(pool.map(one, range(args.requests)))
+        dt = time.perf_counter() - t0
+        ok = [r for r in res if r[2] is None]
+        lat = np.array([r[0] for r in ok]) if ok else np.zeros(1)
+        batch = np.mean([r[1] for r in ok]) if ok else 0.0
+        print(f"{c:>7} {len(ok) / dt:>8.1f} {np.percentile(lat, 50):>8.1f} {np.percentile(lat, 95):>8.1f} "
+              f"{np.percentile(lat, 99):>8.1f} {batch:>11.2f} {len(res) - len(ok):>7}")
+
+
+def bench_live(args):
+    """Bandwidth and latency of the H.264/fMP4 live stream vs MJPEG on the same frames."""
+    import threading
+
+    from frame_source import open_source
+    from live_stream import LiveStream
+
+    source = open_source(args.source, realtime=True)
+    if not source.isOpened():
+        print(f"Cannot open {args.source}")
+        return
+    live = LiveStream(fps=args.fps, width=args.width, bitrate=args.bitrate, encoder=args.encoder, ffmpeg=args.ffmpeg)
+    jpeg_bytes, jpeg_ms = [], []
+    received = [0]
+    frames = iter(source)
+    frame, _ = next(frames)
+    live.push(frame)
+    try:
+        live.connect()
+    except RuntimeError as e:
+        print(f"Live stream unavailable: {e}")
+        source.release()
+        return
+
+    def client():
+        for chunk in live.stream():
+            received[0] += len(chunk)
+
+    threading.Thread(target=client, daemon=True).start()
+    t_end = time.monotonic() + args.seconds
+    for frame, _ in frames:
+        if time.monotonic() > t_end:
+            break
+        live.push(frame)
+        if args.width and frame.shape[1] > args.width:
+            frame = cv2.resize(frame, live.size, interpolation=cv2.INTER_AREA)
+        t0 = time.perf_counter()
+        buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1]
+        jpeg_ms.append((time.perf_counter() - t0) * 1000.0)
+        jpeg_bytes.append(len(buf))
+    st = live.stats()
+    source.release()
+    mjpeg_kbit = np.mean(jpeg_bytes) * 8 * args.fps / 1000.0
+    print(f"\n=== live stream, {args.source}, {live.size[0]}x{live.size[1]} @ {args.fps:g} fps, {args.seconds:g} s ===")
+    print(f"{'stream':<28} {'kbit/s':>9} {'latency p50':>12} {'latency p95':>12}")
+    print(f"{'MJPEG q' + str(args.quality):<28} {mjpeg_kbit:>9.0f} {np.percentile(jpeg_ms, 50):>9.1f} ms "
+          f"{np.percentile(jpeg_ms, 95):>9.1f} ms   (JPEG encode)")
+    print(f"{'H.264 fMP4 ' + str(st['encoder']):<28} {st['kbit_s']:>9.0f} {st['latency_ms_p50']:>9.1f} ms "
+          f"{st['latency_ms_p95']:>9.1f} ms   (frame -> fragment, {received[0] // 1024} KB received)")
+    print(f"H.264 uses {st['kbit_s'] / mjpeg_kbit:.0%} of the MJPEG bandwidth" if mjpeg_kbit else "")
+    if st["failed_encoders"]:
+        print(f"unusable encoders: {', '.join(st['failed_encoders'])}")
+
+
+def bench_filter(args):
+    """Python per-box post-filtering vs FilterSpec (in predict + vectorized mask), and what it saves in annotate."""
+    from annotator import Annotator
+    from detection_filter import FilterSpec
+
+    img = load_image(args.image, args.source_width)
+    names = {i: f"class{i}" for i in range(80)}
+    names.update({0: "person", 41: "cup"})
+    dets = synthetic_detections(args.detections, img.shape)
+    dets["cls"][:args.detections // 10] = 41  # a few boxes of the wanted classes
+    spec = FilterSpec(names, args.classes.split(",") if args.classes else None, args.conf, max_det=args.max_det)
+    annotator = Annotator(names)
+
+    def python_loop():
+        # what the producers did: conf=0.55 in predict, then `if conf > 0.6` per box
+        out = []
+        for xyxy, conf, cls_id in zip(dets["xyxy"], dets["conf"], dets["cls"]):
+            if conf > 0.6:
+                out.append({'class': names[int(cls_id)], 'confidence': float(conf), 'box': xyxy.tolist()})
+        return out
+
+    kept = spec.apply(dets)
+    rows = [
+        (f"python loop, conf > 0.6 ({len(python_loop())} kept)", timeit(python_loop, args.runs)),
+        (f"FilterSpec.apply ({len(kept['conf'])} kept)", timeit(lambda: spec.apply(dets), args.runs)),
+        (f"annotate all {args.detections} boxes",
+         timeit(lambda: annotator.draw(img, dets, out_width=args.display_width), args.runs)),
+        (f"annotate filtered {len(kept['conf'])} boxes",
+         timeit(lambda: annotator.draw(img, kept, out_width=args.display_width), args.runs)),
+    ]
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        print("ultralytics not installed, predictor postprocess is not measured")
+    else:
+        model = YOLO(args.model)
+
+        def postprocess(**kw):
+            def run():
+                r = model.predict(img, imgsz=args.imgsz, verbose=False, **kw)[0]
+                return r.speed["postprocess"]
+            run()
+            return np.array([run() for _ in range(args.runs)])
+
+        for label, kw in (("predict conf=0.55, all classes", {"conf": 0.55}),
+                          (f"predict {spec.predict_kwargs()}", spec.predict_kwargs())):
+            ms = postprocess(**kw)
+            rows.append((f"{label} (postprocess)"[:40], {"mean": float(ms.mean()), "p50": float(np.percentile(ms, 50)),
+                                                        "p95": float(np.percentile(ms, 95))}))
+    print_table(f"detection filtering, {args.detections} detections, filter {spec.to_dict()}", rows)
+
+
+def build_parser():
+    """Parser with one subparser per benchmark; parser.commands maps the names to the subparsers."""
+    parser = argparse.ArgumentParser(description="Benchmarks for the YOLO streaming pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+    parser.commands = sub.choices
+
+    p = sub.add_parser("annotate", help="one-pass Annotator vs r.plot()")
+    p.add_argument("--image", default="/app/test_image.jpg")
+    p.add_argument("--source-width", type=int, default=1920)
+    p.add_argument("--display-width", type=int, default=1024)
+    p.add_argument("--detections", type=int, default=20)
+    p.add_argument("--runs", type=int, default=200)
+    p.set_defaults(func=bench_annotate)
+
+    p = sub.add_parser("capture", help="decode paths per pixel format / resolution")
+    p.add_argument("--samples", default="/results/samples", help="directory from capture_format.py record/synthesize")
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--runs", type=int, default=100)
+    p.add_argument("--live", action="store_true", help="also measure the camera for every probed format/size")
+    p.add_argument("--source", default="0")
+    p.add_argument("--frames", type=int, default=60)
+    p.set_defaults(func=bench_capture)
+
+    p = sub.add_parser("source", help="frame_source backends side by side")
+    p.add_argument("specs", nargs="+", help="frame_source specs, e.g. 0 synthetic:1920x1080@30 replay:/app/clip.mp4")
+    p.add_argument("--frames", type=int, default=300)
+    p.add_argument("--width", type=int)
+    p.add_argument("--height", type=int)
+    p.add_argument("--zero-copy", action="store_true")
+    p.set_defaults(func=bench_source)
+
+    p = sub.add_parser("predict", help="per-frame predict() generator vs warm DeviceDetector")
+    p.add_argument("--model", default="/app/yolov8n.engine")
+    p.add_argument("--image", default="/app/test_image.jpg")
+    p.add_argument("--source-width", type=int, default=1280)
+    p.add_argument("--imgsz", type=int, default=320)
+    p.add_argument("--device", default="cuda")
+    p.add_argument("--runs", type=int, default=100)
+    p.set_defaults(func=bench_predict)
+
+    p = sub.add_parser("batch", help="inference.py batch mode throughput per batch size")
+    p.add_argument("input", help="directory of images")
+    p.add_argument("--model", default="/app/yolov8n.engine")
+    p.add_argument("--batches", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 8, 16])
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--limit", type=int, default=512)
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("load", help="load generator for the /predict endpoint")
+    p.add_argument("--url", default="http://localhost:5001/predict")
+    p.add_argument("--image", default="/app/test_image.jpg")
+    p.add_argument("--source-width", type=int, default=1280)
+    p.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 16])
+    p.add_argument("--requests", type=int, default=200)
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser("live", help="H.264/fMP4 live stream vs MJPEG: bandwidth and latency")
+    p.add_argument("--source", default="synthetic:1280x720@30", help="frame_source spec")
+    p.add_argument("--seconds", type=float, default=10.0)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--bitrate", default="1M")
+    p.add_argument("--encoder", default="auto")
+    p.add_argument("--ffmpeg", default="ffmpeg")
+    p.add_argument("--quality", type=int, default=95, help="MJPEG quality to compare against (stream default 95)")
+    p.set_defaults(func=bench_live)
+
+    p = sub.add_parser("filter", help="Python post-filtering vs FilterSpec, and annotate cost of the kept boxes")
+    p.add_argument("--classes", default="cup,person", help="comma separated, '' = all")
+    p.add_argument("--conf", type=float, default=0.6)
+    p.add_argument("--max-det", type=int, default=300)
+    p.add_argument("--detections", type=int, default=100)
+    p.add_argument("--image", default="/app/test_image.jpg")
+    p.add_argument("--source-width", type=int, default=1920)
+    p.add_argument("--display-width", type=int, default=1024)
+    p.add_argument("--model", default="/app/yolov8n.engine")
+    p.add_argument("--imgsz", type=int, default=1920)
+    p.add_argument("--runs", type=int, default=200)
+    p.set_defaults(func=bench_filter)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
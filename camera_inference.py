@@ -1,21 +1,26 @@
 from ultralytics import YOLO
-import cv2
 import os
 import sys
+import time
+
+from device_pipeline import DeviceDetector, compact, export_imgsz, make_backend
+from frame_source import open_source
 
 # --- Configuration (can be overridden by environment variables) ---
 MODEL_PATH = os.environ.get("MODEL_PATH", "/app/yolov8n.engine")
 CAMERA_SOURCE = os.environ.get("CAMERA_SOURCE", "0")
 OUTPUT_PATH = os.environ.get("OUTPUT_PATH", "/results/output_video.mp4")
-
-# Convert numeric index if possible
-try:
-    cam_source = int(CAMERA_SOURCE)
-except Exception:
-    cam_source = CAMERA_SOURCE  # keep as string (device path)
+# frames are letterboxed straight into a reusable IMGSZ x IMGSZ input (was cv2.resize to 320x240);
+# 0 = the size the engine was exported with (a static engine rejects any other size, for 320
+# re-export: yolo export model=yolov8n.pt format=engine imgsz=320)
+IMGSZ = int(os.environ.get("IMGSZ", "0")) or export_imgsz(MODEL_PATH)
+CONF = float(os.environ.get("CONF", "0.25"))
+# numpy = letterbox on the host; torch = letterbox on DEVICE (cuda / cpu)
+PREPROCESS = os.environ.get("PREPROCESS", "numpy")
+DEVICE = os.environ.get("DEVICE", "cuda")
 
 # Quick camera accessibility check before loading model
-cap = cv2.VideoCapture(cam_source)
+cap = open_source(CAMERA_SOURCE)
 
 if not cap.isOpened():
     print(f"Error: cannot open camera '{CAMERA_SOURCE}'.")
@@ -24,30 +29,26 @@ if not cap.isOpened():
 # --- Inference ---
 model = YOLO(MODEL_PATH)
 
+# predictor is set up once and kept warm, not rebuilt by a new predict() generator per frame
+backend = make_backend(PREPROCESS, imgsz=IMGSZ, device=DEVICE)
+detector = DeviceDetector(model, backend, conf=CONF)
+
 # Start capturing from the camera
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # Resize the frame to a lower resolution
-    frame_resized = cv2.resize(frame, (320, 240))
-
-    # Pass the resized frame to the model and get results
-    results_generator = model.predict(
-        source=frame_resized,
-        save=False,  # Set to False to avoid saving each frame
-        project='/results',
-        name='video_output',
-        exist_ok=True,
-        verbose=False,
-        stream=True  # Enable streaming mode
-    )
-
-    # Process results
-    for result in results_generator:
-        # Here you can access result.boxes, result.masks, etc.
-        print(result)  # Print or process the result as needed
-
-cap.release()
-print(f"Video inference completed. Output saved to /results/")
\ No newline at end of file
+frames = 0
+t_start = time.perf_counter()
+try:
+    for frame, ts in cap:
+        t0 = time.perf_counter()
+        det = detector(backend.wrap(frame))
+        frames += 1
+
+        # one compact line per frame instead of the whole Results object
+        dets = ", ".join(f"{d['cls']} {d['conf']:.2f}" for d in compact(det, model.names))
+        print(f"frame {frames}: {(time.perf_counter() - t0) * 1000:.1f} ms, {len(det)} det [{dets}]")
+except KeyboardInterrupt:
+    print("Interrupted by user.")
+finally:
+    cap.release()
+
+elapsed = time.perf_counter() - t_start
+print(f"Camera inference completed: {frames} frames, {frames / elapsed if elapsed > 0 else 0:.1f} FPS")
@@ -1,45 +1,69 @@
+from ultralytics import YOLO
+import os
+import sys
+import time
 
-No good reason to not use this code
-from ultralytics import YOLO 
+from device_pipeline import DeviceAnnotator, DeviceDetector, TransferMeter, export_imgsz, make_backend
+from frame_source import JetsonSource, open_source
 
-from   jetson_utils import videoSource, videoOutput, Log
-from   jetson_utils import cudaToNumpy
-from   jetson_utils import cudaFromNumpy
+# --- Configuration (can be overridden by environment variables) ---
+MODEL_PATH = os.environ.get("MODEL_PATH", "/home/jet/robotics/yolo/networks/yolo11n.engine")
+INPUT_URI = os.environ.get("INPUT_URI", "csi://0")      # jetson_utils videoSource URI
+OUTPUT_URI = os.environ.get("OUTPUT_URI", "display://0")  # jetson_utils videoOutput URI, "" = none
+# 0 = the size the engine was exported with (a static engine rejects any other input size)
+IMGSZ = int(os.environ.get("IMGSZ", "0")) or export_imgsz(MODEL_PATH)
+CONF = float(os.environ.get("CONF", "0.25"))
+# torch = frames stay in CUDA memory; numpy = host reference path (CPU, no jetson_utils needed),
+# reading FRAME_SOURCE (e.g. synthetic or a video file) instead of INPUT_URI
+DEVICE_BACKEND = os.environ.get("DEVICE_BACKEND", "torch")
+DEVICE = os.environ.get("DEVICE", "cuda")
+FRAME_SOURCE = os.environ.get("FRAME_SOURCE", "synthetic:1280x720@30")
+# print FPS and host<->device traffic every N frames
+REPORT_EVERY = int(os.environ.get("REPORT_EVERY", "100"))
 
 # Load YOLO TRT model
-model = YOLO("/home/jet/robotics/yolo/networks/yolo11n.engine")
+model = YOLO(MODEL_PATH)
+
+meter = TransferMeter()
+on_jetson = DEVICE_BACKEND == "torch" and DEVICE.startswith("cuda")
+# jetson_utils captures RGB; OpenCV sources deliver BGR
+backend = make_backend(DEVICE_BACKEND, imgsz=IMGSZ, rgb=on_jetson, meter=meter, device=DEVICE)
+detector = DeviceDetector(model, backend, conf=CONF)
+annotator = DeviceAnnotator(backend, model.names)
 
 # Jetson_Utils initialize
-input  = videoSource()
-output = videoOutput()
- 
+if on_jetson:
+    from jetson_utils import videoOutput
+    source = JetsonSource(INPUT_URI, argv=sys.argv, pixel_format="rgb8")
+    output = videoOutput(OUTPUT_URI, argv=sys.argv) if OUTPUT_URI else None
+else:
+    source = open_source(FRAME_SOURCE)
+    output = None
+
 # Run Inference on Video Frames
-while True:
-
-    # capture the next image
-    frame = input.Capture()
-
-    if frame is None: # timeout
-        continue  
-        
-    # Exit on input/output EOS
-    if not input.IsStreaming() or not output.IsStreaming():
-        break
-
-    # Convert Jetson Cuda image to Numpy array  
-    frame_numpy = cudaToNumpy(frame)
-
-    # Run Yolo Inference
-    results = model(frame_numpy)  #, show=True)
- 
-    for resx in results:
-        boxes     = resx.boxes      # Boxes object for bounding box outputs
-        masks     = resx.masks      # Masks object for segmentation masks outputs
-        keypoints = resx.keypoints  # Keypoints object for pose outputs
-        probs     = resx.probs      # Probs object for classification outputs
-        obb       = resx.obb        # Oriented boxes object for OBB outputs
-
-        # Display image and bounding box in Jetson_Utils output window
-        output.Render(cudaFromNumpy(resx.plot()))
-
-        print(boxes)   # Stream object detection results
\ No newline at end of file
+t_start = time.perf_counter()
+try:
+    for frame_numpy, ts in source:
+        # CUDA image viewed as a tensor (no copy) on Jetson, host array otherwise
+        frame = backend.wrap(source.last_cuda if on_jetson else frame_numpy)
+
+        det = detector(frame)
+        annotator.draw(frame, det)
+
+        # Display the annotated CUDA image in place, it never went through host memory
+        if output is not None:
+            backend.sync()
+            output.Render(source.last_cuda)
+            if not output.IsStreaming():
+                break
+        meter.frame_done()
+
+        if REPORT_EVERY and meter.frames % REPORT_EVERY == 0:
+            fps = meter.frames / (time.perf_counter() - t_start)
+            print(f"{fps:.1f} FPS, {len(det)} detections, {meter.summary()}")
+except KeyboardInterrupt:
+    print("Interrupted by user.")
+finally:
+    source.release()
+
+print(f"{backend.name} backend: {meter.summary()}")
@@ -1,57 +1,73 @@
-# ...existing code...
 from ultralytics import YOLO
 import cv2
 import os
 import sys
+import time
+
+from annotator import Annotator
+from frame_source import open_source
+from remote_viewer import FramePublisher
 
 # --- Configuration (can be overridden by environment variables) ---
 MODEL_PATH = os.environ.get("MODEL_PATH", "/app/yolov8n.engine")
 CAMERA_SOURCE = os.environ.get("CAMERA_SOURCE", "0")
 OUTPUT_PATH = os.environ.get("OUTPUT_PATH", "/results/output_video.mp4")
-
-# Convert numeric index if possible
-try:
-    cam_source = int(CAMERA_SOURCE)
-except Exception:
-    cam_source = CAMERA_SOURCE  # keep as string (device path)
+# HEADLESS=1: no cv2.imshow / waitKey (no X11 needed); default: headless when $DISPLAY is unset
+HEADLESS = os.environ.get("HEADLESS", "0" if os.environ.get("DISPLAY") else "1") == "1"
+# publish annotated frames for remote_viewer.py on this Unix socket, "" = off
+VIEWER_SOCKET = os.environ.get("VIEWER_SOCKET", "/tmp/yolo_view.sock")
+VIEWER_WIDTH = int(os.environ.get("VIEWER_WIDTH", "960"))
+REPORT_EVERY = int(os.environ.get("REPORT_EVERY", "100"))
 
 # Quick camera accessibility check before loading model
-# ...existing code...
-cap = cv2.VideoCapture(cam_source)
+cap = open_source(CAMERA_SOURCE)
 
 if not cap.isOpened():
     print(f"Error: cannot open camera '{CAMERA_SOURCE}'.")
     sys.exit(1)
 
-cap.release()
-
 # --- Inference ---
 model = YOLO(MODEL_PATH)
+annotator = Annotator(model.names)
+publisher = FramePublisher(VIEWER_SOCKET, width=VIEWER_WIDTH) if VIEWER_SOCKET else None
 
-# --- NEW: display annotated frames in a window ---
 try:
-    # Use the model's streaming API (yields Results)
-    results_gen = model.predict(source=cam_source, stream=True, save=False, verbose=False)
-
-    print("Press 'q' to quit.")
-    for result in results_gen:
-        # result.plot() returns an OpenCV BGR numpy array with boxes/labels drawn
-        annotated = result.plot()
-
-        # Show annotated frame
-        cv2.imshow("YOLO Camera", annotated)
-
-        # Optional: save frames to a video file (uncomment to enable)
-        # You can initialize a VideoWriter on first frame if needed.
+    if HEADLESS:
+        print("Headless mode, Ctrl+C to quit." + (f" Attach a viewer: python /app/remote_viewer.py --socket {VIEWER_SOCKET}"
+                                                    if publisher else ""))
+    else:
+        print("Press 'q' to quit.")
+    frames, t_start = 0, time.perf_counter()
+    for frame, ts in cap:
+        result = model.predict(frame, save=False, verbose=False)[0]
+        frames += 1
+        viewing = publisher is not None and publisher.active
+        if not HEADLESS or viewing:
+            # annotate only when someone is looking at the frame
+            boxes = result.boxes
+            dets = {"xyxy": boxes.xyxy.cpu().numpy(), "conf": boxes.conf.cpu().numpy(),
+                    "cls": boxes.cls.cpu().numpy().astype(int)}
+            annotated = annotator.draw(frame, dets, out_width=VIEWER_WIDTH if HEADLESS else None)
+            if viewing:
+                publisher.publish(annotated)
+            if not HEADLESS:
+                # Show annotated frame
+                cv2.imshow("YOLO Camera", annotated)
+                # Exit on 'q'
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
 
-        # Exit on 'q'
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        if HEADLESS and REPORT_EVERY and frames % REPORT_EVERY == 0:
+            print(f"{frames} frames, {frames / (time.perf_counter() - t_start):.1f} FPS, "
+                  f"{len(result.boxes)} detections")
 
 except KeyboardInterrupt:
     print("Interrupted by user.")
 finally:
-    cv2.destroyAllWindows()
+    cap.release()
+    if publisher is not None:
+        publisher.close()
+    if not HEADLESS:
+        cv2.destroyAllWindows()
 
 print("Done.")
-# ...existing code...
\ No newline at end of file
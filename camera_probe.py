@@ -0,0 +1,190 @@
+# Description: Cached camera capability probe
+# Enumerates pixel formats (MJPG, YUYV, ...), frame sizes and frame rates with
+# `v4l2-ctl --list-formats-ext` (falls back to trying common resolutions with OpenCV).
+# Results are cached on disk per device identity (name + USB vendor/product/serial), so
+# later launches do not open the camera at all.
+#
+#   python /app/camera_probe.py /dev/video0 [--refresh]
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import time
+
+PROBE_CACHE = os.environ.get("PROBE_CACHE", os.path.expanduser("~/.cache/yolo_app/camera_probe.json"))
+
+# resolutions tried by the OpenCV fallback (same list the recorders used before)
+FALLBACK_RESOLUTIONS = [(640, 480), (800, 600), (1024, 768), (1280, 720), (1920, 1080), (2560, 1440)]
+
+
+def device_path(device):
+    """0 / "0" / "/dev/video0" -> "/dev/video0"."""
+    if isinstance(device, int) or str(device).isdigit():
+        return f"/dev/video{int(device)}"
+    return str(device)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def device_identity(device):
+    """Stable identity of the camera behind a /dev/videoN node (survives re-plugging)."""
+    dev = device_path(device)
+    node = os.path.basename(os.path.realpath(dev))
+    sys_dir = f"/sys/class/video4linux/{node}"
+    ident = {"name": _read(os.path.join(sys_dir, "name"))}
+    # walk up from the video node to the USB device that has the vendor/product ids
+    d = os.path.realpath(os.path.join(sys_dir, "device"))
+    for _ in range(4):
+        if os.path.exists(os.path.join(d, "idVendor")):
+            ident["usb"] = f"{_read(os.path.join(d, 'idVendor'))}:{_read(os.path.join(d, 'idProduct'))}"
+            ident["serial"] = _read(os.path.join(d, "serial"))
+            break
+        d = os.path.dirname(d)
+    if not ident["name"]:
+        # not a V4L2 node we can inspect (e.g. no sysfs in container); fall back to the path
+        ident["path"] = dev
+    return ident
+
+
+def identity_key(ident):
+    return hashlib.sha1(json.dumps(ident, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def parse_formats_ext(output):
+    """Parse `v4l2-ctl --list-formats-ext` into {fourcc: [{width, height, fps: [...]}, ...]}."""
+    formats = {}
+    sizes = None
+    current = None
+    for line in output.splitlines():
+        m = re.match(r"^\s*\[\d+\]:\s+'(\w+)'", line)
+        if m:
+            sizes = formats.setdefault(m.group(1), [])
+            current = None
+            continue
+        m = re.match(r"^\s*Size:\s+\w+\s+(\d+)x(\d+)", line)
+        if m and sizes is not None:
+            current = {"width": int(m.group(1)), "height": int(m.group(2)), "fps": []}
+            sizes.append(current)
+            continue
+        m = re.search(r"Interval:.*\(([\d.]+) fps\)", line)
+        if m and current is not None:
+            current["fps"].append(float(m.group(1)))
+    return formats
+
+
+def probe_v4l2(device):
+    try:
+        p = subprocess.run(["v4l2-ctl", "-d", device_path(device), "--list-formats-ext"],
+                           capture_output=True, text=True, check=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return parse_formats_ext(p.stdout) or None
+
+
+def probe_opencv(device):
+    """Slow fallback: open the camera and try the common resolutions (format unknown)."""
+    import cv2
+    index = int(device) if str(device).isdigit() else device
+    cap = cv2.VideoCapture(index)
+    sizes = []
+    if cap.isOpened():
+        for w, h in FALLBACK_RESOLUTIONS:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, w)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+            if int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) == w and int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) == h:
+                sizes.append({"width": w, "height": h, "fps": []})
+    cap.release()
+    return {"unknown": sizes} if sizes else {}
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def probe(device=0, refresh=False, cache_path=PROBE_CACHE):
+    """Capabilities of a camera, served from the on-disk cache when the same camera was seen before."""
+    if str(device).startswith("bus:"):
+        from frame_bus import bus_caps
+        return bus_caps(str(device)[4:])
+    ident = device_identity(device)
+    key = identity_key(ident)
+    cache = _load_cache(cache_path)
+    if not refresh and key in cache:
+        return cache[key]
+
+    formats = probe_v4l2(device)
+    method = "v4l2-ctl"
+    if formats is None:
+        formats = probe_opencv(device)
+        method = "opencv"
+    result = {
+        "device": device_path(device),
+        "identity": ident,
+        "formats": formats,
+        "method": method,
+        "probed_at": time.time(),
+    }
+    if formats:
+        cache[key] = result
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        tmp = cache_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, cache_path)
+    return result
+
+
+def resolutions(caps, fourcc=None):
+    """Sorted unique (width, height) list, optionally for one pixel format only."""
+    out = set()
+    for fmt, sizes in caps.get("formats", {}).items():
+        if fourcc and fmt not in (fourcc, "unknown"):
+            continue
+        out.update((s["width"], s["height"]) for s in sizes)
+    return sorted(out)
+
+
+def frame_rates(caps, width, height, fourcc=None):
+    """Frame rates the camera offers for a size (empty if unknown)."""
+    rates = set()
+    for fmt, sizes in caps.get("formats", {}).items():
+        if fourcc and fmt != fourcc:
+            continue
+        for s in sizes:
+            if s["width"] == width and s["height"] == height:
+                rates.update(s["fps"])
+    return sorted(rates, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe camera formats / resolutions / frame rates")
+    parser.add_argument("device", nargs="?", default="0")
+    parser.add_argument("--refresh", action="store_true", help="ignore the cache and probe again")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    caps = probe(args.device, refresh=args.refresh)
+    print(f"{caps['device']} ({caps['identity'].get('name', '?')}) via {caps['method']}, "
+          f"{(time.perf_counter() - t0) * 1000:.1f} ms")
+    for fmt, sizes in caps["formats"].items():
+        print(f"  {fmt}")
+        for s in sizes:
+            rates = ", ".join(f"{r:g}" for r in s["fps"]) or "?"
+            print(f"    {s['width']}x{s['height']} @ {rates} fps")
+
+
+if __name__ == '__main__':
+    main()
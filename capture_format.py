@@ -0,0 +1,241 @@
+# Description: Camera pixel-format negotiation and fast decode paths
+# Without an explicit format many USB cameras fall back to uncompressed YUYV at 1080p, which
+# is limited to ~5 FPS by USB bandwidth. FormatCapture selects MJPEG (or YUYV) explicitly and
+# can do the decode itself:
+#   - MJPEG: optional reduced-size decode (libjpeg DCT scaling, 1/2, 1/4, 1/8), much cheaper
+#     than a full decode followed by cv2.resize
+#   - YUYV: direct conversion from the packed camera buffer, with a 2x path that takes one
+#     pixel per YUYV macro-pixel (no resize needed) before the colour conversion
+# Sample streams of raw camera buffers can be recorded and replayed by benchmark.py capture.
+#
+#   python /app/capture_format.py record --format MJPG --width 1920 --height 1080 --frames 120
+#   python /app/capture_format.py synthesize --image /app/test_image.jpg
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+REDUCED_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def decode_mjpeg(buf, scale=1):
+    """Decode one camera JPEG, optionally at 1/scale size directly in the decoder."""
+    return cv2.imdecode(np.frombuffer(buf, dtype=np.uint8) if isinstance(buf, bytes) else buf.reshape(-1),
+                        REDUCED_FLAGS[scale])
+
+
+def yuyv_to_bgr(buf, width, height, reduce=1):
+    """Convert a packed YUYV (YUV 4:2:2) buffer to BGR.
+
+    reduce=2 returns a half-size image: each 4-byte Y0 U Y1 V macro-pixel becomes one YUV pixel
+    and every other row is skipped, so only a quarter of the pixels are colour converted.
+    """
+    yuyv = np.asarray(buf, dtype=np.uint8).reshape(height, width, 2)
+    if reduce == 1:
+        return cv2.cvtColor(yuyv, cv2.COLOR_YUV2BGR_YUYV)
+    if reduce != 2:
+        raise ValueError("YUYV direct path supports reduce=1 or 2")
+    macro = yuyv.reshape(height, width // 2, 4)[::2]
+    yuv = np.empty(macro.shape[:2] + (3,), dtype=np.uint8)
+    yuv[..., 0] = macro[..., 0]  # Y0
+    yuv[..., 1] = macro[..., 1]  # U
+    yuv[..., 2] = macro[..., 3]  # V
+    return cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR)
+
+
+def bgr_to_yuyv(img):
+    """Pack a BGR image into YUYV (used to synthesize sample streams without a camera)."""
+    h, w = img.shape[:2]
+    w -= w % 2
+    yuv = cv2.cvtColor(img[:, :w], cv2.COLOR_BGR2YUV)
+    out = np.empty((h, w, 2), dtype=np.uint8)
+    out[..., 0] = yuv[..., 0]
+    out[:, 0::2, 1] = yuv[:, 0::2, 1]
+    out[:, 1::2, 1] = yuv[:, 0::2, 2]
+    return out
+
+
+def letterbox(img, size, out=None, color=114):
+    """Resize img into a size x size letterboxed canvas (reusing out if given).
+
+    Returns (canvas, gain, (pad_x, pad_y)) so boxes can be mapped back to img coordinates.
+    """
+    h, w = img.shape[:2]
+    gain = min(size / h, size / w)
+    nw, nh = int(round(w * gain)), int(round(h * gain))
+    px, py = (size - nw) // 2, (size - nh) // 2
+    if out is None or out.shape != (size, size, 3):
+        out = np.empty((size, size, 3), dtype=np.uint8)
+    out[:] = color
+    cv2.resize(img, (nw, nh), dst=out[py:py + nh, px:px + nw], interpolation=cv2.INTER_LINEAR)
+    return out, gain, (px, py)
+
+
+def _fourcc_str(value):
+    v = int(value)
+    return "".join(chr((v >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+class FormatCapture:
+    """cv2.VideoCapture with explicit pixel format and optional own decode.
+
+    pixel_format: "MJPG", "YUYV" or "" (driver default, OpenCV decodes).
+    decode_scale: 1, 2, 4, 8 for MJPEG (reduced decode), 1 or 2 for YUYV.
+    read() always returns BGR frames like cv2.VideoCapture.read().
+    """
+
+    def __init__(self, source, width=None, height=None, fps=None, pixel_format="MJPG", decode_scale=1,
+                 api_preference=None):
+        self.cap = cv2.VideoCapture(source) if api_preference is None else cv2.VideoCapture(source, api_preference)
+        self.pixel_format = pixel_format
+        self.decode_scale = decode_scale
+        if pixel_format:
+            # format first: some drivers reject 1080p while still in YUYV
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*pixel_format))
+        if width and height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.active_format = _fourcc_str(self.cap.get(cv2.CAP_PROP_FOURCC))
+        # decode ourselves only when it buys something (reduced decode / direct YUYV path)
+        self.raw = bool(pixel_format) and (decode_scale > 1 or pixel_format == "YUYV")
+        if self.raw:
+            self.raw = bool(self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0))
+        self.stats = {"frames": 0, "read_s": 0.0, "decode_s": 0.0}
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+    def decode(self, buf):
+        """Turn a raw camera buffer into a BGR frame (no-op if OpenCV already decoded it)."""
+        if buf.ndim == 3 and buf.shape[2] == 3:
+            return buf
+        if self.active_format == "MJPG" or (buf.size > 2 and buf.ravel()[0] == 0xFF and buf.ravel()[1] == 0xD8):
+            return decode_mjpeg(buf, self.decode_scale)
+        return yuyv_to_bgr(buf, self.width, self.height, min(self.decode_scale, 2))
+
+    def read(self):
+        t0 = time.perf_counter()
+        ret, buf = self.cap.read()
+        t1 = time.perf_counter()
+        if not ret:
+            return False, None
+        frame = self.decode(buf) if self.raw else buf
+        self.stats["frames"] += 1
+        self.stats["read_s"] += t1 - t0
+        self.stats["decode_s"] += time.perf_counter() - t1
+        return frame is not None, frame
+
+    def read_raw(self):
+        """Camera buffer as delivered (JPEG bytes / packed YUYV when raw mode is active)."""
+        return self.cap.read()
+
+
+# --- sample streams --------------------------------------------------------------------------
+
+def write_sample(out_dir, fmt, width, height, buffers, capture_fps=None):
+    """Store raw camera buffers as <fmt>_<w>x<h>.bin plus a JSON index."""
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{fmt}_{width}x{height}")
+    sizes = []
+    with open(base + ".bin", "wb") as f:
+        for b in buffers:
+            data = np.asarray(b, dtype=np.uint8).tobytes()
+            f.write(data)
+            sizes.append(len(data))
+    meta = {"format": fmt, "width": width, "height": height, "sizes": sizes, "capture_fps": capture_fps}
+    with open(base + ".json", "w") as f:
+        json.dump(meta, f)
+    return base
+
+
+def load_samples(sample_dir):
+    """Yield (meta, [raw buffers]) for every recorded sample stream in a directory."""
+    for name in sorted(os.listdir(sample_dir)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(sample_dir, name)) as f:
+            meta = json.load(f)
+        with open(os.path.join(sample_dir, name[:-5] + ".bin"), "rb") as f:
+            data = f.read()
+        buffers, pos = [], 0
+        for n in meta["sizes"]:
+            buffers.append(np.frombuffer(data, dtype=np.uint8, count=n, offset=pos))
+            pos += n
+        yield meta, buffers
+
+
+def record_sample(source, fmt, width, height, frames, out_dir):
+    """Record raw buffers from the camera in the given format (measures capture FPS too)."""
+    cap = FormatCapture(source, width, height, pixel_format=fmt, decode_scale=2)
+    if not cap.isOpened() or not cap.raw:
+        cap.release()
+        raise RuntimeError(f"camera does not deliver raw {fmt} buffers")
+    buffers = []
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        ret, buf = cap.read_raw()
+        if not ret:
+            break
+        buffers.append(buf.copy())
+    fps = len(buffers) / (time.perf_counter() - t0)
+    cap.release()
+    return write_sample(out_dir, fmt, cap.width, cap.height, buffers, round(fps, 2)), fps
+
+
+def synthesize_samples(image_path, out_dir, frames=60, sizes=((1280, 720), (1920, 1080))):
+    """Create MJPEG and YUYV sample streams from a still image (no camera needed)."""
+    img = cv2.imread(image_path)
+    if img is None:
+        img = np.random.default_rng(0).integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+    for w, h in sizes:
+        frame = cv2.resize(img, (w, h))
+        jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])[1]
+        write_sample(out_dir, "MJPG", w, h, [jpeg] * frames)
+        write_sample(out_dir, "YUYV", w, h, [bgr_to_yuyv(frame)] * frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record sample camera streams for benchmark.py capture")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("record", help="record raw buffers from the camera")
+    p.add_argument("--source", default="0")
+    p.add_argument("--format", default="MJPG", choices=["MJPG", "YUYV"])
+    p.add_argument("--width", type=int, default=1920)
+    p.add_argument("--height", type=int, default=1080)
+    p.add_argument("--frames", type=int, default=120)
+    p.add_argument("--out", default="/results/samples")
+    p = sub.add_parser("synthesize", help="create sample streams from a still image")
+    p.add_argument("--image", default="/app/test_image.jpg")
+    p.add_argument("--frames", type=int, default=60)
+    p.add_argument("--out", default="/results/samples")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        source = int(args.source) if args.source.isdigit() else args.source
+        path, fps = record_sample(source, args.format, args.width, args.height, args.frames, args.out)
+        print(f"Saved {path}.bin, camera delivered {fps:.1f} FPS")
+    else:
+        synthesize_samples(args.image, args.out, args.frames)
+        print(f"Sample streams written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+# Description: One entry point for all pipelines, with a shared config schema
+# Instead of editing MODEL_PATH / INPUT_PATH in the scripts or remembering each script's env
+# variables, every pipeline is a subcommand and the performance knobs have the same names
+# everywhere. Settings come from DEFAULTS < JSON config file (--config or $YOLO_APP_CONFIG)
+# < the scripts' existing env variables < command line flags.
+#
+#   python /app/cli.py serve --source synthetic --fps 15 --imgsz 1280 --batch 8
+#   python /app/cli.py serve --app pose --model /app/yolo11n-pose.engine
+#   python /app/cli.py control --source /dev/video0 --port 5002
+#   python /app/cli.py detect-image /data/stills --batch 16 --workers 4 --output /results/stills
+#   python /app/cli.py detect-video /data/dogs.mp4 --imgsz 640 --output /results
+#   python /app/cli.py record --source 0 --fps 30 --queue 64 -- --duration 60 --passthrough
+#   python /app/cli.py bench --imgsz 320 predict --runs 200
+#   python /app/cli.py config --config /app/board.json      (effective settings and where they came from)
+
+import argparse
+import json
+import os
+import runpy
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULTS = {
+    "model": "/app/yolov8n.engine",
+    "source": "0",            # camera index, /dev/videoN or frame_source spec (synthetic, replay:, gst:, bus:)
+    "width": 0,               # capture size, 0 = driver default
+    "height": 0,
+    "pixel_format": "",       # MJPG | YUYV | "" = driver default
+    "imgsz": 640,             # model input size (the stream servers keep their 1920 unless set)
+    "conf": 0.25,
+    "batch": 8,               # images per predict call (/predict micro-batches, detect-image, detect-video)
+    "workers": 4,             # decode threads
+    "fps": 30.0,              # capture / stream rate limit
+    "queue": 256,             # request / frame queue size
+    "encoder": "auto",        # H.264 encoder of the live stream: auto | h264_nvmpi | h264_v4l2m2m | libx264
+    "port": 5001,
+    "output": "/results",
+}
+
+# env variables the scripts already read, per setting: used as a config layer and set for `serve`
+ENV = {
+    "model": ["MODEL_PATH"],
+    "fps": ["FPS_LIMIT"],
+    "imgsz": ["IMGSZ"],
+    "conf": ["FILTER_CONF", "PREDICT_CONF"],
+    "batch": ["PREDICT_MAX_BATCH"],
+    "queue": ["PREDICT_QUEUE"],
+    "encoder": ["LIVE_ENCODER"],
+    "port": ["PORT"],
+    "width": ["CAPTURE_WIDTH"],
+    "height": ["CAPTURE_HEIGHT"],
+    "pixel_format": ["CAPTURE_FORMAT"],
+}
+
+SERVERS = {"detect": "web_stream_v5.py", "pose": "web_stream_pose_v3.py"}
+
+
+def add_common(parser):
+    parser.add_argument("--config", default=os.environ.get("YOLO_APP_CONFIG"), help="JSON file with any of the settings")
+    for key, default in DEFAULTS.items():
+        kind = type(default) if default is not None and not isinstance(default, str) else str
+        parser.add_argument("--" + key.replace("_", "-"), dest=key, type=kind, default=None,
+                            help=f"default {default!r}")
+
+
+def load_config(args):
+    """Effective settings and their origin: DEFAULTS < config file < env < flags."""
+    cfg = dict(DEFAULTS)
+    origin = dict.fromkeys(DEFAULTS, "default")
+    if args.config:
+        with open(args.config) as f:
+            data = json.load(f)
+        unknown = set(data) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown settings in {args.config}: {', '.join(sorted(unknown))}")
+        cfg.update(data)
+        origin.update(dict.fromkeys(data, args.config))
+    for key, names in ENV.items():
+        for name in names:
+            if name in os.environ:
+                cfg[key] = type(DEFAULTS[key])(os.environ[name])
+                origin[key] = "$" + name
+                break
+    if "FRAME_SOURCE" in os.environ or "CAMERA_SOURCE" in os.environ:
+        name = "FRAME_SOURCE" if os.environ.get("FRAME_SOURCE") else "CAMERA_SOURCE"
+        cfg["source"], origin["source"] = os.environ[name], "$" + name
+    for key in DEFAULTS:
+        value = getattr(args, key, None)
+        if value is not None:
+            cfg[key], origin[key] = value, "flag"
+    return cfg, origin
+
+
+def explicit(origin):
+    """Settings the user chose (anything but the built-in default)."""
+    return {k for k, v in origin.items() if v != "default"}
+
+
+def chosen_kwargs(cfg, origin, keys):
+    """The settings among `keys` the user chose; the called function keeps its defaults for the rest."""
+    chosen = explicit(origin)
+    return {k: cfg[k] for k in keys if k in chosen}
+
+
+def run_script(name, argv=()):
+    sys.argv = [os.path.join(APP_DIR, name), *argv]
+    runpy.run_path(sys.argv[0], run_name="__main__")
+
+
+def cmd_serve(args, cfg, origin):
+    chosen = explicit(origin)
+    env = {}
+    for key in chosen & set(ENV):
+        for name in ENV[key]:
+            env[name] = str(cfg[key])
+    if "source" in chosen:
+        source = str(cfg["source"])
+        env["CAMERA_SOURCE" if source.isdigit() else "FRAME_SOURCE"] = source
+    os.environ.update(env)
+    print(f"Starting {SERVERS[args.app]} with " + (" ".join(f"{k}={v}" for k, v in sorted(env.items())) or "defaults"))
+    run_script(SERVERS[args.app])
+
+
+def cmd_control(args, cfg, origin):
+    chosen = explicit(origin)
+    source = str(cfg["source"])
+    if "source" in chosen:
+        if source.startswith("bus:"):
+            os.environ["FRAME_BUS"] = source[4:]
+        else:
+            os.environ["CAM_DEVICE"] = f"/dev/video{source}" if source.isdigit() else source
+    if "port" in chosen:
+        os.environ["STREAM_PORT"] = str(cfg["port"])
+    if "pixel_format" in chosen:
+        os.environ["CAM_FORMAT"] = cfg["pixel_format"]
+    run_script("web_control_stream.py")
+
+
+def cmd_detect_image(args, cfg, origin):
+    from inference import INPUT_PATH_2, list_images, print_report, run_batch, single_image
+    from ultralytics import YOLO
+
+    model = YOLO(cfg["model"])
+    if not args.inputs:
+        single_image(model, INPUT_PATH_2, os.path.join(cfg["output"], "output_image_3.jpg"))
+        return 0
+    files = list_images(args.inputs)
+    if not files:
+        print("No images found in", ", ".join(args.inputs))
+        return 1
+    out_dir = cfg["output"] if "output" in explicit(origin) else "/results/batch"  # inference.py's --out
+    print(f"{len(files)} images")
+    print_report(run_batch(model, files, out_dir=out_dir, save=args.save, json_path=args.json,
+                           **chosen_kwargs(cfg, origin, ("batch", "workers", "imgsz", "conf"))))
+    return 0
+
+
+def cmd_detect_video(args, cfg, origin):
+    from video_inference import INPUT_PATH, run
+
+    run(cfg["model"], args.input or INPUT_PATH, project=cfg["output"], name=args.name,
+        **chosen_kwargs(cfg, origin, ("imgsz", "conf", "batch")))
+    return 0
+
+
+def cmd_record(args, cfg, origin):
+    chosen = explicit(origin)
+    flags = {"source": "--device", "width": "--width", "height": "--height", "fps": "--fps",
+             "pixel_format": "--pixel-format", "queue": "--queue-size", "output": "--output-dir"}
+    argv = []
+    for key, flag in flags.items():
+        if key in chosen:
+            argv += [flag, str(int(cfg[key]) if key == "fps" else cfg[key])]
+    run_script("make_a_video.py", argv + [a for a in args.args if a != "--"])
+
+
+def cmd_bench(args, cfg, origin):
+    import benchmark
+
+    parser = benchmark.build_parser()
+    rest = [a for a in args.args if a != "--"]
+    if rest and rest[0] in parser.commands:
+        # shared knobs become defaults of the chosen benchmark when it has such an option
+        sub = parser.commands[rest[0]]
+        sub.set_defaults(**{k: cfg[k] for k in explicit(origin) if sub.get_default(k) is not None})
+    args = parser.parse_args(rest)
+    args.func(args)
+    return 0
+
+
+def cmd_config(args, cfg, origin):
+    width = max(len(k) for k in cfg)
+    for key, value in cfg.items():
+        print(f"{key:<{width}}  {value!r:<28} {origin[key]}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(cfg, f, indent=2)
+        print("Saved to", args.save)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="YOLO camera pipelines on the Jetson")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="web stream with detection (web_stream_v5.py) or pose (web_stream_pose_v3.py)")
+    p.add_argument("--app", choices=sorted(SERVERS), default="detect")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("control", help="camera control page (web_control_stream.py)")
+    p.set_defaults(func=cmd_control)
+
+    p = sub.add_parser("detect-image", help="one image or folders of stills (inference.py batch mode)")
+    p.add_argument("inputs", nargs="*", help="images, directories or glob patterns")
+    p.add_argument("--no-save", dest="save", action="store_false", help="do not write annotated images")
+    p.add_argument("--json", help="write detections as JSON lines to this file")
+    p.set_defaults(func=cmd_detect_image)
+
+    p = sub.add_parser("detect-video", help="annotate a video file (video_inference.py)")
+    p.add_argument("input", nargs="?", help="video file (default /data/dogs.mp4)")
+    p.add_argument("--name", default="video_output", help="sub-folder of --output")
+    p.set_defaults(func=cmd_detect_video)
+
+    p = sub.add_parser("record", help="record the camera (make_a_video.py), extra flags after --")
+    p.add_argument("args", nargs=argparse.REMAINDER)
+    p.set_defaults(func=cmd_record)
+
+    p = sub.add_parser("bench", help="benchmark.py subcommand, e.g. bench --imgsz 320 predict --runs 200")
+    p.add_argument("args", nargs=argparse.REMAINDER)
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("config", help="print the effective settings")
+    p.add_argument("--save", help="write them as a JSON config file")
+    p.set_defaults(func=cmd_config)
+
+    for p in sub.choices.values():
+        add_common(p)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        cfg, origin = load_config(args)
+    except (OSError, ValueError) as e:
+        print("Error: cannot load config:", e)
+        return 2
+    return args.func(args, cfg, origin) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
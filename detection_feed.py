@@ -0,0 +1,129 @@
+# Description: Per-frame detection metadata pushed to clients as Server-Sent Events
+# Dashboards and scripts that only need class/confidence/box no longer have to decode the
+# MJPEG stream or scrape console output. The producer publishes one compact record per frame;
+# each subscriber gets the newest record only (a slow client skips frames, it never queues
+# them) filtered by its own classes / min_conf, and the browser can draw the boxes itself
+# over a plain low-bitrate video instead of the server drawing them into every JPEG.
+#
+# Record (one SSE "data:" line): {"seq": 812, "ts": 1733400000.123, "w": 1920, "h": 1080,
+#                                 "d": [[cls, conf, x1, y1, x2, y2, track_id], ...]}
+# The first event is "event: names" with the class id -> name list.
+#
+#   curl -N 'http://<jetson-ip>:5001/events?classes=cup,person&conf=0.5'
+
+import json
+import threading
+import time
+
+
+class DetectionFeed:
+    """Latest-record fan-out of detections to SSE subscribers."""
+
+    def __init__(self, names, max_subscribers=32, keepalive=15.0):
+        self.names = [names[k] for k in sorted(names)] if isinstance(names, dict) else list(names)
+        self.max_subscribers = max_subscribers
+        self.keepalive = keepalive
+        self._cond = threading.Condition()
+        self._record = None
+        self._subscribers = set()
+        self._next_id = 0
+        self.rejected = 0
+        self.stopped = False
+
+    def publish(self, seq, width, height, dets, ts=None):
+        """Store the detections of frame `seq` (xyxy/conf/cls[/id] arrays) for all subscribers."""
+        ids = dets.get("id")
+        rows = [[int(k), round(float(c), 3), *(round(float(v), 1) for v in b),
+                 -1 if ids is None else int(ids[i])]
+                for i, (b, c, k) in enumerate(zip(dets["xyxy"], dets["conf"], dets["cls"]))]
+        record = {"seq": seq, "ts": round(time.time() if ts is None else ts, 3), "w": width, "h": height, "d": rows}
+        with self._cond:
+            self._record = record
+            self._cond.notify_all()
+
+    def latest(self, after=None, timeout=0.0):
+        """Newest record; with `after`, wait up to timeout for a record with a higher seq."""
+        with self._cond:
+            if after is not None:
+                self._cond.wait_for(lambda: (self._record is not None and self._record["seq"] > after)
+                                    or self.stopped, timeout)
+            return self._record
+
+    def stop(self):
+        with self._cond:
+            self.stopped = True
+            self._cond.notify_all()
+
+    def class_ids(self, classes):
+        """Parse 'cup,person' or '41,0' into a set of class ids (None = all classes)."""
+        if not classes:
+            return None
+        ids = set()
+        for c in classes.split(","):
+            c = c.strip()
+            if c.isdigit():
+                ids.add(int(c))
+            elif c in self.names:
+                ids.add(self.names.index(c))
+            elif c:
+                raise ValueError(f"unknown class '{c}'")
+        return ids
+
+    @staticmethod
+    def select(record, class_ids=None, min_conf=0.0):
+        """Copy of `record` keeping only the rows that pass the class / confidence filter."""
+        return dict(record, d=[r for r in record["d"]
+                               if r[1] >= min_conf and (class_ids is None or r[0] in class_ids)])
+
+    def subscribe(self):
+        """Reserve a subscriber slot, returns its id or None when max_subscribers are connected.
+
+        The slot is freed when stream() ends or by release(); a response whose body is never
+        iterated (HEAD, client gone before the first event) must call release() on close.
+        """
+        with self._cond:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._next_id += 1
+            self._subscribers.add(self._next_id)
+            return self._next_id
+
+    def release(self, sid):
+        """Free a subscriber slot (idempotent)."""
+        with self._cond:
+            self._subscribers.discard(sid)
+
+    def stream(self, sid, class_ids=None, min_conf=0.0, max_fps=0.0, changes_only=False):
+        """SSE generator for subscriber `sid` (from subscribe())."""
+        interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        last_seq, last_rows, last_sent = -1, None, time.monotonic()
+        try:
+            yield "event: names\ndata: " + json.dumps(self.names) + "\n\n"
+            while True:
+                with self._cond:
+                    while (self._record is None or self._record["seq"] == last_seq) and not self.stopped:
+                        if not self._cond.wait(self.keepalive):
+                            break
+                    if self.stopped:
+                        return
+                    record = self._record
+                if record is None or record["seq"] == last_seq:
+                    yield ": keepalive\n\n"
+                    continue
+                last_seq = record["seq"]
+                record = self.select(record, class_ids, min_conf)
+                now = time.monotonic()
+                if changes_only and record["d"] == last_rows and now - last_sent < self.keepalive:
+                    continue
+                last_rows, last_sent = record["d"], now
+                yield "data: " + json.dumps(record, separators=(",", ":")) + "\n\n"
+                if interval:
+                    time.sleep(interval)
+        finally:
+            self.release(sid)
+
+    def snapshot(self):
+        with self._cond:
+            return {"subscribers": len(self._subscribers), "max_subscribers": self.max_subscribers,
+                    "rejected": self.rejected, "seq": self._record["seq"] if self._record else None}
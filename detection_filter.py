@@ -0,0 +1,149 @@
+# Description: Runtime detection filter (classes, per-class thresholds, max detections)
+# The stream servers used to predict with conf=0.55 over all 80 COCO classes and then drop
+# boxes again in a Python loop (`if conf > 0.6`). A FilterSpec is applied as early as possible:
+# - predict_kwargs(): classes / lowest threshold / max_det go into model.predict, so NMS and
+#   Results only ever see the wanted classes
+# - apply(): the per-class thresholds and max_det as one vectorized mask over the arrays
+# FilterStore holds the current spec for the producer thread and persists it as JSON, so it
+# can be changed from the web API (POST /filter) without a restart.
+#
+# Spec JSON: {"classes": ["cup", "person"], "conf": 0.6, "per_class": {"cup": 0.4}, "max_det": 20}
+# classes null = all classes; per_class overrides conf for single classes.
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class FilterSpec:
+    """Immutable filter: allowed classes, confidence thresholds and max detections per frame."""
+
+    def __init__(self, names, classes=None, conf=0.25, per_class=None, max_det=300):
+        self.names = dict(names) if isinstance(names, dict) else dict(enumerate(names))
+        ids = {v: k for k, v in self.names.items()}
+        if classes is not None and not isinstance(classes, (list, tuple)):
+            raise TypeError("classes must be a list of class names or ids")
+        if per_class is not None and not isinstance(per_class, dict):
+            raise TypeError("per_class must be an object of class -> threshold")
+        self.classes = None if classes is None else sorted({self._class_id(c, ids) for c in classes})
+        self.conf = float(conf)
+        self.per_class = {self._class_id(c, ids): float(v) for c, v in (per_class or {}).items()}
+        self.max_det = int(max_det)
+        if not 0.0 <= self.conf <= 1.0 or any(not 0.0 <= v <= 1.0 for v in self.per_class.values()):
+            raise ValueError("thresholds must be between 0 and 1")
+        if self.max_det < 1:
+            raise ValueError("max_det must be at least 1")
+        # per-class threshold lookup table; excluded classes can never pass
+        nc = max(self.names) + 1 if self.names else 0
+        self.thresholds = np.full(nc, np.inf if self.classes is not None else self.conf, dtype=np.float32)
+        if self.classes is not None:
+            self.thresholds[self.classes] = self.conf
+        for k, v in self.per_class.items():
+            if self.classes is None or k in self.classes:
+                self.thresholds[k] = v
+
+    def _class_id(self, c, ids):
+        if isinstance(c, (int, np.integer)) or (isinstance(c, str) and c.isdigit()):
+            k = int(c)
+            if k not in self.names:
+                raise ValueError(f"unknown class id {k}")
+            return k
+        if c not in ids:
+            raise ValueError(f"unknown class '{c}'")
+        return ids[c]
+
+    @classmethod
+    def from_dict(cls, names, data):
+        if not isinstance(data, dict):
+            raise TypeError("filter spec must be a JSON object")
+        unknown = set(data) - {"classes", "conf", "per_class", "max_det"}
+        if unknown:
+            raise ValueError(f"unknown filter keys: {', '.join(sorted(unknown))}")
+        return cls(names, data.get("classes"), data.get("conf", 0.25), data.get("per_class"),
+                   data.get("max_det", 300))
+
+    def to_dict(self):
+        return {"classes": None if self.classes is None else [self.names[k] for k in self.classes],
+                "conf": self.conf,
+                "per_class": {self.names[k]: v for k, v in self.per_class.items()},
+                "max_det": self.max_det}
+
+    def min_conf(self):
+        """Lowest threshold any class can pass with (what the predictor may filter by)."""
+        finite = self.thresholds[np.isfinite(self.thresholds)]
+        return round(float(finite.min()), 4) if len(finite) else self.conf
+
+    def predict_kwargs(self):
+        """conf / classes / max_det for model.predict (applied inside NMS)."""
+        return {"conf": self.min_conf(), "classes": self.classes, "max_det": self.max_det}
+
+    def keep(self, conf, cls):
+        """Indices of the detections that pass the per-class thresholds, at most max_det (best first)."""
+        conf = np.asarray(conf)
+        keep = np.flatnonzero(conf >= self.thresholds[np.asarray(cls).astype(np.int64)])
+        if len(keep) > self.max_det:
+            keep = keep[np.argsort(-conf[keep], kind="stable")[:self.max_det]]
+        return keep
+
+    def apply(self, dets):
+        """Per-class thresholds and max_det on xyxy/conf/cls[/id] arrays, one vectorized mask."""
+        if len(dets["conf"]) == 0:
+            return dets
+        keep = self.keep(dets["conf"], dets["cls"])
+        if len(keep) == len(dets["conf"]):
+            return dets
+        return {k: np.asarray(v)[keep] for k, v in dets.items()}
+
+
+class FilterStore:
+    """Thread-safe current FilterSpec, optionally persisted to a JSON file."""
+
+    def __init__(self, names, path=None, default=None):
+        self.names = names
+        self.path = path
+        self._lock = threading.Lock()
+        self._spec = FilterSpec.from_dict(names, default or {})
+        self.version = 0
+        self._timing = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._spec = FilterSpec.from_dict(names, json.load(f))
+            except (OSError, ValueError, TypeError) as e:
+                print("Could not read filter config:", e)
+
+    def get(self):
+        return self._spec  # replaced atomically, never mutated
+
+    def set(self, data):
+        """Validate, persist, then apply. Raises OSError (spec not applied) if the file cannot be written."""
+        spec = FilterSpec.from_dict(self.names, data)
+        with self._lock:
+            if self.path:
+                tmp = self.path + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(spec.to_dict(), f, indent=2)
+                os.replace(tmp, self.path)
+            self._spec = spec
+            self.version += 1
+            self._timing = {}
+        return spec
+
+    def record(self, **ms):
+        """Add per-frame stage times (postprocess=..., annotate=..., detections=...) for the current spec."""
+        with self._lock:
+            for k, v in ms.items():
+                n, total = self._timing.get(k, (0, 0.0))
+                self._timing[k] = (n + 1, total + v)
+            self._timing.setdefault("since", (0, time.time()))
+
+    def timing(self):
+        """Mean per-frame stage times since the spec was last changed."""
+        with self._lock:
+            out = {k: round(total / n, 3) for k, (n, total) in self._timing.items() if k != "since" and n}
+            if "since" in self._timing:
+                out["seconds"] = round(time.time() - self._timing["since"][1], 1)
+            return out
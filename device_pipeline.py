@@ -0,0 +1,319 @@
+# Description: Device-resident capture -> preprocess -> inference -> overlay path
+# camera_inference_v2.py used to copy every CUDA frame to the host (cudaToNumpy), run
+# model(frame_numpy) and resx.plot() on the CPU and upload the plotted frame again
+# (cudaFromNumpy). Here the frame stays where it was captured:
+#   - letterbox + normalisation into a reusable input tensor on the device
+#   - the network is called directly (warm Ultralytics AutoBackend), NMS on the device
+#   - boxes and cached label glyphs are drawn into the frame in place with slicing
+# Only the detections (n x 6 floats) come back to the host, label glyphs are uploaded once.
+# Backends share the drawing code: "torch" (CUDA or CPU tensors) and "numpy" (host reference,
+# runs without torch). TransferMeter counts host<->device bytes and time per frame.
+
+import json
+import time
+
+import numpy as np
+
+from annotator import COLORS, Annotator
+from capture_format import letterbox
+
+
+class TransferMeter:
+    """Host<->device bytes and seconds, totals and per frame."""
+
+    def __init__(self):
+        self.frames = 0
+        self.totals = {"h2d_bytes": 0, "d2h_bytes": 0, "h2d_s": 0.0, "d2h_s": 0.0}
+
+    def add(self, direction, nbytes, seconds):
+        self.totals[f"{direction}_bytes"] += int(nbytes)
+        self.totals[f"{direction}_s"] += seconds
+
+    def frame_done(self):
+        self.frames += 1
+
+    def per_frame(self):
+        n = max(1, self.frames)
+        t = self.totals
+        return {
+            "frames": self.frames,
+            "h2d_bytes": t["h2d_bytes"] // n,
+            "d2h_bytes": t["d2h_bytes"] // n,
+            "h2d_ms": round(t["h2d_s"] / n * 1000.0, 3),
+            "d2h_ms": round(t["d2h_s"] / n * 1000.0, 3),
+        }
+
+    def summary(self):
+        st = self.per_frame()
+        return (f"{st['frames']} frames, H2D {st['h2d_bytes']} B/frame ({st['h2d_ms']:.2f} ms), "
+                f"D2H {st['d2h_bytes']} B/frame ({st['d2h_ms']:.2f} ms)")
+
+
+class NumpyBackend:
+    """Host reference backend: 'device' memory is host memory, transfers are free."""
+
+    name = "numpy"
+
+    def __init__(self, imgsz=640, rgb=False, meter=None):
+        self.imgsz = imgsz
+        self.rgb = rgb
+        self.meter = meter or TransferMeter()
+        self._canvas = np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+        self._input = np.empty((1, 3, imgsz, imgsz), dtype=np.float32)
+
+    def upload(self, arr):
+        return arr
+
+    def sync(self):
+        pass
+
+    def download(self, arr):
+        return np.asarray(arr)
+
+    def wrap(self, frame):
+        """Frame as a backend array without copying (numpy array or CUDA image)."""
+        return np.asarray(frame)
+
+    def color(self, bgr):
+        return np.array(bgr[::-1] if self.rgb else bgr, dtype=np.uint8)
+
+    def preprocess(self, img):
+        """Letterbox into the reusable (1, 3, S, S) float input, RGB 0..1. Returns (input, gain, pad)."""
+        canvas, gain, pad = letterbox(img, self.imgsz, self._canvas)
+        chw = canvas.transpose(2, 0, 1) if self.rgb else canvas[..., ::-1].transpose(2, 0, 1)
+        np.multiply(chw, 1.0 / 255.0, out=self._input[0], casting="unsafe")
+        return self._input, gain, pad
+
+
+class TorchBackend(NumpyBackend):
+    """Frames and network input as torch tensors on `device` (cuda or cpu)."""
+
+    name = "torch"
+
+    def __init__(self, imgsz=640, rgb=False, meter=None, device="cuda", half=False):
+        import torch
+        import torch.nn.functional as F
+        self.torch = torch
+        self.F = F
+        self.device = torch.device(device)
+        self.imgsz = imgsz
+        self.rgb = rgb
+        self.meter = meter or TransferMeter()
+        self.dtype = torch.float16 if half else torch.float32
+        self._input = torch.empty((1, 3, imgsz, imgsz), dtype=self.dtype, device=self.device)
+        self._colors = {}
+
+    def sync(self):
+        if self.device.type == "cuda":
+            self.torch.cuda.synchronize(self.device)
+
+    def upload(self, arr):
+        if isinstance(arr, self.torch.Tensor) and arr.device == self.device:
+            return arr
+        t0 = time.perf_counter()
+        out = self.torch.as_tensor(np.ascontiguousarray(arr)).to(self.device)
+        self.sync()
+        if self.device.type != "cpu":
+            self.meter.add("h2d", out.numel() * out.element_size(), time.perf_counter() - t0)
+        return out
+
+    def download(self, t):
+        if not isinstance(t, self.torch.Tensor):
+            return np.asarray(t)
+        if t.device.type == "cpu":
+            return t.numpy()
+        t0 = time.perf_counter()
+        out = t.cpu().numpy()
+        self.meter.add("d2h", out.nbytes, time.perf_counter() - t0)
+        return out
+
+    def wrap(self, frame):
+        # jetson_utils cudaImage exposes __cuda_array_interface__: a view, no copy
+        if hasattr(frame, "__cuda_array_interface__"):
+            return self.torch.as_tensor(frame, device=self.device)
+        return self.upload(frame)
+
+    def color(self, bgr):
+        key = tuple(int(c) for c in bgr)
+        c = self._colors.get(key)
+        if c is None:
+            c = self._colors[key] = self.upload(NumpyBackend.color(self, key))
+        return c
+
+    def preprocess(self, img):
+        h, w = img.shape[:2]
+        s = self.imgsz
+        gain = min(s / h, s / w)
+        nh, nw = int(round(h * gain)), int(round(w * gain))
+        px, py = (s - nw) // 2, (s - nh) // 2
+        x = img.permute(2, 0, 1).unsqueeze(0)
+        if not self.rgb:
+            x = x.flip(1)
+        x = self.F.interpolate(x.to(self.dtype), size=(nh, nw), mode="bilinear", align_corners=False)
+        self._input.fill_(114 / 255.0)
+        self._input[:, :, py:py + nh, px:px + nw] = x / 255.0
+        return self._input, gain, (px, py)
+
+
+def export_metadata(model_path):
+    """Metadata of an Ultralytics TensorRT export (JSON header before the engine), {} otherwise."""
+    if not str(model_path).endswith(".engine"):
+        return {}
+    try:
+        with open(model_path, "rb") as f:
+            n = int.from_bytes(f.read(4), byteorder="little")
+            meta = json.loads(f.read(n).decode("utf-8"))
+    except (OSError, ValueError, UnicodeDecodeError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def export_imgsz(model_path, default=640):
+    """Input size the model was exported with, else default.
+
+    A static engine only accepts that size, the DeviceDetector input must match it.
+    """
+    imgsz = export_metadata(model_path).get("imgsz", default)
+    return max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+
+def export_max_batch(model_path):
+    """Most images one predict call may carry: 1 for a static TensorRT engine, the export batch
+    for a dynamic one (yolo export ... format=engine batch=8 dynamic=True), None = no limit.
+    """
+    if not str(model_path).endswith(".engine"):
+        return None
+    meta = export_metadata(model_path)
+    batch = int(meta.get("batch", 1))
+    dynamic = (meta.get("args") or {}).get("dynamic", batch > 1)
+    return batch if dynamic else 1
+
+
+def make_backend(name="torch", **kwargs):
+    if name == "numpy":
+        kwargs.pop("device", None)
+        kwargs.pop("half", None)
+        return NumpyBackend(**kwargs)
+    return TorchBackend(**kwargs)
+
+
+class DeviceAnnotator:
+    """Boxes and labels drawn into a backend array in place.
+
+    Label glyphs come from Annotator's cache (rendered once on the host) and are uploaded once
+    per glyph, so steady-state drawing does no host<->device traffic.
+    """
+
+    def __init__(self, backend, names, thickness=2, max_cache=1024):
+        self.backend = backend
+        self.annotator = Annotator(names)
+        self.thickness = thickness
+        self.max_cache = max_cache
+        self._glyphs = {}
+
+    def _device_glyph(self, glyph):
+        key = id(glyph)
+        entry = self._glyphs.get(key)
+        if entry is None or entry[0] is not glyph:
+            if len(self._glyphs) >= self.max_cache:
+                self._glyphs.clear()
+            img = glyph[..., ::-1] if self.backend.rgb else glyph
+            entry = self._glyphs[key] = (glyph, self.backend.upload(np.ascontiguousarray(img)))
+        return entry[1]
+
+    def box(self, img, x1, y1, x2, y2, color):
+        h, w = img.shape[:2]
+        t = self.thickness
+        x1, x2 = max(0, min(x1, w - 1)), max(0, min(x2, w))
+        y1, y2 = max(0, min(y1, h - 1)), max(0, min(y2, h))
+        if x2 - x1 <= 2 * t or y2 - y1 <= 2 * t:
+            return
+        img[y1:y1 + t, x1:x2] = color
+        img[y2 - t:y2, x1:x2] = color
+        img[y1:y2, x1:x1 + t] = color
+        img[y1:y2, x2 - t:x2] = color
+
+    def draw(self, img, det):
+        """det: host (n, 6) array of x1, y1, x2, y2, conf, cls in img coordinates."""
+        for x1, y1, x2, y2, conf, cls in det:
+            k = int(cls)
+            self.box(img, int(x1), int(y1), int(x2), int(y2), self.backend.color(COLORS[k % len(COLORS)]))
+            glyph = self.annotator.label_glyph(k, float(conf))
+            Annotator._paste(img, self._device_glyph(glyph), int(x1), int(y1) - glyph.shape[0])
+        return img
+
+
+class DeviceDetector:
+    """Ultralytics model called directly on a device input tensor (no Results, no host copies).
+
+    The predictor is set up once with a dummy frame, then its AutoBackend network is reused.
+    """
+
+    def __init__(self, model, backend, conf=0.25, iou=0.45, max_det=300):
+        import torch
+        try:
+            from ultralytics.utils.nms import non_max_suppression
+        except ImportError:
+            from ultralytics.utils.ops import non_max_suppression
+        self.torch = torch
+        self.nms = non_max_suppression
+        self.backend = backend
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        model.predict(np.zeros((backend.imgsz, backend.imgsz, 3), dtype=np.uint8), imgsz=backend.imgsz, verbose=False)
+        self.net = model.predictor.model
+        self.names = model.names
+        self.half = bool(getattr(self.net, "fp16", False))
+
+    def _to_net(self, inp):
+        device = getattr(self.net, "device", None)
+        if not isinstance(inp, np.ndarray):
+            return inp if device is None else inp.to(device)
+        # host input (numpy backend): this upload is the per-frame H2D the device path avoids
+        t0 = time.perf_counter()
+        out = self.torch.from_numpy(inp)
+        if device is not None and device.type != "cpu":
+            out = out.to(device)
+            self.torch.cuda.synchronize(device)
+            self.backend.meter.add("h2d", inp.nbytes, time.perf_counter() - t0)
+        return out
+
+    def _to_host(self, det):
+        if det.device.type == "cpu":
+            return det.numpy()
+        t0 = time.perf_counter()
+        out = det.cpu().numpy()
+        self.backend.meter.add("d2h", out.nbytes, time.perf_counter() - t0)
+        return out
+
+    def __call__(self, img):
+        """Detections for a backend frame as a host (n, 6) array in frame coordinates."""
+        inp, gain, pad = self.backend.preprocess(img)
+        return self.infer(inp, gain, pad, img.shape[:2])
+
+    def infer(self, inp, gain, pad, shape):
+        """Run on an already letterboxed (1, 3, S, S) RGB 0..1 input (e.g. the backend's reusable
+        buffer filled by the caller) and map boxes back to a frame of the given (h, w)."""
+        px, py = pad
+        h, w = shape
+        inp = self._to_net(inp)
+        with self.torch.inference_mode():
+            preds = self.net(inp.half() if self.half else inp.float())
+            if isinstance(preds, (list, tuple)):
+                preds = preds[0]
+            det = self.nms(preds, self.conf, self.iou, max_det=self.max_det)[0]
+            det[:, [0, 2]] -= px
+            det[:, [1, 3]] -= py
+            det[:, :4] /= gain
+            det[:, [0, 2]] = det[:, [0, 2]].clamp(0, w)
+            det[:, [1, 3]] = det[:, [1, 3]].clamp(0, h)
+        # only the detections leave the device
+        return self._to_host(det.float())
+
+
+def compact(det, names):
+    """(n, 6) detections as short JSON-friendly dicts instead of whole Results objects."""
+    return [{"cls": names.get(int(k), int(k)), "conf": round(float(c), 3),
+             "box": [int(round(v)) for v in (x1, y1, x2, y2)]}
+            for x1, y1, x2, y2, c, k in det]
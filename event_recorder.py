@@ -0,0 +1,169 @@
+# Description: Event-triggered segment recording with a pre-event ring buffer
+# Keeps the last PRE seconds of already-encoded JPEG frames in memory. When a detector event
+# fires (e.g. a new cup track in web_stream_v5.py) the buffer plus the following POST seconds
+# are written to a segment file. Further events during a segment extend it.
+# Disk I/O happens only for events, in a background writer thread, and the segment directory
+# is kept under a retention limit (total size / number of segments / age). At most max_queue
+# frames wait for the writer; when the disk stalls further frames are dropped, not buffered.
+
+import collections
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from recorder import MjpegStreamWriter
+
+
+class EventRecorder:
+    """Ring buffer of encoded frames that is flushed to a segment file when trigger() is called."""
+
+    def __init__(self, output_dir, pre_seconds=5.0, post_seconds=5.0, fps=15.0,
+                 max_bytes=2 * 1024 ** 3, max_segments=200, max_age_days=None, budget=None, max_queue=256):
+        self.output_dir = output_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.max_bytes = max_bytes
+        self.max_segments = max_segments
+        self.max_age_days = max_age_days
+        # optional admission.MemoryBudget: the pre-buffer gives up its oldest frames when it is full
+        self.budget = budget
+        self.dropped = 0
+        self.max_queue = max_queue
+        self.write_dropped = 0  # segment frames dropped because the writer fell behind
+        os.makedirs(output_dir, exist_ok=True)
+
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._active_until = None
+        self._segment = None
+        # frames are queued only while fewer than max_queue items wait; open/close always go in
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._writer_loop, name="event-writer", daemon=True)
+        self._thread.start()
+
+    def _measured_fps(self):
+        if len(self._buffer) < 2:
+            return self.fps
+        span = self._buffer[-1][0] - self._buffer[0][0]
+        return (len(self._buffer) - 1) / span if span > 0 else self.fps
+
+    def _pop_oldest(self):
+        _, jpeg = self._buffer.popleft()
+        if self.budget is not None:
+            self.budget.release(len(jpeg))
+
+    def _prune(self, now):
+        while self._buffer and now - self._buffer[0][0] > self.pre_seconds:
+            self._pop_oldest()
+
+    def add(self, ts, jpeg):
+        """Add one encoded frame (capture time ts, JPEG bytes). Cheap: no disk I/O here."""
+        with self._lock:
+            if self.budget is not None:
+                while not self.budget.reserve(len(jpeg)):
+                    if not self._buffer:
+                        self.dropped += 1
+                        return
+                    self._pop_oldest()
+            self._buffer.append((ts, jpeg))
+            self._prune(ts)
+            if self._segment is not None:
+                if ts <= self._active_until:
+                    if self._queue.qsize() < self.max_queue:
+                        self._queue.put(("frame", self._segment, jpeg))
+                        self._segment["frames"] += 1
+                    else:
+                        self._segment["dropped"] += 1
+                        self.write_dropped += 1
+                else:
+                    self._queue.put(("close", self._segment, None))
+                    self._segment = None
+
+    def trigger(self, event, ts=None, info=None):
+        """Start a segment (buffer + post_seconds) or extend the running one."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._active_until = ts + self.post_seconds
+            if self._segment is None:
+                self._prune(ts)
+                name = f"event_{datetime.fromtimestamp(ts).strftime('%Y%m%d_%H%M%S')}_{event}"
+                self._segment = {
+                    "path": os.path.join(self.output_dir, name + ".avi"),
+                    "fps": round(self._measured_fps(), 2),
+                    "start": self._buffer[0][0] if self._buffer else ts,
+                    "events": [],
+                    "frames": len(self._buffer),
+                    "dropped": 0,
+                }
+                self._queue.put(("open", self._segment, [j for _, j in self._buffer]))
+            self._segment["events"].append({"event": event, "time": ts, "info": info})
+
+    def recording(self):
+        with self._lock:
+            return self._segment is not None
+
+    def close(self):
+        """Finish the running segment and stop the writer thread."""
+        with self._lock:
+            if self._segment is not None:
+                self._queue.put(("close", self._segment, None))
+                self._segment = None
+        self._queue.put(("stop", None, None))
+        self._thread.join(timeout=5.0)
+
+    def _writer_loop(self):
+        writers = {}
+        while True:
+            op, seg, data = self._queue.get()
+            if op == "stop":
+                break
+            key = id(seg)
+            if op == "open":
+                writer = MjpegStreamWriter(seg["path"], seg["fps"])
+                seg["path"] = writer.path
+                writers[key] = writer
+                for jpeg in data:
+                    writer.write(jpeg)
+                print("Event segment started:", seg["path"])
+            elif op == "frame" and key in writers:
+                writers[key].write(data)
+            elif op == "close" and key in writers:
+                writers.pop(key).release()
+                seg["end"] = time.time()
+                with open(os.path.splitext(seg["path"])[0] + ".json", "w") as f:
+                    json.dump(seg, f, indent=2)
+                print(f"Event segment saved: {seg['path']} ({seg['frames']} frames)")
+                self._apply_retention()
+        for writer in writers.values():
+            writer.release()
+
+    def _apply_retention(self):
+        """Delete the oldest segments until size / count / age limits hold."""
+        segments = []
+        for name in os.listdir(self.output_dir):
+            if name.startswith("event_") and not name.endswith(".json"):
+                path = os.path.join(self.output_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # removed meanwhile
+                segments.append((st.st_mtime, st.st_size, path))
+        segments.sort()
+        total = sum(s[1] for s in segments)
+        now = time.time()
+        while segments:
+            mtime, size, path = segments[0]
+            too_old = self.max_age_days is not None and now - mtime > self.max_age_days * 86400
+            if not (total > self.max_bytes or len(segments) > self.max_segments or too_old):
+                break
+            for p in (path, os.path.splitext(path)[0] + ".json"):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+            segments.pop(0)
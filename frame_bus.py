@@ -0,0 +1,321 @@
+# Description: Shared-memory frame bus, one capture daemon and any number of local consumers
+# /dev/video0 can only be opened by one process, so the control UI, a recorder and a detector
+# could not run at the same time. The daemon opens the camera once, decodes once and writes
+# BGR frames into a ring of slots in shared memory (/dev/shm/<name>) with sequence numbers.
+# Consumers map the same memory and read the newest frame without another decode; with
+# zero_copy=True they get a numpy view straight into the slot (valid until the ring wraps,
+# check with valid()).
+#
+# Layout: 64-byte header (magic, geometry, fps, write_seq, closed), per-slot (seq, ts) table,
+# then `slots` frame buffers. A slot's seq is 0 while it is being written (seqlock).
+#
+#   python /app/frame_bus.py serve --source 0 --width 1280 --height 720 --fps 30 --format MJPG
+#   FRAME_SOURCE=bus:yolo_cam0 python /app/web_stream_v5.py
+#   python /app/make_a_video.py --device bus:yolo_cam0 --duration 30
+#   python /app/frame_bus.py stat
+
+import argparse
+import os
+import signal
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+DEFAULT_NAME = os.environ.get("FRAME_BUS", "yolo_cam0")
+MAGIC = 0x31424659  # "YFB1"
+HEADER_BYTES = 64
+
+
+def _align(n, a=4096):
+    return (n + a - 1) // a * a
+
+
+def _attach(name):
+    """Open an existing segment without letting this process' resource tracker unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: every attaching process registers the segment and removes it at exit
+        shm = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class _Layout:
+    """numpy views over a mapped bus segment."""
+
+    def __init__(self, shm, slots=None, width=None, height=None, channels=3, fps=0.0, create=False):
+        buf = shm.buf
+        self.meta = np.ndarray((8,), dtype=np.uint32, buffer=buf, offset=0)
+        self.fps = np.ndarray((1,), dtype=np.float64, buffer=buf, offset=32)
+        self.write_seq = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=40)
+        self.closed = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=48)
+        if create:
+            self.meta[:] = (0, 1, slots, width, height, channels, os.getpid(), 0)
+            self.fps[0] = fps
+            self.write_seq[0] = 0
+            self.closed[0] = 0
+        elif self.meta[0] != MAGIC:
+            raise RuntimeError(f"{shm.name} is not a frame bus (or the daemon is still starting)")
+        _, _, self.slots, self.width, self.height, self.channels, self.pid, _ = (int(v) for v in self.meta)
+        self.seqs = np.ndarray((self.slots,), dtype=np.uint64, buffer=buf, offset=HEADER_BYTES)
+        self.ts = np.ndarray((self.slots,), dtype=np.float64, buffer=buf, offset=HEADER_BYTES + 8 * self.slots)
+        data = _align(HEADER_BYTES + 16 * self.slots)
+        self.frames = np.ndarray((self.slots, self.height, self.width, self.channels), dtype=np.uint8,
+                                 buffer=buf, offset=data)
+        if create:
+            self.seqs[:] = 0
+            self.meta[0] = MAGIC  # last: readers only attach to complete headers
+
+    @staticmethod
+    def size(slots, width, height, channels=3):
+        return _align(HEADER_BYTES + 16 * slots) + slots * width * height * channels
+
+
+class FrameBusWriter:
+    """Daemon side: owns the segment and publishes frames into the ring."""
+
+    def __init__(self, name, width, height, channels=3, slots=8, fps=0.0):
+        size = _Layout.size(slots, width, height, channels)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            old = _attach(name)
+            pid = int(np.ndarray((8,), dtype=np.uint32, buffer=old.buf)[6]) if old.size >= 32 else 0
+            old.close()
+            if pid and _alive(pid):
+                raise RuntimeError(f"frame bus {name} is already served by pid {pid}")
+            # stale segment from a daemon that died
+            shared_memory.SharedMemory(name=name).unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = name
+        self.layout = _Layout(self.shm, slots, width, height, channels, fps, create=True)
+        self.seq = 0
+
+    def publish(self, frame, ts=None):
+        """Copy one frame into the next slot (the only copy on the way to every consumer)."""
+        lay = self.layout
+        seq = self.seq + 1
+        i = (seq - 1) % lay.slots
+        lay.seqs[i] = 0
+        if frame.shape != lay.frames.shape[1:]:
+            frame = cv2.resize(frame, (lay.width, lay.height))
+        np.copyto(lay.frames[i], frame)
+        lay.ts[i] = time.monotonic() if ts is None else ts
+        lay.seqs[i] = seq
+        lay.write_seq[0] = seq
+        self.seq = seq
+        return seq
+
+    def close(self):
+        self.layout.closed[0] = 1
+        del self.layout
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a frame view is still referenced; the mapping goes away with the process
+        self.shm.unlink()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class FrameBusReader:
+    """Consumer side: newest-frame reads from a bus, skipping frames it was too slow for."""
+
+    def __init__(self, name=DEFAULT_NAME, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.shm = _attach(name)
+                self.layout = _Layout(self.shm)
+                break
+            except (FileNotFoundError, RuntimeError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        self.name = name
+        self.last_seq = 0
+        self.missed = 0
+        self.torn = 0
+        self.timeout = timeout
+        fps = float(self.layout.fps[0])
+        self._poll = min(0.005, 0.25 / fps) if fps > 0 else 0.002
+
+    @property
+    def closed(self):
+        return bool(self.layout.closed[0])
+
+    def read(self, zero_copy=False):
+        """Block until a frame newer than the last one is available.
+
+        Returns (ok, frame, ts, seq). zero_copy returns a view into shared memory; it stays
+        valid until the writer wraps around the ring (see valid()).
+        """
+        lay = self.layout
+        deadline = time.monotonic() + self.timeout
+        while True:
+            seq = int(lay.write_seq[0])
+            if seq > self.last_seq:
+                i = (seq - 1) % lay.slots
+                if int(lay.seqs[i]) == seq:
+                    ts = float(lay.ts[i])
+                    frame = lay.frames[i] if zero_copy else lay.frames[i].copy()
+                    if int(lay.seqs[i]) == seq:
+                        if self.last_seq:
+                            self.missed += seq - self.last_seq - 1
+                        self.last_seq = seq
+                        return True, frame, ts, seq
+                    self.torn += 1
+                continue
+            if self.closed or time.monotonic() > deadline:
+                return False, None, None, seq
+            time.sleep(self._poll)
+
+    def valid(self, seq):
+        """True while the slot of frame `seq` has not been overwritten."""
+        return int(self.layout.seqs[(seq - 1) % self.layout.slots]) == seq
+
+    def close(self):
+        del self.layout
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # zero-copy frames still referenced by the caller
+
+
+class BusCapture:
+    """cv2.VideoCapture-like wrapper so existing capture code (Recorder, producers) can read the bus.
+
+    Camera controls stay with the daemon's device (v4l2-ctl), set() is a no-op here.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, zero_copy=False, timeout=5.0):
+        try:
+            self.reader = FrameBusReader(name, timeout)
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"Cannot attach to frame bus {name}: {e}")
+            self.reader = None
+        self.zero_copy = zero_copy
+
+    def isOpened(self):
+        return self.reader is not None and not self.reader.closed
+
+    def read(self):
+        if self.reader is None:
+            return False, None
+        ok, frame, _, _ = self.reader.read(self.zero_copy)
+        return ok, frame
+
+    def get(self, prop):
+        if self.reader is None:
+            return 0.0
+        lay = self.reader.layout
+        return {cv2.CAP_PROP_FRAME_WIDTH: lay.width, cv2.CAP_PROP_FRAME_HEIGHT: lay.height,
+                cv2.CAP_PROP_FPS: float(lay.fps[0])}.get(prop, 0.0)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+def bus_caps(name=DEFAULT_NAME):
+    """Capabilities in camera_probe format: the one size and rate the daemon publishes."""
+    reader = FrameBusReader(name, timeout=1.0)
+    lay = reader.layout
+    caps = {
+        "device": f"bus:{name}",
+        "identity": {"name": f"frame bus {name}", "pid": lay.pid},
+        "formats": {"unknown": [{"width": lay.width, "height": lay.height,
+                                 "fps": [float(lay.fps[0])] if lay.fps[0] else []}]},
+        "method": "frame_bus",
+        "probed_at": time.time(),
+    }
+    reader.close()
+    return caps
+
+
+def serve(args):
+    from frame_source import open_source
+
+    source = open_source(args.source, args.width, args.height, args.fps, pixel_format=args.format,
+                         decode_scale=args.decode_scale)
+    if not source.isOpened():
+        print(f"Cannot open {args.source}")
+        return 1
+    ok, frame, ts = source.read()
+    if not ok:
+        print(f"No frames from {args.source}")
+        return 1
+    h, w = frame.shape[:2]
+    writer = FrameBusWriter(args.name, w, h, frame.shape[2], args.slots, args.fps or 0.0)
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *a: stop.append(1))
+    print(f"Serving {args.source} as bus:{args.name} ({w}x{h}, {args.slots} slots, "
+          f"{_Layout.size(args.slots, w, h) / 1e6:.1f} MB in /dev/shm)")
+    t0, n = time.monotonic(), 0
+    try:
+        while ok and not stop:
+            writer.publish(frame, ts)
+            n += 1
+            if args.report and n % args.report == 0:
+                st = source.stats()
+                print(f"{n} frames, {n / (time.monotonic() - t0):.1f} FPS, read p95 {st['read_ms_p95']:.1f} ms")
+            ok, frame, ts = source.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        source.release()
+    return 0
+
+
+def stat(args):
+    reader = FrameBusReader(args.name, timeout=1.0)
+    lay = reader.layout
+    s0, t0 = int(lay.write_seq[0]), time.monotonic()
+    time.sleep(1.0)
+    s1 = int(lay.write_seq[0])
+    print(f"bus:{args.name} pid {lay.pid}: {lay.width}x{lay.height}x{lay.channels}, {lay.slots} slots, "
+          f"seq {s1}, {(s1 - s0) / (time.monotonic() - t0):.1f} FPS{' (closed)' if reader.closed else ''}")
+    reader.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory frame bus")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="capture daemon: open the camera once and publish frames")
+    p.add_argument("--source", default="0", help="frame_source spec (0, /dev/video0, synthetic, gst:...)")
+    p.add_argument("--name", default=DEFAULT_NAME)
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--format", default="MJPG", help="camera pixel format, '' for driver default")
+    p.add_argument("--decode-scale", type=int, default=1)
+    p.add_argument("--slots", type=int, default=8)
+    p.add_argument("--report", type=int, default=300, help="print FPS every N frames, 0 = quiet")
+    p.set_defaults(func=serve)
+    p = sub.add_parser("stat", help="show bus geometry and publish rate")
+    p.add_argument("--name", default=DEFAULT_NAME)
+    p.set_defaults(func=stat)
+    args = parser.parse_args()
+    raise SystemExit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,369 @@
+# Description: One frame-source interface for all capture paths
+# The scripts used to capture in three different ways (cv2.VideoCapture, Ultralytics' own
+# camera source, jetson_utils videoSource) with different performance and no common API.
+# Every backend here has the same methods:
+#   read() -> (ok, frame, ts)   BGR numpy frame, capture timestamp in seconds (time.monotonic)
+#   for frame, ts in source: ...
+#   stats() -> frames, fps, read latency mean/p50/p95, zero-copy flag
+# Backends:
+#   OpenCVSource     camera index, /dev/videoN or video file (FormatCapture, optional pixel format)
+#   GStreamerSource  GStreamer pipeline string ending in appsink (CSI cameras via nvarguscamerasrc)
+#   JetsonSource     jetson_utils videoSource (csi://0, /dev/video0, rtsp://...), zero-copy mapped memory
+#   ReplaySource     frames from a video file, image(s) or a synthetic pattern, held in memory
+#                    and paced at a fixed fps; for testing the pipeline without camera hardware
+#   FrameBusSource   frames shared by the frame_bus.py capture daemon (bus:<name>)
+#
+#   python /app/frame_source.py synthetic:1920x1080@30 --frames 300
+#   python /app/frame_source.py "gst:nvarguscamerasrc ! nvvidconv ! video/x-raw,format=BGRx ! videoconvert ! appsink"
+
+import argparse
+import collections
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from capture_format import FormatCapture
+
+
+class FrameSource:
+    """Base class: subclasses implement _read() -> (ok, frame, ts or None)."""
+
+    name = "source"
+    zero_copy = False
+
+    def __init__(self, window=300):
+        self.frames = 0
+        self.started = None
+        self.read_ms = collections.deque(maxlen=window)
+
+    def isOpened(self):
+        return True
+
+    def _read(self):
+        raise NotImplementedError
+
+    def read(self):
+        t0 = time.monotonic()
+        ok, frame, ts = self._read()
+        t1 = time.monotonic()
+        if not ok:
+            return False, None, t1
+        if self.started is None:
+            self.started = t0
+        self.frames += 1
+        self.read_ms.append((t1 - t0) * 1000.0)
+        return True, frame, ts if ts is not None else t1
+
+    def __iter__(self):
+        while True:
+            ok, frame, ts = self.read()
+            if not ok:
+                return
+            yield frame, ts
+
+    def release(self):
+        pass
+
+    def stats(self):
+        ms = np.asarray(self.read_ms) if self.read_ms else np.zeros(1)
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {
+            "backend": self.name,
+            "frames": self.frames,
+            "fps": round(self.frames / elapsed, 2) if elapsed > 0 else 0.0,
+            "read_ms_mean": round(float(ms.mean()), 3),
+            "read_ms_p50": round(float(np.percentile(ms, 50)), 3),
+            "read_ms_p95": round(float(np.percentile(ms, 95)), 3),
+            "zero_copy": self.zero_copy,
+        }
+
+
+class OpenCVSource(FrameSource):
+    """cv2.VideoCapture through FormatCapture.
+
+    zero_copy=True reuses one output array for every read (no allocation per frame); the caller
+    must then be done with a frame before reading the next one.
+    """
+
+    name = "opencv"
+
+    def __init__(self, source, width=None, height=None, fps=None, pixel_format="", decode_scale=1,
+                 zero_copy=False, api_preference=None):
+        super().__init__()
+        self.cap = FormatCapture(source, width, height, fps, pixel_format=pixel_format, decode_scale=decode_scale,
+                                 api_preference=api_preference)
+        # reusing the buffer only works when OpenCV decodes (FormatCapture.raw allocates per decode)
+        self.zero_copy = zero_copy and not self.cap.raw
+        self._buf = None
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _read(self):
+        if self.zero_copy:
+            ok, frame = self.cap.cap.read(self._buf)
+            if ok:
+                self._buf = frame
+        else:
+            ok, frame = self.cap.read()
+        # files carry a presentation time, cameras are stamped on arrival by read()
+        ts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 if ok and self.is_file else None
+        return ok, frame, ts
+
+    def release(self):
+        self.cap.release()
+
+
+def nvargus_pipeline(sensor_id=0, width=1920, height=1080, fps=30, flip=0):
+    """CSI camera on Jetson: ISP output converted to BGR for appsink."""
+    return (f"nvarguscamerasrc sensor-id={sensor_id} ! "
+            f"video/x-raw(memory:NVMM),width={width},height={height},framerate={fps}/1,format=NV12 ! "
+            f"nvvidconv flip-method={flip} ! video/x-raw,format=BGRx ! videoconvert ! video/x-raw,format=BGR ! "
+            f"appsink drop=true max-buffers=1 sync=false")
+
+
+def v4l2_pipeline(device="/dev/video0", width=1920, height=1080, fps=30, pixel_format="MJPG"):
+    """USB camera through GStreamer, MJPEG decoded by jpegdec (nvjpegdec can be swapped in)."""
+    if pixel_format == "MJPG":
+        caps = f"image/jpeg,width={width},height={height},framerate={fps}/1 ! jpegdec"
+    else:
+        caps = f"video/x-raw,format=YUY2,width={width},height={height},framerate={fps}/1"
+    return (f"v4l2src device={device} io-mode=2 ! {caps} ! videoconvert ! video/x-raw,format=BGR ! "
+            f"appsink drop=true max-buffers=1 sync=false")
+
+
+class GStreamerSource(OpenCVSource):
+    """GStreamer pipeline string read through OpenCV's CAP_GSTREAMER backend."""
+
+    name = "gstreamer"
+
+    def __init__(self, pipeline, zero_copy=False):
+        super().__init__(pipeline, zero_copy=zero_copy, api_preference=cv2.CAP_GSTREAMER)
+        self.pipeline = pipeline
+        self.is_file = False
+
+
+class JetsonSource(FrameSource):
+    """jetson_utils videoSource. Frames are numpy views of CUDA mapped memory (no copy);
+    the view is only valid until the ring buffer wraps, so copy frames you keep."""
+
+    name = "jetson"
+    zero_copy = True
+
+    def __init__(self, uri="csi://0", argv=(), pixel_format="bgr8", timeout=1000):
+        super().__init__()
+        # imported here so the other backends work without jetson_utils installed
+        from jetson_utils import cudaDeviceSynchronize, cudaToNumpy, videoSource
+        self._to_numpy = cudaToNumpy
+        self._sync = cudaDeviceSynchronize
+        self.source = videoSource(uri, argv=list(argv))
+        self.pixel_format = pixel_format
+        self.timeout = timeout
+        self.last_cuda = None
+
+    def isOpened(self):
+        return self.source.IsStreaming()
+
+    def _read(self):
+        while True:
+            img = self.source.Capture(format=self.pixel_format, timeout=self.timeout)
+            if img is not None:
+                break
+            if not self.source.IsStreaming():
+                return False, None, None
+        # keep the CUDA image around for callers that stay on the GPU
+        self.last_cuda = img
+        self._sync()
+        ts = getattr(img, "timestamp", 0)
+        return True, self._to_numpy(img), (ts / 1e9 if ts else None)
+
+    def release(self):
+        self.source.Close()
+
+
+class FrameBusSource(FrameSource):
+    """Frames from a frame_bus capture daemon (shared memory, no decode, optional zero-copy)."""
+
+    name = "frame_bus"
+
+    def __init__(self, bus_name, zero_copy=False):
+        super().__init__()
+        from frame_bus import FrameBusReader
+        self.reader = FrameBusReader(bus_name)
+        self.zero_copy = zero_copy
+
+    def isOpened(self):
+        return not self.reader.closed
+
+    def _read(self):
+        ok, frame, ts, _ = self.reader.read(self.zero_copy)
+        return ok, frame, ts
+
+    def stats(self):
+        st = super().stats()
+        st["missed"] = self.reader.missed
+        return st
+
+    def release(self):
+        self.reader.close()
+
+
+def synthetic_frames(width=1280, height=720, count=60, seed=0):
+    """Moving boxes on a gradient background, enough texture for decode/encode paths."""
+    rng = np.random.default_rng(seed)
+    base = np.zeros((height, width, 3), dtype=np.uint8)
+    base[..., 0] = np.linspace(40, 200, width, dtype=np.uint8)[None, :]
+    base[..., 1] = np.linspace(40, 160, height, dtype=np.uint8)[:, None]
+    base[..., 2] = 90
+    boxes = rng.uniform(0, 1, (6, 4)) * (width * 0.8, height * 0.8, width * 0.2, height * 0.2)
+    velocity = rng.uniform(-8, 8, (6, 2))
+    colors = rng.integers(0, 255, (6, 3))
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        for (x, y, w, h), (vx, vy), c in zip(boxes, velocity, colors):
+            x0 = int((x + vx * i) % (width - w))
+            y0 = int((y + vy * i) % (height - h))
+            cv2.rectangle(frame, (x0, y0), (x0 + int(w), y0 + int(h)), [int(v) for v in c], -1)
+        cv2.putText(frame, f"frame {i}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(path, max_frames=300, width=None):
+    """Frames from a video file, a single image or a directory of images."""
+    if os.path.isdir(path):
+        files = sorted(f for ext in ("jpg", "jpeg", "png", "bmp") for f in glob.glob(os.path.join(path, f"*.{ext}")))
+        frames = [cv2.imread(f) for f in files[:max_frames]]
+    else:
+        img = cv2.imread(path) if os.path.splitext(path)[1].lower() in (".jpg", ".jpeg", ".png", ".bmp") else None
+        if img is not None:
+            frames = [img]
+        else:
+            cap = cv2.VideoCapture(path)
+            frames = []
+            while len(frames) < max_frames:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                frames.append(frame)
+            cap.release()
+    frames = [f for f in frames if f is not None]
+    if width:
+        frames = [cv2.resize(f, (width, int(f.shape[0] * width / f.shape[1]))) for f in frames]
+    return frames
+
+
+class ReplaySource(FrameSource):
+    """In-memory frames replayed at fps (realtime=True sleeps like a camera would).
+
+    Reads cost nothing but the pacing, so the rest of the pipeline can be measured in isolation.
+    With zero_copy=True the stored arrays are returned directly and must not be drawn on.
+    """
+
+    name = "replay"
+
+    def __init__(self, frames, fps=30.0, loop=True, realtime=True, zero_copy=False, limit=None):
+        super().__init__()
+        if not frames:
+            raise ValueError("replay source has no frames")
+        self.store = frames
+        self.fps = fps
+        self.loop = loop
+        self.realtime = realtime and fps > 0
+        self.zero_copy = zero_copy
+        self.limit = limit
+        self.index = 0
+        self.t0 = None
+
+    def _read(self):
+        if (not self.loop and self.index >= len(self.store)) or (self.limit and self.index >= self.limit):
+            return False, None, None
+        if self.t0 is None:
+            self.t0 = time.monotonic()
+        ts = self.t0 + self.index / self.fps if self.fps > 0 else time.monotonic()
+        if self.realtime:
+            delay = ts - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        frame = self.store[self.index % len(self.store)]
+        self.index += 1
+        return True, frame if self.zero_copy else frame.copy(), ts
+
+
+def _parse_size_fps(spec, width=1280, height=720, fps=30.0):
+    """'1920x1080@30' -> (1920, 1080, 30.0), missing parts keep the defaults."""
+    size, _, rate = spec.partition("@")
+    if "x" in size:
+        width, height = (int(v) for v in size.split("x"))
+    if rate:
+        fps = float(rate)
+    return width, height, fps
+
+
+def open_source(spec, width=None, height=None, fps=None, pixel_format="", decode_scale=1, zero_copy=False,
+                realtime=True):
+    """Open a frame source from a spec string:
+
+    0, /dev/video0, video.mp4   OpenCV (pixel_format / decode_scale as in FormatCapture)
+    gst:<pipeline> or any string containing ' ! '   GStreamer
+    csi://0, jetson:<uri>       jetson_utils
+    synthetic[:WxH@fps]         generated frames
+    replay:<path>[@fps]         video file, image or image directory held in memory
+    bus:<name>                  shared-memory frame bus published by frame_bus.py serve
+    """
+    spec = str(spec)
+    if spec.startswith("gst:") or " ! " in spec:
+        return GStreamerSource(spec[4:] if spec.startswith("gst:") else spec, zero_copy=zero_copy)
+    if spec.startswith("csi://") or spec.startswith("jetson:"):
+        return JetsonSource(spec[7:] if spec.startswith("jetson:") else spec)
+    if spec.startswith("bus:"):
+        return FrameBusSource(spec[4:], zero_copy=zero_copy)
+    if spec.startswith("synthetic"):
+        w, h, rate = _parse_size_fps(spec.partition(":")[2], width or 1280, height or 720, fps or 30.0)
+        return ReplaySource(synthetic_frames(w, h), rate, realtime=realtime, zero_copy=zero_copy)
+    if spec.startswith("replay:"):
+        path, _, rate = spec[7:].partition("@")
+        return ReplaySource(load_frames(path, width=width), float(rate) if rate else (fps or 30.0),
+                            realtime=realtime, zero_copy=zero_copy)
+    source = int(spec) if spec.isdigit() else spec
+    return OpenCVSource(source, width, height, fps, pixel_format=pixel_format, decode_scale=decode_scale,
+                        zero_copy=zero_copy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read frames from a source and print its latency stats")
+    parser.add_argument("spec", nargs="?", default="0", help="see open_source() for the accepted specs")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int)
+    parser.add_argument("--height", type=int)
+    parser.add_argument("--fps", type=float)
+    parser.add_argument("--pixel-format", default="")
+    parser.add_argument("--decode-scale", type=int, default=1)
+    parser.add_argument("--zero-copy", action="store_true")
+    parser.add_argument("--no-realtime", dest="realtime", action="store_false",
+                        help="replay/synthetic sources deliver as fast as possible")
+    args = parser.parse_args()
+
+    source = open_source(args.spec, args.width, args.height, args.fps, args.pixel_format, args.decode_scale,
+                         args.zero_copy, args.realtime)
+    if not source.isOpened():
+        print(f"Cannot open {args.spec}")
+        return
+    try:
+        for i, (frame, ts) in enumerate(source):
+            if i + 1 >= args.frames:
+                break
+    finally:
+        source.release()
+    print(f"{args.spec}: {frame.shape[1]}x{frame.shape[0]}" if source.frames else f"{args.spec}: no frames")
+    for key, value in source.stats().items():
+        print(f"  {key:<14} {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+# Description: Per-frame latency tracing from capture to the viewer's socket write
+# fps_smoothed only tells how fast the producer loop runs, not how old the frame a viewer gets
+# is. A FrameTrace carries time.monotonic() stamps of one frame through the pipeline:
+#   capture -> infer_start -> infer_end -> plot -> throttle -> encode -> enqueue   (producer)
+#   -> send -> write                                                              (each viewer)
+# The Tracer turns them into latency histograms per span (GET /trace), can put the stamps into
+# the multipart part headers (X-Frame-Trace, ms since capture) and samples every Nth frame into
+# a Chrome trace (chrome://tracing, ui.perfetto.dev) for offline inspection.
+# With enabled=False begin() returns None and nothing is stamped or kept.
+
+import collections
+import json
+import os
+import threading
+import time
+
+STAGES = ["capture", "infer_start", "infer_end", "plot", "throttle", "encode", "enqueue"]
+# (from stage, to stage, span name) on the producer thread, in pipeline order
+SPANS = [("capture", "infer_start", "capture_wait"), ("infer_start", "infer_end", "infer"),
+         ("infer_end", "plot", "plot"), ("plot", "throttle", "throttle"), ("throttle", "encode", "encode"),
+         ("encode", "enqueue", "publish")]
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+PRODUCER_TID = 1
+
+
+class Histogram:
+    """Fixed log-spaced buckets over the whole run plus the recent values for percentiles."""
+
+    def __init__(self, bounds=BUCKETS_MS, recent=1024):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = collections.deque(maxlen=recent)
+
+    def add(self, ms):
+        i = 0
+        while i < len(self.bounds) and ms > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.recent.append(ms)
+
+    def snapshot(self):
+        if not self.n:
+            return {"count": 0}
+        recent = sorted(self.recent)
+        pct = lambda p: round(recent[min(len(recent) - 1, int(p * len(recent)))], 2)
+        labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return {"count": self.n, "mean": round(self.total / self.n, 2), "p50": pct(0.50), "p95": pct(0.95),
+                "p99": pct(0.99), "max": round(self.max, 2),
+                "buckets_ms": {k: c for k, c in zip(labels, self.counts) if c}}
+
+
+class FrameTrace:
+    """time.monotonic() stamps of one frame; missing stages are simply absent."""
+
+    __slots__ = ("seq", "t", "sampled")
+
+    def __init__(self, seq, stamps, sampled=False):
+        self.seq = seq
+        self.t = stamps
+        self.sampled = sampled
+
+    def mark(self, stage, t=None):
+        self.t[stage] = time.monotonic() if t is None else t
+
+    @property
+    def origin(self):
+        return self.t.get("capture", self.t.get("infer_start"))
+
+    def header(self, now, wall_offset):
+        """X-Frame-Trace value: seq, capture wall time (epoch ms) and ms since capture per stage."""
+        origin = self.origin
+        parts = [f"seq={self.seq}", f"wall={(origin + wall_offset) * 1000.0:.1f}"]
+        parts += [f"{k}={(self.t[k] - origin) * 1000.0:.1f}" for k in STAGES if k in self.t]
+        parts.append(f"send={(now - origin) * 1000.0:.1f}")
+        return ";".join(parts)
+
+
+class Tracer:
+    """Collects FrameTraces into histograms, part headers and a sampled Chrome trace."""
+
+    def __init__(self, enabled=True, headers=False, sample_every=0, max_events=50000, path=None):
+        self.enabled = enabled
+        self.headers = enabled and headers
+        self.sample_every = sample_every
+        self.path = path
+        self.wall_offset = time.time() - time.monotonic()
+        self._lock = threading.Lock()
+        self._hist = {}
+        self._events = collections.deque(maxlen=max_events)
+        self._threads = {PRODUCER_TID: "producer"}
+        self.frames = 0
+
+    # --- producer side ----------------------------------------------------------------------
+
+    def begin(self, seq, capture=None, infer_start=None, infer_end=None):
+        """Start the trace of frame `seq` from the stamps inference already took, or None if disabled."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if capture is not None and not now - 60.0 < capture <= now:
+            capture = None  # backend clock is not time.monotonic()
+        stamps = {k: v for k, v in (("capture", capture), ("infer_start", infer_start),
+                                    ("infer_end", infer_end)) if v is not None}
+        sampled = self.sample_every > 0 and seq % self.sample_every == 0
+        return FrameTrace(seq, stamps, sampled)
+
+    def finish(self, trace):
+        """Record the producer spans once the frame was handed to the viewers."""
+        if trace is None:
+            return
+        t = trace.t
+        with self._lock:
+            self.frames += 1
+            for a, b, name in SPANS:
+                if a in t and b in t:
+                    self._add(name, t[a], t[b])
+                    if trace.sampled:
+                        self._event(name, PRODUCER_TID, t[a], t[b], trace.seq)
+            if trace.origin is not None and "enqueue" in t:
+                self._add("capture_to_enqueue", trace.origin, t["enqueue"])
+
+    # --- viewer side ------------------------------------------------------------------------
+
+    def part_header(self, trace):
+        """Extra multipart header line for this frame (b'' when headers are off)."""
+        if not self.headers or trace is None or trace.origin is None:
+            return b''
+        return f"X-Frame-Trace: {trace.header(time.monotonic(), self.wall_offset)}\r\n".encode()
+
+    def delivered(self, trace, client, sent, written):
+        """One viewer finished writing the frame: sent = before the write, written = after it."""
+        if trace is None:
+            return
+        t = trace.t
+        with self._lock:
+            if "enqueue" in t:
+                self._add("viewer_wait", t["enqueue"], sent)
+            self._add("write", sent, written)
+            if trace.origin is not None:
+                self._add("capture_to_write", trace.origin, written)
+            if trace.sampled:
+                tid = PRODUCER_TID + 1 + hash(client) % 100000
+                self._threads.setdefault(tid, f"viewer {client}")
+                if "enqueue" in t:
+                    self._event("viewer_wait", tid, t["enqueue"], sent, trace.seq)
+                self._event("write", tid, sent, written, trace.seq)
+
+    # --- output -----------------------------------------------------------------------------
+
+    def _add(self, name, a, b):
+        hist = self._hist.get(name)
+        if hist is None:
+            hist = self._hist[name] = Histogram()
+        hist.add((b - a) * 1000.0)
+
+    def _event(self, name, tid, a, b, seq):
+        self._events.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": tid, "ts": round(a * 1e6, 1),
+                             "dur": round((b - a) * 1e6, 1), "args": {"seq": seq}})
+
+    def snapshot(self):
+        with self._lock:
+            return {"enabled": self.enabled, "frames": self.frames, "sample_every": self.sample_every,
+                    "sampled_events": len(self._events),
+                    "spans_ms": {k: h.snapshot() for k, h in self._hist.items()}}
+
+    def reset(self):
+        with self._lock:
+            self._hist = {}
+            self._events.clear()
+            self.frames = 0
+
+    def chrome_trace(self):
+        """Sampled spans in the Chrome trace event format (load in chrome://tracing or Perfetto)."""
+        with self._lock:
+            meta = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                    for tid, name in self._threads.items()]
+            return {"traceEvents": meta + list(self._events), "displayTimeUnit": "ms"}
+
+    def dump(self, path=None):
+        path = path or self.path
+        if not path or not self._events:
+            return None
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        os.replace(tmp, path)
+        return path
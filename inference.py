@@ -1,37 +1,254 @@
 # This program performs object detection inference using a YOLOv8 model
 # It has been exported to TensorRT format and is run inside a Docker container.
 # The input image is read from a mounted directory, and the output image
-# with detected bounding boxes is saved to another mounted directory. 
+# with detected bounding boxes is saved to another mounted directory.
 # Ultalitics and OpenCV libraries are used for model loading, inference, and image processing.
-from ultralytics import YOLO
+#
+# Batch mode (folders of stills): images are decoded by a thread pool, run through the model
+# in stacked batches and the annotated outputs are written by background threads.
+#
+#   python /app/inference.py                                     (single image, as before)
+#   python /app/inference.py /data/stills --batch 16 --workers 4 --out /results/stills
+#   python /app/inference.py /data/stills --batch 16 --no-save --json /results/stills.jsonl
+#
+# TensorRT engines only accept the batch size they were exported with (or a dynamic range), so
+# --batch is capped at the engine's export batch (1 for the default static engine). Re-export:
+#   yolo export model=yolov8n.pt format=engine batch=16 dynamic=True
+import argparse
+import collections
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
+import numpy as np
+
+from device_pipeline import export_max_batch
 
 # --- Configuration ---
 # NOTE: This path is *inside* the Docker container's file system
-MODEL_PATH = '/app/yolov8n.engine' 
+MODEL_PATH = '/app/yolov8n.engine'
 INPUT_PATH = '/data/test_image.jpg'
 INPUT_PATH_2 = '/data/irish_licence_distance.png'
-OUTPUT_PATH = '/results/output_image_3.jpg' 
-
-# --- Inference ---
-# 1. Load the exported TensorRT engine model
-model = YOLO(MODEL_PATH)
-
-# 2. Run prediction, stream=False returns a list of Results
-# The model will internally load the image from the INPUT_PATH
-results = model.predict(source=INPUT_PATH_2, save=False, verbose=False)
-
-# 3. Process the results (drawing the bounding boxes)
-for result in results:
-    # Get the image with bounding boxes already drawn by Ultralytics
-    # This uses OpenCV-compatible BGR format (NumPy array)
-    annotated_img = result.plot() 
-    
-    # 4. Save the annotated image to the mounted output folder
-    cv2.imwrite(OUTPUT_PATH, annotated_img)
-    
-    # Optional: Print detection details
-    print(f"Detections found: {len(result.boxes)}")
-    print(f"Saved annotated image to: {OUTPUT_PATH}")
-
-print("Inference completed successfully.")
\ No newline at end of file
+OUTPUT_PATH = '/results/output_image_3.jpg'
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+DEFAULT_BATCH = 8
+
+
+def capped_batch(model_path, batch=None):
+    """`batch` (None = DEFAULT_BATCH) limited to what the model's TensorRT engine accepts."""
+    limit = export_max_batch(model_path)
+    if batch is None:
+        return min(DEFAULT_BATCH, limit or DEFAULT_BATCH)
+    if limit is not None and batch > limit:
+        print(f"batch {batch} capped at {limit} for {model_path}: "
+              + ("engine export batch" if limit > 1 else "static TensorRT engine, re-export with batch=N dynamic=True"))
+        return limit
+    return batch
+
+
+def list_images(inputs):
+    """Expand files, directories (recursive) and glob patterns into a sorted list of images."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS))
+        elif any(c in item for c in "*?["):
+            files.extend(f for f in glob.glob(item, recursive=True) if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            files.append(item)
+    return sorted(set(files))
+
+
+def output_names(files):
+    """Output path per input, relative to the inputs' common folder, as .jpg.
+
+    Sub-folders are mirrored (cam1/0001.png and cam2/0001.png stay apart); a.png next to a.jpg
+    becomes a_png.jpg and a_jpg.jpg.
+    """
+    if not files:
+        return {}
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    stems = {f: os.path.splitext(os.path.relpath(os.path.abspath(f), root))[0] for f in files}
+    taken = collections.Counter(stems.values())
+    return {f: (f"{s}_{os.path.splitext(f)[1][1:]}" if taken[s] > 1 else s) + ".jpg" for f, s in stems.items()}
+
+
+def _decode(path):
+    t0 = time.perf_counter()
+    img = cv2.imread(path)  # releases the GIL, so the pool decodes in parallel
+    return path, img, (time.perf_counter() - t0) * 1000.0
+
+
+def _stage_stats(samples):
+    a = np.asarray(samples) if samples else np.zeros(1)
+    return {"mean": float(a.mean()), "p50": float(np.percentile(a, 50)), "p95": float(np.percentile(a, 95))}
+
+
+def run_batch(model, files, batch=None, workers=4, out_dir=None, save=True, json_path=None,
+              imgsz=640, conf=0.25, max_pending_writes=64):
+    """Decode -> batched inference -> async annotate/write over `files`. Returns a stats dict.
+
+    batch is capped at the engine's export batch (capped_batch), None = DEFAULT_BATCH.
+    """
+    from annotator import Annotator
+
+    batch = capped_batch(getattr(model, "model_name", ""), batch)
+
+    local = threading.local()  # one Annotator (glyph cache) per writer thread
+    stages = {"decode": [], "preprocess": [], "inference": [], "postprocess": [], "write": [], "batch": []}
+    stats_lock = threading.Lock()
+    pending = threading.BoundedSemaphore(max_pending_writes)  # caps annotated images held in memory
+    failed = []
+    n_images = n_dets = 0
+    if save and out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    jsonl = open(json_path, "w") if json_path else None
+    names = output_names(files)
+
+    def write(path, img, dets):
+        try:
+            t0 = time.perf_counter()
+            if not hasattr(local, "annotator"):
+                local.annotator = Annotator(model.names)
+            annotated = local.annotator.draw(img, dets)
+            out_path = os.path.join(out_dir, names[path])
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            cv2.imwrite(out_path, annotated)
+            with stats_lock:
+                stages["write"].append((time.perf_counter() - t0) * 1000.0)
+        except Exception as e:
+            print(f"Cannot write {path}: {e}")
+        finally:
+            pending.release()
+
+    chunks = [files[i:i + batch] for i in range(0, len(files), batch)]
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(workers, thread_name_prefix="decode") as decoder, \
+            ThreadPoolExecutor(max(1, workers // 2), thread_name_prefix="write") as writer:
+        # decode the next batch while the current one is on the model
+        next_batch = [decoder.submit(_decode, f) for f in chunks[0]] if chunks else []
+        for k in range(len(chunks)):
+            decoded = [fut.result() for fut in next_batch]
+            if k + 1 < len(chunks):
+                next_batch = [decoder.submit(_decode, f) for f in chunks[k + 1]]
+            items = []
+            for path, img, ms in decoded:
+                stages["decode"].append(ms)
+                if img is None:
+                    failed.append(path)
+                else:
+                    items.append((path, img))
+            if not items:
+                continue
+
+            t0 = time.perf_counter()
+            results = model.predict([img for _, img in items], imgsz=imgsz, conf=conf, verbose=False)
+            stages["batch"].append((time.perf_counter() - t0) * 1000.0)
+
+            for (path, img), r in zip(items, results):
+                for key in ("preprocess", "inference", "postprocess"):
+                    stages[key].append(r.speed.get(key, 0.0))
+                boxes = r.boxes
+                dets = {"xyxy": boxes.xyxy.cpu().numpy(), "conf": boxes.conf.cpu().numpy(),
+                        "cls": boxes.cls.cpu().numpy().astype(int)}
+                n_images += 1
+                n_dets += len(dets["conf"])
+                if jsonl:
+                    jsonl.write(json.dumps({"image": path, "detections": [
+                        {"cls": model.names[int(k)], "conf": round(float(c), 3), "box": [round(float(v), 1) for v in b]}
+                        for b, c, k in zip(dets["xyxy"], dets["conf"], dets["cls"])]}) + "\n")
+                if save and out_dir:
+                    pending.acquire()
+                    writer.submit(write, path, img, dets)
+    elapsed = time.perf_counter() - t_start
+    if jsonl:
+        jsonl.close()
+    return {
+        "images": n_images,
+        "failed": failed,
+        "detections": n_dets,
+        "batch": batch,
+        "workers": workers,
+        "seconds": elapsed,
+        "images_per_s": n_images / elapsed if elapsed > 0 else 0.0,
+        "stages": {k: _stage_stats(v) for k, v in stages.items() if v},
+    }
+
+
+def print_report(st):
+    print(f"\n{st['images']} images in {st['seconds']:.2f} s: {st['images_per_s']:.1f} images/s "
+          f"(batch {st['batch']}, {st['workers']} decode workers, {st['detections']} detections)")
+    if st["failed"]:
+        print(f"{len(st['failed'])} unreadable images, e.g. {st['failed'][0]}")
+    print(f"{'stage':<22} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    labels = {"decode": "decode (per image)", "preprocess": "preprocess (per image)",
+              "inference": "inference (per image)", "postprocess": "postprocess (per image)",
+              "batch": "predict (per batch)", "write": "annotate + write"}
+    for key, label in labels.items():
+        if key in st["stages"]:
+            s = st["stages"][key]
+            print(f"{label:<22} {s['mean']:>9.2f} {s['p50']:>9.2f} {s['p95']:>9.2f}")
+
+
+def single_image(model, input_path, output_path):
+    # 2. Run prediction, stream=False returns a list of Results
+    # The model will internally load the image from the INPUT_PATH
+    results = model.predict(source=input_path, save=False, verbose=False)
+
+    # 3. Process the results (drawing the bounding boxes)
+    for result in results:
+        # Get the image with bounding boxes already drawn by Ultralytics
+        # This uses OpenCV-compatible BGR format (NumPy array)
+        annotated_img = result.plot()
+
+        # 4. Save the annotated image to the mounted output folder
+        cv2.imwrite(output_path, annotated_img)
+
+        # Optional: Print detection details
+        print(f"Detections found: {len(result.boxes)}")
+        print(f"Saved annotated image to: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO inference on one image or folders of stills")
+    parser.add_argument("inputs", nargs="*", help="images, directories or glob patterns (default: INPUT_PATH_2)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--out", default="/results/batch", help="output directory in batch mode")
+    parser.add_argument("--batch", type=int, default=None,
+                        help=f"images per predict call (default {DEFAULT_BATCH}, capped at the engine's export batch)")
+    parser.add_argument("--workers", type=int, default=4, help="decode threads")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--no-save", dest="save", action="store_false", help="do not write annotated images")
+    parser.add_argument("--json", help="write detections as JSON lines to this file")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    # --- Inference ---
+    # 1. Load the exported TensorRT engine model
+    model = YOLO(args.model)
+
+    if not args.inputs:
+        single_image(model, INPUT_PATH_2, OUTPUT_PATH)
+    else:
+        files = list_images(args.inputs)
+        if not files:
+            print("No images found in", ", ".join(args.inputs))
+            return
+        args.batch = capped_batch(args.model, args.batch)
+        print(f"{len(files)} images, batch {args.batch}")
+        print_report(run_batch(model, files, args.batch, args.workers, args.out, args.save, args.json,
+                               args.imgsz, args.conf))
+
+    print("Inference completed successfully.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+# Description: H.264 live stream in fragmented MP4 next to the MJPEG feed
+# MJPEG sends every frame as a full JPEG; an inter-frame codec needs a fraction of the
+# bandwidth for the same picture, which matters on the constrained links of remote sites.
+# The annotated frames are piped into an ffmpeg subprocess that encodes H.264 and muxes
+# fragmented MP4 with one fragment per frame (low latency). The first encoder that works is
+# used: Jetson (h264_nvmpi), V4L2 mem2mem, NVENC, then libx264 as the software fallback.
+# The encoder runs only while someone watches and is stopped after idle_stop seconds.
+#
+# Clients get the init segment (ftyp + moov) and then fragments starting at a keyframe.
+# A client that falls behind by more than one GOP jumps to the newest keyframe instead of
+# queueing fragments. stats() reports the output bitrate and the frame -> fragment latency.
+#
+#   LIVE_STREAM=1 python /app/web_stream_v5.py      (page: http://<jetson-ip>:5001/live)
+#   python /app/benchmark.py live --source synthetic:1280x720@30 --seconds 10
+#
+# Needs the ffmpeg binary (apt-get install ffmpeg, or LIVE_FFMPEG=/path/to/ffmpeg).
+
+import collections
+import struct
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+ENCODERS = ["h264_nvmpi", "h264_v4l2m2m", "h264_nvenc", "libx264"]
+
+
+def available_encoders(ffmpeg="ffmpeg"):
+    """H.264 encoders from ENCODERS that this ffmpeg build lists, in preference order."""
+    try:
+        out = subprocess.run([ffmpeg, "-hide_banner", "-encoders"], capture_output=True, text=True,
+                             timeout=10).stdout
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"cannot run {ffmpeg}: {e}")
+    names = {line.split()[1] for line in out.splitlines() if line.startswith(" V") and len(line.split()) > 1}
+    return [e for e in ENCODERS if e in names]
+
+
+def encoder_args(encoder, fps, gop, bitrate):
+    if encoder == "libx264":
+        return ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-profile:v", "baseline",
+                "-x264-params", f"keyint={gop}:min-keyint={gop}:scenecut=0", "-b:v", bitrate,
+                "-maxrate", bitrate, "-bufsize", bitrate]
+    return ["-c:v", encoder, "-g", str(gop), "-b:v", bitrate]
+
+
+def _boxes(buf, start=0, end=None):
+    """(type, payload_start, box_end) of the ISO BMFF boxes in buf[start:end]."""
+    end = len(buf) if end is None else end
+    while start + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, start)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, start + 8)[0]
+            header = 16
+        if size < header:
+            return
+        yield kind, start + header, start + size
+        start += size
+
+
+def is_keyframe(moof):
+    """True if the first sample of a moof fragment is a sync sample (unknown counts as key)."""
+    for kind, a, b in _boxes(moof):
+        if kind != b"moof":
+            continue
+        for kind, a, b in _boxes(moof, a, b):
+            if kind != b"traf":
+                continue
+            default_flags = None
+            for kind, p, _ in _boxes(moof, a, b):
+                flags = struct.unpack_from(">I", moof, p)[0] & 0xFFFFFF
+                if kind == b"tfhd":
+                    off = p + 8 + (8 if flags & 0x1 else 0) + (4 if flags & 0x2 else 0) + \
+                        (4 if flags & 0x8 else 0) + (4 if flags & 0x10 else 0)
+                    if flags & 0x20:
+                        default_flags = struct.unpack_from(">I", moof, off)[0]
+                elif kind == b"trun":
+                    off = p + 8 + (4 if flags & 0x1 else 0)
+                    if flags & 0x4:
+                        sample_flags = struct.unpack_from(">I", moof, off)[0]
+                    elif flags & 0x400:
+                        off += (4 if flags & 0x4 else 0) + (4 if flags & 0x100 else 0) + (4 if flags & 0x200 else 0)
+                        sample_flags = struct.unpack_from(">I", moof, off)[0]
+                    else:
+                        sample_flags = default_flags
+                    return sample_flags is None or not sample_flags & 0x10000
+    return True
+
+
+def codec_string(init):
+    """RFC 6381 codec string (avc1.PPCCLL) from the avcC box of an init segment, for MediaSource."""
+    i = init.find(b"avcC")
+    if i < 0 or len(init) < i + 8:
+        return "avc1.42E01E"
+    return "avc1." + init[i + 5:i + 8].hex().upper()
+
+
+class LiveStream:
+    """On-demand H.264/fMP4 encoder fed with the newest frame, fanned out to HTTP clients."""
+
+    def __init__(self, fps=15.0, width=1280, bitrate="1M", gop=None, encoder="auto", ffmpeg="ffmpeg",
+                 max_clients=8, idle_stop=10.0):
+        self.fps = fps
+        self.width = width
+        self.bitrate = bitrate
+        self.gop = gop or max(1, int(round(fps)))
+        self.encoder = encoder
+        self.ffmpeg = ffmpeg
+        self.max_clients = max_clients
+        self.idle_stop = idle_stop
+        self._cond = threading.Condition()
+        self._frame = None
+        self._proc = None
+        self._init = None
+        self._fragments = collections.deque(maxlen=2 * self.gop + 2)  # (seq, keyframe, bytes)
+        self._seq = 0
+        self._clients = 0
+        self._idle_since = None
+        self._write_times = collections.deque(maxlen=4 * self.gop + 8)  # (frame index, monotonic)
+        self._latency_ms = collections.deque(maxlen=1000)
+        self._out_bytes = collections.deque(maxlen=4 * int(fps) + 8)   # (monotonic, nbytes)
+        self.active_encoder = None
+        self.size = None
+        self.error = None
+        self.failed = []
+
+    # --- producer side ----------------------------------------------------------------------
+
+    def push(self, frame):
+        """Offer the newest frame (a reference swap, the feed thread copies it). Never blocks."""
+        self._frame = frame
+
+    # --- encoder ----------------------------------------------------------------------------
+
+    def _start(self, frame):
+        h, w = frame.shape[:2]
+        if self.width and w > self.width:
+            w, h = self.width, int(round(h * self.width / w))
+        w, h = w - w % 2, h - h % 2  # yuv420p needs even sizes
+        self.size = (w, h)
+        candidates = [self.encoder] if self.encoder != "auto" else available_encoders(self.ffmpeg)
+        candidates = [e for e in candidates if e not in self.failed]
+        if not candidates:
+            raise RuntimeError(f"no usable H.264 encoder in {self.ffmpeg} (failed: {', '.join(self.failed) or 'none'})")
+        encoder = candidates[0]
+        cmd = [self.ffmpeg, "-hide_banner", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{w}x{h}", "-framerate", str(self.fps), "-i", "-",
+               *encoder_args(encoder, self.fps, self.gop, self.bitrate), "-pix_fmt", "yuv420p",
+               "-f", "mp4", "-movflags", "empty_moov+default_base_moof+frag_every_frame", "-"]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                      bufsize=0)
+        self.active_encoder = encoder
+        self._init = None
+        self._fragments.clear()
+        self._write_times.clear()
+        threading.Thread(target=self._read_loop, args=(self._proc,), name="live-read", daemon=True).start()
+        threading.Thread(target=self._feed_loop, args=(self._proc,), name="live-feed", daemon=True).start()
+
+    def _feed_loop(self, proc):
+        """Write the newest frame at a constant rate (repeating it if the producer is slower)."""
+        interval = 1.0 / self.fps
+        n = 0
+        next_t = time.monotonic()
+        buf = None
+        try:
+            while proc.poll() is None:
+                with self._cond:
+                    if self._clients == 0:
+                        if self._idle_since is None:
+                            self._idle_since = time.monotonic()
+                        elif time.monotonic() - self._idle_since > self.idle_stop:
+                            break
+                    else:
+                        self._idle_since = None
+                frame = self._frame
+                if frame is not None:
+                    w, h = self.size
+                    if frame.shape[1] != w or frame.shape[0] != h:
+                        buf = cv2.resize(frame, (w, h), dst=buf, interpolation=cv2.INTER_AREA)
+                        frame = buf
+                    self._write_times.append((n, time.monotonic()))
+                    proc.stdin.write(np.ascontiguousarray(frame).data)
+                    n += 1
+                next_t += interval
+                delay = next_t - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_t = time.monotonic()  # encoder fell behind, do not burst
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            proc.wait(timeout=5)
+
+    def _read_exact(self, stream, n):
+        data = b""
+        while len(data) < n:
+            chunk = stream.read(n - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _read_loop(self, proc):
+        """Split ffmpeg's output into the init segment and moof+mdat fragments."""
+        stream = proc.stdout
+        pending, index = b"", 0
+        while True:
+            header = self._read_exact(stream, 8)
+            if header is None:
+                break
+            size, kind = struct.unpack(">I4s", header)
+            if size == 1:
+                ext = self._read_exact(stream, 8)
+                if ext is None:
+                    break
+                header += ext
+                size = struct.unpack(">Q", ext)[0]
+            body = self._read_exact(stream, size - len(header))
+            if body is None:
+                break
+            box = header + body
+            if kind in (b"ftyp", b"moov"):
+                pending += box
+                if kind == b"moov":
+                    with self._cond:
+                        self._init = pending
+                    pending = b""
+            elif kind == b"moof":
+                pending = box
+            elif kind == b"mdat" and pending:
+                fragment = pending + box
+                pending = b""
+                now = time.monotonic()
+                written = dict(self._write_times).get(index)
+                if written is not None:
+                    self._latency_ms.append((now - written) * 1000.0)
+                self._out_bytes.append((now, len(fragment)))
+                index += 1
+                with self._cond:
+                    self._seq += 1
+                    self._fragments.append((self._seq, is_keyframe(fragment), fragment))
+                    self._cond.notify_all()
+        err = proc.stderr.read().decode(errors="replace").strip()
+        proc.wait()
+        with self._cond:
+            if self._init is None and self._proc is proc:
+                # died before producing anything: try the next encoder on the next attempt
+                self.failed.append(self.active_encoder)
+                self.error = f"{self.active_encoder}: {err.splitlines()[-1] if err else f'exit {proc.returncode}'}"
+                print("Live stream encoder failed:", self.error)
+            if self._proc is proc:
+                self._proc = None
+            self._cond.notify_all()
+
+    # --- client side ------------------------------------------------------------------------
+
+    def connect(self, timeout=10.0):
+        """Admit a client and make sure the encoder runs. Returns False when full."""
+        with self._cond:
+            if self._frame is None:
+                raise RuntimeError("no frame yet")
+            if self._clients >= self.max_clients:
+                return False
+            self._clients += 1
+        deadline = time.monotonic() + timeout
+        try:
+            with self._cond:
+                while self._init is None or self._proc is None:
+                    if self._proc is None:
+                        self._start(self._frame)
+                    self._cond.wait(min(0.5, max(0.0, deadline - time.monotonic())))
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(self.error or "encoder did not start")
+        except RuntimeError:
+            self.disconnect()
+            raise
+        return True
+
+    def disconnect(self):
+        with self._cond:
+            self._clients -= 1
+
+    def stream(self):
+        """fMP4 byte stream for one connected client (call connect() first)."""
+        try:
+            with self._cond:
+                init = self._init
+                # start at the newest keyframe already buffered (or wait for the next one)
+                keys = [f[0] for f in self._fragments if f[1]]
+                last = keys[-1] - 1 if keys else (self._fragments[-1][0] if self._fragments else 0)
+            yield init
+            joined = False
+            while True:
+                with self._cond:
+                    while (not self._fragments or self._fragments[-1][0] == last) and self._proc is not None:
+                        self._cond.wait(1.0)
+                    if self._proc is None:
+                        return
+                    frags = [f for f in self._fragments if f[0] > last]
+                last = frags[-1][0]
+                if not joined or len(frags) > self.gop:
+                    # joining, or too far behind: continue from the newest keyframe
+                    keys = [i for i, f in enumerate(frags) if f[1]]
+                    if keys:
+                        frags = frags[keys[-1]:]
+                        joined = True
+                    elif not joined:
+                        continue
+                yield b"".join(f[2] for f in frags)
+        finally:
+            self.disconnect()
+
+    def stats(self):
+        now = time.monotonic()
+        recent = [(t, n) for t, n in list(self._out_bytes) if now - t < 2.0]
+        span = now - recent[0][0] if len(recent) > 1 else 0.0
+        lat = np.asarray(self._latency_ms) if self._latency_ms else None
+        return {
+            "encoder": self.active_encoder,
+            "running": self._proc is not None,
+            "size": self.size,
+            "fps": self.fps,
+            "gop": self.gop,
+            "bitrate_target": self.bitrate,
+            "kbit_s": round(sum(n for _, n in recent) * 8 / span / 1000.0, 1) if span else 0.0,
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 1) if lat is not None else None,
+            "latency_ms_p95": round(float(np.percentile(lat, 95)), 1) if lat is not None else None,
+            "clients": self._clients,
+            "failed_encoders": list(self.failed),
+            "error": self.error,
+        }
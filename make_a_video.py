@@ -1,146 +1,124 @@
-import cv2
 import os
+import sys
 from datetime import datetime
 
-def get_camera_resolutions():
-    """Get available resolutions for the camera."""
-    cap = cv2.VideoCapture(0)
-    resolutions = [
-        (640, 480),
-        (800, 600),
-        (1024, 768),
-        (1280, 720),
-        (1920, 1080),
-        (2560, 1440),
-    ]
-    
-    available = []
-    for w, h in resolutions:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, w)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
-        actual_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        actual_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        if actual_w == w and actual_h == h:
-            available.append((w, h))
-    
-    cap.release()
-    return available
+import cv2
 
-def main():
-    # Create output folder if it doesn't exist
-    output_folder = "saved_video"
-    os.makedirs(output_folder, exist_ok=True)
-    
-    print("=== USB Camera Video Recorder ===\n")
-    
-    # Get available resolutions
-    available_res = get_camera_resolutions()
-    if not available_res:
-        print("Error: No camera found or no resolutions available!")
-        return
-    
-    print("Available resolutions:")
-    for i, (w, h) in enumerate(available_res, 1):
-        print(f"{i}. {w}x{h}")
-    
-    # User selects resolution
-    while True:
-        try:
-            choice = int(input("\nSelect resolution (enter number): ") or "3")
-            if 1 <= choice <= len(available_res):
-                width, height = available_res[choice - 1]
-                break
-            else:
-                print(f"Please enter a number between 1 and {len(available_res)}")
-        except ValueError:
-            print("Invalid input. Please enter a number.")
-    
-    print(f"\nSelected resolution: {width}x{height}")
-    
-    # Get FPS from user
-    while True:
-        try:
-            fps = int(input("Enter FPS (frames per second, default 25): ") or "25")
-            if fps > 0:
-                break
-            else:
-                print("FPS must be greater than 0")
-        except ValueError:
-            print("Invalid input. Please enter a number.")
-    
-    # Get duration from user
+from camera_probe import probe, resolutions, frame_rates
+from record_config import build_parser, load_config, open_camera
+from recorder import Recorder, enable_mjpeg_passthrough
+
+def get_camera_resolutions(device=0, refresh=False):
+    """Get available resolutions for the camera (cached probe, no camera open on later runs)."""
+    return resolutions(probe(device, refresh=refresh))
+
+def ask_int(prompt, default, valid, error):
     while True:
         try:
-            duration = int(input("Enter recording duration in seconds (default 10): ") or "10")
-            if duration > 0:
-                break
-            else:
-                print("Duration must be greater than 0")
+            value = int(input(prompt) or str(default))
+            if valid(value):
+                return value
+            print(error)
         except ValueError:
             print("Invalid input. Please enter a number.")
-    
+
+def ask_yes_no(prompt, default):
+    return (input(prompt).lower().strip() or default) == 'y'
+
+def ask_settings(cfg, available_res):
+    """Interactive mode: ask for the settings the old script asked for."""
+    print("Available resolutions:")
+    for i, (w, h) in enumerate(available_res, 1):
+        print(f"{i}. {w}x{h}")
+
+    # User selects resolution
+    choice = ask_int("\nSelect resolution (enter number): ", 3 if len(available_res) >= 3 else 1,
+                     lambda v: 1 <= v <= len(available_res),
+                     f"Please enter a number between 1 and {len(available_res)}")
+    cfg["width"], cfg["height"] = available_res[choice - 1]
+    print(f"\nSelected resolution: {cfg['width']}x{cfg['height']}")
+
+    cfg["fps"] = ask_int("Enter FPS (frames per second, default 25): ", 25, lambda v: v > 0,
+                         "FPS must be greater than 0")
+    cfg["duration"] = ask_int("Enter recording duration in seconds (default 10): ", 10, lambda v: v > 0,
+                              "Duration must be greater than 0")
+    cfg["passthrough"] = ask_yes_no("MJPEG passthrough, store camera JPEGs without re-encoding? (y/n, default n): ", "n")
+    cfg["preview"] = ask_yes_no("Show downsampled live preview? (y/n, default n): ", "n")
+    return cfg
+
+def record(cfg, caps):
+    """Open the camera with cfg and record one clip."""
+    width, height, fps = cfg["width"], cfg["height"], cfg["fps"]
+    if (width, height) not in resolutions(caps, cfg["pixel_format"] or None) and caps.get("formats"):
+        print(f"Warning: {width}x{height} not reported by the camera for {cfg['pixel_format'] or 'default format'}")
+    rates = frame_rates(caps, width, height, cfg["pixel_format"] or None)
+    if rates and fps not in rates:
+        print(f"Warning: camera offers {', '.join(f'{r:g}' for r in rates)} fps at {width}x{height}, requested {fps}")
+
+    os.makedirs(cfg["output_dir"], exist_ok=True)
+
     # Open camera
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-    cap.set(cv2.CAP_PROP_FPS, fps)
-    
+    cap = open_camera(cfg)
     if not cap.isOpened():
         print("Error: Cannot open camera!")
-        return
-    
-    # Define codec and create VideoWriter
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # or 'MJPG', 'XVID', 'DIVX'
+        return False
+    if cfg["passthrough"]:
+        enable_mjpeg_passthrough(cap)
+    # record at the size actually delivered (frame bus, or a camera that ignored the request)
+    actual = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if all(actual) and actual != (width, height):
+        print(f"Camera delivers {actual[0]}x{actual[1]}, recording at that size")
+        width, height = actual
+
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_path = os.path.join(output_folder, f"video_{timestamp}_{width}x{height}_{fps}fps.mp4")
-    
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-    
-    if not out.isOpened():
-        print("Error: Cannot create video writer!")
-        cap.release()
-        return
-    
+    output_path = os.path.join(cfg["output_dir"], f"video_{timestamp}_{width}x{height}_{fps}fps.mp4")
+
+    # capture and encoding run in separate threads, timing comes from capture timestamps
+    recorder = Recorder(cap, output_path, fps, (width, height), duration=cfg["duration"],
+                        codec=cfg["codec"], passthrough=cfg["passthrough"], preview=cfg["preview"],
+                        preview_width=cfg["preview_width"], queue_size=cfg["queue_size"])
+
     print(f"\nRecording to: {output_path}")
-    print(f"Duration: {duration} seconds")
-    print("Press 'q' to stop recording early.\n")
-    
-    frame_count = 0
-    total_frames = duration * fps
-    
+    print(f"Duration: {cfg['duration']} seconds")
+    print("Press 'q' in the preview window or Ctrl+C to stop recording early.\n")
+
     try:
-        while frame_count < total_frames:
-            ret, frame = cap.read()
-            
-            if not ret:
-                print("Error: Failed to read frame from camera!")
-                break
-            
-            # Write frame to video
-            out.write(frame)
-            frame_count += 1
-            
-            # Display progress
-            progress = (frame_count / total_frames) * 100
-            print(f"\rRecording... {frame_count}/{total_frames} frames ({progress:.1f}%)", end='', flush=True)
-            
-            # Optional: display live preview (uncomment to see)
-            cv2.imshow('Recording...', frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-    
-    except KeyboardInterrupt:
-        print("\n\nRecording interrupted by user.")
-    
+        recorder.run()
+    except RuntimeError as e:
+        print("Error:", e)
+        return False
     finally:
         # Release everything
         cap.release()
-        out.release()
-        cv2.destroyAllWindows()
-        
-        print(f"\n\nVideo saved successfully!")
-        print(f"Output: {output_path}")
-        print(f"Total frames recorded: {frame_count}")
+        recorder.report()
+    return True
+
+def main():
+    args = build_parser("USB camera video recorder").parse_args()
+    try:
+        cfg = load_config(args)
+    except (OSError, ValueError) as e:
+        print("Error: cannot load config:", e)
+        sys.exit(2)
+
+    print("=== USB Camera Video Recorder ===\n")
+
+    # capabilities come from the on-disk cache after the first run
+    caps = probe(cfg["device"], refresh=args.refresh_probe)
+    if args.list_formats:
+        for fmt, sizes in caps["formats"].items():
+            print(fmt, ", ".join(f"{s['width']}x{s['height']}" for s in sizes))
+        return
+
+    if args.interactive:
+        available_res = resolutions(caps)
+        if not available_res:
+            print("Error: No camera found or no resolutions available!")
+            return
+        cfg = ask_settings(cfg, available_res)
+
+    if not record(cfg, caps):
+        sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
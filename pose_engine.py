@@ -0,0 +1,197 @@
+# Description: Temporal keypoint smoothing and pose-state engine
+# Keeps the keypoints from the pose model instead of only drawing r.plot() skeletons:
+#  - persons get persistent ids from tracker.Tracker
+#  - keypoints are smoothed per track with a One-Euro filter working on whole (17, 2) arrays
+#  - between inference frames keypoints are extrapolated from the filtered velocity,
+#    so the displayed stream stays smooth while the model runs at a lower rate
+#  - joint angles are computed for all persons and joints at once (no per-point loops)
+
+import math
+
+import cv2
+import numpy as np
+
+from tracker import Tracker
+
+# COCO-17 keypoint layout used by yolo11n-pose / yolov8n-pose
+KEYPOINT_NAMES = [
+    "nose", "left_eye", "right_eye", "left_ear", "right_ear",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow", "left_wrist", "right_wrist",
+    "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle",
+]
+
+SKELETON = np.array([
+    (15, 13), (13, 11), (16, 14), (14, 12), (11, 12), (5, 11), (6, 12), (5, 6),
+    (5, 7), (6, 8), (7, 9), (8, 10), (1, 2), (0, 1), (0, 2), (1, 3), (2, 4), (3, 5), (4, 6),
+])
+
+# angle at the middle joint of each (a, b, c) triplet
+JOINT_ANGLES = {
+    "left_elbow": (5, 7, 9),
+    "right_elbow": (6, 8, 10),
+    "left_shoulder": (7, 5, 11),
+    "right_shoulder": (8, 6, 12),
+    "left_hip": (5, 11, 13),
+    "right_hip": (6, 12, 14),
+    "left_knee": (11, 13, 15),
+    "right_knee": (12, 14, 16),
+}
+_ANGLE_IDX = np.array(list(JOINT_ANGLES.values()))
+
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """One-Euro filter over a NumPy array of any shape (all elements filtered at once)."""
+
+    def __init__(self, min_cutoff=1.0, beta=0.02, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x = None
+        self.dx = None
+
+    def __call__(self, x, dt, valid=None):
+        x = np.asarray(x, dtype=np.float32)
+        if self.x is None:
+            self.x = x.copy()
+            self.dx = np.zeros_like(x)
+            return self.x
+        dt = max(dt, 1e-3)
+        if valid is not None:
+            # low-confidence points keep their previous value instead of jumping
+            x = np.where(valid, x, self.x)
+        dx = (x - self.x) / dt
+        a_d = _alpha(self.d_cutoff, dt)
+        self.dx = a_d * dx + (1.0 - a_d) * self.dx
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dx)
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        a = 1.0 / (1.0 + tau / dt)
+        self.x = a * x + (1.0 - a) * self.x
+        return self.x
+
+
+def joint_angles(kpts):
+    """Angles in degrees for JOINT_ANGLES. kpts (N, 17, 2) -> (N, len(JOINT_ANGLES))."""
+    kpts = np.asarray(kpts, dtype=np.float32).reshape(-1, 17, 2)
+    a = kpts[:, _ANGLE_IDX[:, 0]]
+    b = kpts[:, _ANGLE_IDX[:, 1]]
+    c = kpts[:, _ANGLE_IDX[:, 2]]
+    ba = a - b
+    bc = c - b
+    cos = (ba * bc).sum(-1) / (np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1) + 1e-6)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+class PoseEngine:
+    """Per-track keypoint smoothing, inter-frame extrapolation and derived joint angles.
+
+    update() takes the raw model output of an inference frame, interpolate() produces the
+    pose for any later display time without running the model. Both return a dict:
+    id (N,), xyxy (N, 4), kpts (N, 17, 2), kpt_conf (N, 17), angles (N, len(JOINT_ANGLES)).
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.02, kpt_conf=0.3, max_extrapolate=0.3, max_age=10):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.kpt_conf = kpt_conf
+        self.max_extrapolate = max_extrapolate  # seconds; do not run far ahead of the model
+        self.tracker = Tracker(iou_thres=0.3, max_age=max_age)
+        self._filters = {}
+        self._last = None
+        self._last_t = None
+
+    def update(self, xyxy, conf, kpts, kpt_conf, t):
+        """Smooth one inference result (person boxes plus (N, 17, 2) keypoints) at time t."""
+        kpts = np.asarray(kpts, dtype=np.float32).reshape(-1, 17, 2)
+        kpt_conf = np.asarray(kpt_conf, dtype=np.float32).reshape(-1, 17)
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.tracker.update(xyxy, conf, np.zeros(len(xyxy), dtype=np.int64))
+        ids = self.tracker.det_ids
+        dt = (t - self._last_t) if self._last_t is not None else 0.0
+
+        smoothed = np.empty_like(kpts)
+        velocity = np.zeros_like(kpts)
+        for i, tid in enumerate(ids):
+            f = self._filters.get(int(tid))
+            if f is None:
+                f = self._filters[int(tid)] = OneEuroFilter(self.min_cutoff, self.beta)
+            smoothed[i] = f(kpts[i], dt, (kpt_conf[i] >= self.kpt_conf)[:, None])
+            velocity[i] = f.dx
+
+        # forget filters of tracks the tracker dropped
+        alive = set(int(i) for i in self.tracker.ids)
+        for tid in [k for k in self._filters if k not in alive]:
+            del self._filters[tid]
+
+        self._last = {
+            "id": ids.copy(),
+            "xyxy": xyxy,
+            "kpts": smoothed,
+            "kpt_conf": kpt_conf,
+            "vel": velocity,
+        }
+        self._last_t = t
+        return self._state(smoothed)
+
+    def interpolate(self, t):
+        """Pose at display time t, extrapolated from the last inference with the filtered velocity."""
+        if self._last is None:
+            return self._state(np.zeros((0, 17, 2), dtype=np.float32))
+        ahead = min(max(t - self._last_t, 0.0), self.max_extrapolate)
+        kpts = self._last["kpts"] + self._last["vel"] * ahead
+        return self._state(kpts)
+
+    def _state(self, kpts):
+        if self._last is None:
+            return {
+                "id": np.zeros(0, dtype=np.int64),
+                "xyxy": np.zeros((0, 4), dtype=np.float32),
+                "kpts": kpts,
+                "kpt_conf": np.zeros((0, 17), dtype=np.float32),
+                "angles": np.zeros((0, len(JOINT_ANGLES)), dtype=np.float32),
+            }
+        # shift boxes with the mean keypoint motion so they stay around the person
+        shift = (kpts - self._last["kpts"]).mean(axis=1) if len(kpts) else np.zeros((0, 2), np.float32)
+        return {
+            "id": self._last["id"],
+            "xyxy": self._last["xyxy"] + np.tile(shift, 2),
+            "kpts": kpts,
+            "kpt_conf": self._last["kpt_conf"],
+            "angles": joint_angles(kpts),
+        }
+
+
+def pose_to_json(state):
+    """Compact JSON-friendly representation of a PoseEngine state."""
+    names = list(JOINT_ANGLES)
+    people = []
+    for tid, box, kp, kc, ang in zip(state["id"], state["xyxy"], state["kpts"], state["kpt_conf"], state["angles"]):
+        people.append({
+            "id": int(tid),
+            "box": [round(float(v), 1) for v in box],
+            "keypoints": np.round(kp, 1).tolist(),
+            "keypoint_conf": np.round(kc, 2).tolist(),
+            "angles": {n: round(float(a), 1) for n, a in zip(names, ang)},
+        })
+    return people
+
+
+def draw_pose(frame, state, kpt_conf=0.3, color=(0, 255, 255)):
+    """Draw skeletons for all persons with one polylines call per frame."""
+    if len(state["id"]) == 0:
+        return frame
+    kpts = state["kpts"]
+    visible = state["kpt_conf"] >= kpt_conf
+    # (N, n_edges) mask of edges whose both ends are visible
+    edge_ok = visible[:, SKELETON[:, 0]] & visible[:, SKELETON[:, 1]]
+    segments = np.stack([kpts[:, SKELETON[:, 0]], kpts[:, SKELETON[:, 1]]], axis=2)[edge_ok]
+    cv2.polylines(frame, list(np.round(segments).astype(np.int32)), False, color, 2, cv2.LINE_AA)
+    for (x, y) in np.round(kpts[visible]).astype(int):
+        cv2.circle(frame, (x, y), 3, (0, 0, 255), -1)
+    for tid, box in zip(state["id"], state["xyxy"].astype(int)):
+        cv2.putText(frame, f"#{tid}", (box[0], max(12, box[1] - 4)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return frame
@@ -0,0 +1,113 @@
+# Description: Scriptable recording configuration for make_a_video.py / make_a_video_autofocus.py
+# Settings come from DEFAULTS, then an optional JSON config file, then command line flags,
+# so recordings can run unattended (cron, systemd, docker) without input() prompts.
+#
+#   python /app/make_a_video.py --width 1920 --height 1080 --fps 30 --duration 60 --passthrough
+#   python /app/make_a_video.py --config /app/record.json
+#   python /app/make_a_video.py --interactive        (old question/answer mode)
+
+import argparse
+import json
+
+import cv2
+
+DEFAULTS = {
+    "device": "0",
+    "width": 1280,
+    "height": 720,
+    "fps": 25,
+    "duration": 10,            # seconds
+    "pixel_format": "MJPG",    # camera pixel format: MJPG | YUYV | "" = driver default
+    "codec": "mp4v",           # VideoWriter fourcc when not in passthrough mode
+    "passthrough": False,      # store camera JPEGs without re-encoding
+    "preview": False,
+    "preview_width": 480,
+    "queue_size": 64,
+    "output_dir": "saved_video",
+    # camera controls, None = leave unchanged
+    "autofocus": None,
+    "focus": None,
+    "exposure": None,
+    "brightness": None,
+    "contrast": None,
+}
+
+
+def build_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--config", help="JSON file with any of the settings below")
+    parser.add_argument("-i", "--interactive", action="store_true", help="ask for settings with prompts")
+    parser.add_argument("--list-formats", action="store_true", help="print camera capabilities and exit")
+    parser.add_argument("--refresh-probe", action="store_true", help="re-probe the camera instead of using the cache")
+    parser.add_argument("--device", help="camera index, /dev/videoN or bus:<name> (frame_bus.py daemon)")
+    parser.add_argument("--width", type=int)
+    parser.add_argument("--height", type=int)
+    parser.add_argument("--fps", type=int)
+    parser.add_argument("--duration", type=int, help="seconds")
+    parser.add_argument("--pixel-format", dest="pixel_format", help="MJPG, YUYV or '' for driver default")
+    parser.add_argument("--codec", help="VideoWriter fourcc, e.g. mp4v, MJPG, avc1")
+    parser.add_argument("--passthrough", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--preview", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--preview-width", dest="preview_width", type=int)
+    parser.add_argument("--queue-size", dest="queue_size", type=int)
+    parser.add_argument("--output-dir", dest="output_dir")
+    parser.add_argument("--autofocus", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--focus", type=int, help="manual focus 0-255 (disables autofocus)")
+    parser.add_argument("--exposure", type=int, help="exposure compensation -8..8")
+    parser.add_argument("--brightness", type=int, help="0-100")
+    parser.add_argument("--contrast", type=int, help="0-100")
+    return parser
+
+
+def load_config(args):
+    """DEFAULTS < JSON config file < command line flags."""
+    cfg = dict(DEFAULTS)
+    if args.config:
+        with open(args.config) as f:
+            data = json.load(f)
+        unknown = set(data) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown settings in {args.config}: {', '.join(sorted(unknown))}")
+        cfg.update(data)
+    for key in DEFAULTS:
+        value = getattr(args, key, None)
+        if value is not None:
+            cfg[key] = value
+    return cfg
+
+
+def camera_index(device):
+    device = str(device)
+    return int(device) if device.isdigit() else device
+
+
+def apply_controls(cap, cfg):
+    """Apply the optional focus / exposure / brightness / contrast settings."""
+    if cfg["focus"] is not None:
+        cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+        cap.set(cv2.CAP_PROP_FOCUS, cfg["focus"])
+    elif cfg["autofocus"] is not None:
+        cap.set(cv2.CAP_PROP_AUTOFOCUS, 1 if cfg["autofocus"] else 0)
+    if cfg["exposure"] is not None:
+        cap.set(cv2.CAP_PROP_EXPOSURE, cfg["exposure"])
+    if cfg["brightness"] is not None:
+        cap.set(cv2.CAP_PROP_BRIGHTNESS, cfg["brightness"] / 100.0)
+    if cfg["contrast"] is not None:
+        cap.set(cv2.CAP_PROP_CONTRAST, cfg["contrast"] / 100.0)
+
+
+def open_camera(cfg):
+    """Open the camera with the configured pixel format, size, frame rate and controls."""
+    if str(cfg["device"]).startswith("bus:"):
+        # camera owned by the frame_bus daemon: size, rate and controls are set there
+        from frame_bus import BusCapture
+        return BusCapture(str(cfg["device"])[4:])
+    cap = cv2.VideoCapture(camera_index(cfg["device"]))
+    if cfg["pixel_format"]:
+        # pixel format must be chosen before the size, otherwise drivers may reject large sizes
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*cfg["pixel_format"]))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, cfg["width"])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cfg["height"])
+    cap.set(cv2.CAP_PROP_FPS, cfg["fps"])
+    apply_controls(cap, cfg)
+    return cap
@@ -0,0 +1,254 @@
+# Description: Threaded recording engine used by make_a_video.py and make_a_video_autofocus.py
+# Capture and writing run in separate threads connected by a bounded queue, so an encoder
+# stall never blocks the camera. Frames carry their capture timestamp and the writer places
+# them on the output timeline by that timestamp, so the video length matches wall time even
+# when frames are dropped. Preview is optional and downsampled.
+# MJPEG passthrough stores the JPEG frames the camera already compressed without decoding
+# or re-encoding them.
+
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+
+
+def enable_mjpeg_passthrough(cap):
+    """Ask the camera for MJPEG and make OpenCV return the compressed buffer instead of BGR."""
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    return cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+
+def is_jpeg(buf):
+    return buf is not None and buf.ndim <= 2 and buf.size > 4 and buf.ravel()[0] == 0xFF and buf.ravel()[1] == 0xD8
+
+
+class MjpegStreamWriter:
+    """Write already-encoded JPEG frames. Uses ffmpeg to mux into AVI without re-encoding
+    if it is installed, otherwise writes a raw .mjpeg stream (playable with ffplay/VLC)."""
+
+    def __init__(self, path, fps):
+        self.proc = None
+        self.f = None
+        if shutil.which("ffmpeg"):
+            self.path = os.path.splitext(path)[0] + ".avi"
+            self.proc = subprocess.Popen(
+                ["ffmpeg", "-loglevel", "error", "-y", "-f", "mjpeg", "-framerate", str(fps),
+                 "-i", "-", "-c:v", "copy", self.path],
+                stdin=subprocess.PIPE)
+        else:
+            self.path = os.path.splitext(path)[0] + ".mjpeg"
+            self.f = open(self.path, "wb", buffering=1 << 20)
+
+    def isOpened(self):
+        return self.proc is not None or self.f is not None
+
+    def write(self, jpeg_bytes):
+        if self.proc is not None:
+            self.proc.stdin.write(jpeg_bytes)
+        else:
+            self.f.write(jpeg_bytes)
+
+    def release(self):
+        if self.proc is not None:
+            self.proc.stdin.close()
+            self.proc.wait()
+        if self.f is not None:
+            self.f.close()
+
+
+class Recorder:
+    """Record from an opened cv2.VideoCapture with separate capture and writer threads.
+
+    duration: seconds of capture time to record (None = until stop()).
+    passthrough: write camera MJPEG frames as-is (call enable_mjpeg_passthrough(cap) first).
+    """
+
+    def __init__(self, cap, output_path, fps, frame_size, duration=None, codec='mp4v',
+                 passthrough=False, preview=False, preview_width=480, queue_size=64):
+        self.cap = cap
+        self.fps = float(fps)
+        self.frame_size = tuple(frame_size)
+        self.duration = duration
+        self.codec = codec
+        self.passthrough = passthrough
+        self.preview = preview
+        self.preview_width = preview_width
+        self.output_path = output_path
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._capture_done = threading.Event()
+        self._preview_lock = threading.Lock()
+        self._preview_frame = None
+        self._threads = []
+        self._t0 = None
+
+        self.stats = {
+            "captured": 0,      # frames read from the camera
+            "written": 0,       # frames in the output file
+            "dropped": 0,       # captured but lost because the writer queue was full
+            "duplicated": 0,    # output slots filled with the previous frame (camera/queue gaps)
+            "skipped": 0,       # camera delivered faster than the requested fps
+            "late": 0,          # frames that waited longer than 2 frame periods in the queue
+            "read_errors": 0,
+        }
+
+    # --- threads ---------------------------------------------------------------------------
+
+    def _capture_loop(self):
+        try:
+            while not self._stop.is_set():
+                ret, frame = self.cap.read()
+                ts = time.monotonic()
+                if not ret:
+                    self.stats["read_errors"] += 1
+                    if self.stats["read_errors"] > 50:
+                        print("\nError: Failed to read frames from camera!")
+                        break
+                    time.sleep(0.01)
+                    continue
+                if self._t0 is None:
+                    self._t0 = ts
+                if self.duration is not None and ts - self._t0 >= self.duration:
+                    break
+                self.stats["captured"] += 1
+                try:
+                    self._queue.put_nowait((ts, frame))
+                except queue.Full:
+                    # never block the camera; the writer fills the gap from timestamps
+                    self.stats["dropped"] += 1
+        finally:
+            self._capture_done.set()
+
+    def _open_writer(self):
+        if self.passthrough:
+            writer = MjpegStreamWriter(self.output_path, self.fps)
+            self.output_path = writer.path
+            return writer
+        fourcc = cv2.VideoWriter_fourcc(*self.codec)
+        return cv2.VideoWriter(self.output_path, fourcc, self.fps, self.frame_size)
+
+    def _encode_for_output(self, frame):
+        if not self.passthrough:
+            return frame
+        if is_jpeg(frame):
+            return frame.tobytes()
+        # backend ignored CONVERT_RGB=0 and decoded anyway; keep the file consistent
+        if not getattr(self, "_warned_decode", False):
+            print("\nWarning: camera did not deliver MJPEG buffers, re-encoding frames")
+            self._warned_decode = True
+        return cv2.imencode('.jpg', frame)[1].tobytes()
+
+    def _update_preview(self, frame):
+        if self.passthrough and is_jpeg(frame):
+            # decode at 1/4 size directly from the JPEG, much cheaper than a full decode
+            small = cv2.imdecode(frame.reshape(-1), cv2.IMREAD_REDUCED_COLOR_4)
+        else:
+            h, w = frame.shape[:2]
+            scale = self.preview_width / float(w)
+            small = cv2.resize(frame, (self.preview_width, int(h * scale))) if scale < 1 else frame
+        with self._preview_lock:
+            self._preview_frame = small
+
+    def _writer_loop(self, writer):
+        period = 1.0 / self.fps
+        last = None
+        preview_due = 0.0
+        try:
+            while True:
+                try:
+                    ts, frame = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._capture_done.is_set():
+                        break
+                    continue
+                if time.monotonic() - ts > 2 * period:
+                    self.stats["late"] += 1
+                # place the frame on the output timeline by its capture timestamp
+                slot = int(round((ts - self._t0) * self.fps))
+                if slot < self.stats["written"]:
+                    self.stats["skipped"] += 1
+                    continue
+                data = self._encode_for_output(frame)
+                if last is not None:
+                    gap = slot - self.stats["written"]
+                    for _ in range(gap):
+                        writer.write(last)
+                    self.stats["duplicated"] += gap
+                    self.stats["written"] += gap
+                writer.write(data)
+                self.stats["written"] += 1
+                last = data
+                if self.preview and ts >= preview_due:
+                    self._update_preview(frame)
+                    preview_due = ts + 0.1  # ~10 Hz preview is plenty
+        finally:
+            writer.release()
+
+    # --- control ---------------------------------------------------------------------------
+
+    def start(self):
+        writer = self._open_writer()
+        if not writer.isOpened():
+            raise RuntimeError("Cannot create video writer!")
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._writer_loop, args=(writer,), name="writer", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def run(self):
+        """Start recording and block until done; shows preview / progress from this thread."""
+        self.start()
+        last_progress = 0.0
+        try:
+            while self.is_running():
+                now = time.monotonic()
+                if now - last_progress >= 1.0:
+                    elapsed = now - self._t0 if self._t0 else 0.0
+                    total = f"/{self.duration}s" if self.duration else "s"
+                    print(f"\rRecording... {elapsed:.0f}{total}  frames {self.stats['written']}  "
+                          f"dropped {self.stats['dropped']}", end='', flush=True)
+                    last_progress = now
+                if self.preview:
+                    with self._preview_lock:
+                        small = self._preview_frame
+                    if small is not None:
+                        cv2.imshow('Recording...', small)
+                    if cv2.waitKey(30) & 0xFF == ord('q'):
+                        self.stop()
+                else:
+                    time.sleep(0.1)
+        except KeyboardInterrupt:
+            print("\n\nRecording interrupted by user.")
+            self.stop()
+        finally:
+            for t in self._threads:
+                t.join()
+            if self.preview:
+                cv2.destroyAllWindows()
+        return self.stats
+
+    def report(self):
+        """Print a summary of captured / written / dropped / late frames."""
+        s = self.stats
+        print(f"\n\nOutput: {self.output_path}")
+        print(f"Frames captured:   {s['captured']}")
+        print(f"Frames written:    {s['written']} ({s['written'] / self.fps:.1f}s at {self.fps:g} fps)")
+        print(f"Dropped (queue full): {s['dropped']}")
+        print(f"Duplicated (gaps):    {s['duplicated']}")
+        print(f"Skipped (camera faster than fps): {s['skipped']}")
+        print(f"Late (>2 frame periods in queue): {s['late']}")
+        if s["read_errors"]:
+            print(f"Camera read errors:   {s['read_errors']}")
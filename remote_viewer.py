@@ -0,0 +1,177 @@
+# Description: Optional local viewer for headless inference loops
+# The inference process publishes annotated frames on a Unix socket; a viewer process can
+# attach and detach at any time. Nothing is encoded while no viewer is attached, and each
+# viewer gets its own sender thread holding only the newest frame, so a slow or stalled viewer
+# drops frames instead of slowing the inference loop.
+# Wire format: 4-byte big-endian length followed by one JPEG, repeated.
+#
+#   python /app/remote_viewer.py --socket /tmp/yolo_view.sock          (opens a window)
+#   python /app/remote_viewer.py --socket /tmp/yolo_view.sock --save /results/view.jpg
+
+import argparse
+import os
+import socket
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class _Viewer:
+    """One attached viewer: latest-frame slot plus sender thread."""
+
+    def __init__(self, conn, on_close):
+        self.conn = conn
+        self.on_close = on_close
+        self.cond = threading.Condition()
+        self.jpeg = None
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        threading.Thread(target=self._send_loop, daemon=True).start()
+
+    def offer(self, jpeg):
+        with self.cond:
+            if self.jpeg is not None:
+                self.dropped += 1
+            self.jpeg = jpeg
+            self.cond.notify()
+
+    def _send_loop(self):
+        try:
+            while True:
+                with self.cond:
+                    while self.jpeg is None and not self.closed:
+                        self.cond.wait()
+                    if self.closed:
+                        return
+                    jpeg, self.jpeg = self.jpeg, None
+                self.conn.sendall(struct.pack(">I", len(jpeg)) + jpeg)
+                self.sent += 1
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify()
+        self.conn.close()
+        self.on_close(self)
+
+
+class FramePublisher:
+    """Publish frames to any number of local viewers attached to a Unix socket."""
+
+    def __init__(self, path="/tmp/yolo_view.sock", width=960, quality=75):
+        self.path = path
+        self.width = width
+        self.quality = quality
+        self._viewers = []
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen(4)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            with self._lock:
+                self._viewers.append(_Viewer(conn, self._remove))
+            print(f"Viewer attached ({len(self._viewers)} total)")
+
+    def _remove(self, viewer):
+        with self._lock:
+            if viewer in self._viewers:
+                self._viewers.remove(viewer)
+        print(f"Viewer detached (sent {viewer.sent}, dropped {viewer.dropped})")
+
+    @property
+    def active(self):
+        """True while at least one viewer is attached; skip annotation when False."""
+        return bool(self._viewers)
+
+    def publish(self, frame):
+        """Encode once and hand the JPEG to every viewer. No-op without viewers."""
+        with self._lock:
+            viewers = list(self._viewers)
+        if not viewers:
+            return False
+        if self.width and frame.shape[1] > self.width:
+            frame = cv2.resize(frame, (self.width, int(frame.shape[0] * self.width / frame.shape[1])))
+        ok, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return False
+        jpeg = buf.tobytes()
+        for viewer in viewers:
+            viewer.offer(jpeg)
+        return True
+
+    def close(self):
+        self._server.close()
+        with self._lock:
+            viewers = list(self._viewers)
+        for viewer in viewers:
+            viewer.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def read_frames(path):
+    """Yield decoded frames from a publisher socket until it closes."""
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.connect(path)
+    f = conn.makefile("rb")
+    try:
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                return
+            data = f.read(struct.unpack(">I", header)[0])
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield frame
+    finally:
+        f.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attach to a headless inference loop and show its frames")
+    parser.add_argument("--socket", default="/tmp/yolo_view.sock")
+    parser.add_argument("--save", help="write the latest frame to this file instead of opening a window")
+    args = parser.parse_args()
+
+    frames, t0 = 0, time.time()
+    try:
+        for frame in read_frames(args.socket):
+            frames += 1
+            if args.save:
+                cv2.imwrite(args.save, frame)
+                continue
+            cv2.imshow("YOLO viewer", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"No inference loop is publishing on {args.socket}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cv2.destroyAllWindows()
+    dt = time.time() - t0
+    print(f"Viewer received {frames} frames ({frames / dt if dt > 0 else 0:.1f} FPS)")
+
+
+if __name__ == '__main__':
+    main()
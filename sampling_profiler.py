@@ -0,0 +1,158 @@
+# Description: On-demand sampling profiler for the running Flask servers
+# When the stream slows down in the field we need to see where the time goes (predict, plot,
+# encode, viewer generators, v4l2-ctl calls) without restarting under a profiler. GET
+# /debug/profile samples the Python stack of every thread (sys._current_frames) at `hz` for
+# `seconds` and returns folded stacks, one "thread;outer (file);...;inner (file) count" line per
+# stack, the input format of flamegraph.pl, speedscope and inferno.
+# Nothing runs and nothing is collected until a profile is requested; only one runs at a time.
+# Native code (cv2.imencode, TensorRT, socket writes) shows up as the Python line calling it.
+#
+# It is an admin endpoint (stacks, file names, a worker held for up to a minute): the route only
+# exists when the server is started with PROFILE_TOKEN=<secret>, every request must send it.
+#
+#   curl -o stream.folded -H 'X-Profile-Token: <secret>' 'http://<jetson-ip>:5001/debug/profile?seconds=10&hz=100'
+#   flamegraph.pl stream.folded > stream.svg          (or drop the file on https://www.speedscope.app)
+#   curl 'http://<jetson-ip>:5001/debug/profile?seconds=5&format=top&token=<secret>'   (hottest functions as JSON)
+
+import collections
+import hmac
+import os
+import sys
+import threading
+import time
+
+MAX_SECONDS = 60.0
+MAX_HZ = 1000
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads for a fixed time; one profile at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels = {}  # code object -> "name (file)" label
+        self.last = None
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def _label(self, frame, lines):
+        code = frame.f_code
+        if lines:
+            return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)})".replace(";", ":")
+        return label
+
+    def profile(self, seconds=10.0, hz=100, lines=False):
+        """Sample every thread but the caller's. Returns (Counter of folded stacks, meta dict).
+
+        Raises RuntimeError if another profile is running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("a profile is already running")
+        try:
+            me = threading.get_ident()
+            stacks = collections.Counter()
+            interval = 1.0 / hz
+            samples = 0
+            cost = 0.0
+            start = time.monotonic()
+            next_t = start
+            while True:
+                t0 = time.perf_counter()
+                names = {t.ident: t.name.replace(";", ":") for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._label(frame, lines))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    stacks[";".join(reversed(stack))] += 1
+                del frame
+                samples += 1
+                cost += time.perf_counter() - t0
+                next_t += interval
+                now = time.monotonic()
+                if now - start >= seconds:
+                    break
+                if next_t > now:
+                    time.sleep(next_t - now)
+                else:
+                    next_t = now  # sampling fell behind, do not burst to catch up
+            elapsed = time.monotonic() - start
+            self.last = {"seconds": round(elapsed, 2), "hz": hz, "samples": samples,
+                         "threads": len({s.split(";", 1)[0] for s in stacks}),
+                         "sample_ms": round(cost / max(1, samples) * 1000.0, 3),
+                         "overhead_pct": round(cost / elapsed * 100.0, 2) if elapsed else 0.0,
+                         "finished": time.time()}
+            return stacks, dict(self.last)
+        finally:
+            self._lock.release()
+
+
+def folded(stacks):
+    """Brendan Gregg's folded format, heaviest stacks first."""
+    return "".join(f"{stack} {n}\n" for stack, n in stacks.most_common())
+
+
+def top(stacks, samples, limit=30):
+    """Per thread sample counts and the functions with the most self / total samples (in % of samples)."""
+    threads = collections.Counter()
+    own = collections.Counter()
+    total = collections.Counter()
+    for stack, n in stacks.items():
+        frames = stack.split(";")
+        threads[frames[0]] += n
+        if len(frames) > 1:
+            own[(frames[0], frames[-1])] += n
+            for f in set(frames[1:]):
+                total[(frames[0], f)] += n
+    pct = lambda n: round(n * 100.0 / max(1, samples), 1)
+    rows = lambda c: [{"thread": t, "function": f, "pct": pct(n)} for (t, f), n in c.most_common(limit)]
+    return {"threads": dict(threads.most_common()), "self": rows(own), "total": rows(total)}
+
+
+def add_profile_routes(app, token, profiler=None):
+    """Register GET /debug/profile?seconds=&hz=&format=folded|top&lines=0|1 on a Flask app.
+
+    Nothing is registered without a token; requests send it as X-Profile-Token or ?token=.
+    """
+    if not token:
+        return None
+    from flask import Response, jsonify, request
+
+    profiler = profiler or SamplingProfiler()
+
+    def debug_profile():
+        sent = request.headers.get('X-Profile-Token') or request.args.get('token') or ""
+        if not hmac.compare_digest(sent.encode(), token.encode()):
+            return jsonify({"error": "missing or wrong token"}), 403
+        try:
+            seconds = float(request.args.get('seconds', '10'))
+            hz = int(request.args.get('hz', '100'))
+        except ValueError:
+            return jsonify({"error": "seconds and hz must be numbers"}), 400
+        if not 0 < seconds <= MAX_SECONDS or not 0 < hz <= MAX_HZ:
+            return jsonify({"error": f"seconds must be in (0, {MAX_SECONDS:g}], hz in (0, {MAX_HZ}]"}), 400
+        fmt = request.args.get('format', 'folded')
+        if fmt not in ('folded', 'top'):
+            return jsonify({"error": "format must be folded or top"}), 400
+        try:
+            # top defaults to per-line labels: "producer (web_stream_v5.py)" alone says little
+            lines = request.args.get('lines', '1' if fmt == 'top' else '0') == '1'
+            stacks, meta = profiler.profile(seconds, hz, lines=lines)
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 409
+        if fmt == 'top':
+            return jsonify(dict(meta, **top(stacks, meta["samples"])))
+        headers = {"X-Profile-" + k.replace("_", "-").title(): str(v) for k, v in meta.items()}
+        headers["Content-Disposition"] = "attachment; filename=profile.folded"
+        return Response(folded(stacks), mimetype='text/plain', headers=headers)
+
+    app.add_url_rule('/debug/profile', 'debug_profile', debug_profile)
+    return profiler
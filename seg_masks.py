@@ -0,0 +1,142 @@
+# Description: Fast segmentation mask rendering and compact mask encoding
+# r.plot() blends every mask at full frame resolution. Here all masks are composited into one
+# colour + alpha image at the model's mask resolution, which is upsampled to the frame once.
+# Masks can also be exported as RLE (COCO-style, column-major counts) or polygons for
+# downstream consumers.
+
+import json
+import threading
+
+import cv2
+import numpy as np
+
+
+def class_palette(n=256):
+    """Deterministic BGR colour per class id."""
+    rng = np.random.default_rng(12345)
+    return rng.integers(64, 256, size=(n, 3), dtype=np.uint8)
+
+
+PALETTE = class_palette()
+
+
+def crop_letterbox(masks, orig_shape):
+    """Remove the letterbox padding from (N, h, w) model-space masks (same rounding as ultralytics)."""
+    mh, mw = masks.shape[1:]
+    h0, w0 = orig_shape[:2]
+    gain = min(mh / h0, mw / w0)
+    pw, ph = (mw - w0 * gain) / 2, (mh - h0 * gain) / 2
+    top, left = int(round(ph - 0.1)), int(round(pw - 0.1))
+    bottom, right = int(round(mh - ph + 0.1)), int(round(mw - pw + 0.1))
+    return masks[:, top:bottom, left:right]
+
+
+def masks_from_result(r, scale=1.0):
+    """Boolean (N, h, w) masks of a Results object in original frame aspect, at low resolution.
+
+    scale < 1 shrinks them further before compositing (cheaper blend, softer edges).
+    """
+    if r.masks is None or len(r.masks) == 0:
+        return np.zeros((0, 1, 1), dtype=bool)
+    data = r.masks.data
+    data = data.cpu().numpy() if hasattr(data, "cpu") else np.asarray(data)
+    masks = crop_letterbox(data > 0.5, r.orig_img.shape)
+    if scale < 1.0 and masks.shape[0]:
+        h, w = masks.shape[1:]
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        masks = np.stack([cv2.resize(m.astype(np.uint8), size, interpolation=cv2.INTER_NEAREST) for m in masks]) > 0
+    return masks
+
+
+def composite(masks, classes, alpha=0.5):
+    """Composite (N, h, w) masks into one low-res BGRA image (later masks are drawn on top)."""
+    n, h, w = masks.shape
+    out = np.zeros((h, w, 4), dtype=np.uint8)
+    if n == 0:
+        return out
+    covered = masks.any(axis=0)
+    top = n - 1 - np.argmax(masks[::-1], axis=0)
+    colors = PALETTE[np.asarray(classes, dtype=np.int64)[top] % len(PALETTE)]
+    out[..., :3] = colors
+    out[..., 3] = covered * np.uint8(round(alpha * 255))
+    return out
+
+
+def blend(frame, bgra):
+    """Upsample a low-res BGRA overlay to the frame size once and alpha-blend it in place."""
+    h, w = frame.shape[:2]
+    if bgra.shape[:2] != (h, w):
+        bgra = cv2.resize(bgra, (w, h), interpolation=cv2.INTER_LINEAR)
+    a = bgra[..., 3:4].astype(np.uint16)
+    frame[:] = ((frame.astype(np.uint16) * (255 - a) + bgra[..., :3].astype(np.uint16) * a) // 255).astype(np.uint8)
+    return frame
+
+
+def render_masks(frame, masks, classes, alpha=0.5):
+    """Draw all masks on frame (in place) with a single upsample + blend."""
+    if masks.shape[0] == 0:
+        return frame
+    return blend(frame, composite(masks, classes, alpha))
+
+
+def rle_encode(mask):
+    """COCO-style uncompressed RLE (column-major, counts start with background)."""
+    mask = np.asarray(mask, dtype=bool)
+    flat = mask.ravel(order="F")
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate([[0], change, [flat.size]]))
+    if flat.size and flat[0]:
+        counts = np.concatenate([[0], counts])
+    return {"size": list(mask.shape), "counts": counts.tolist()}
+
+
+def rle_decode(rle):
+    """Inverse of rle_encode()."""
+    h, w = rle["size"]
+    counts = np.asarray(rle["counts"], dtype=np.int64)
+    values = (np.arange(len(counts)) % 2).astype(bool)
+    return np.repeat(values, counts).reshape((h, w), order="F")
+
+
+def mask_polygons(mask, frame_shape, epsilon=1.0):
+    """Outer contours of a low-res mask as polygons in frame pixel coordinates."""
+    mh, mw = mask.shape
+    sx, sy = frame_shape[1] / mw, frame_shape[0] / mh
+    contours, _ = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    polys = []
+    for c in contours:
+        c = cv2.approxPolyDP(c, epsilon, True).reshape(-1, 2).astype(np.float32)
+        if len(c) >= 3:
+            polys.append(np.round(c * (sx, sy), 1).tolist())
+    return polys
+
+
+def encode_masks(masks, frame_shape, classes, confs, names, encoding="rle"):
+    """Per-instance records with the mask as RLE, polygon or both ("rle", "polygon", "both")."""
+    records = []
+    for m, k, c in zip(masks, classes, confs):
+        rec = {"class": names.get(int(k), str(k)), "class_id": int(k), "confidence": round(float(c), 3)}
+        if encoding in ("rle", "both"):
+            rec["rle"] = rle_encode(m)
+        if encoding in ("polygon", "both"):
+            rec["polygon"] = mask_polygons(m, frame_shape)
+        records.append(rec)
+    return records
+
+
+class MaskWriter:
+    """Append encoded masks of each frame as one JSON line (buffered, thread-safe)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._f = open(path, "a", buffering=1 << 16)
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._f.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._f.close()
@@ -0,0 +1,155 @@
+# Description: Fast startup for the Flask servers
+# Importing ultralytics/torch and building YOLO(MODEL_PATH) takes several seconds on a Jetson,
+# and the servers used to do it at module import, before app.run() bound the port. Now the
+# servers bind right away and run the heavy part in a Warmup thread:
+# - /healthz  liveness: 200 while the process is starting or the producer keeps beating
+#   (no frame within stale_after of becoming ready also counts as dead)
+# - /readyz   readiness: 503 until every warm-up step finished (then the stream has a model)
+# Routes that need the model are wrapped with requires_ready() and answer 503 meanwhile.
+#
+#   python /app/startup.py imports                 (import cost of each module, fresh interpreter)
+#   python /app/startup.py imports cv2 ultralytics web_stream_v5
+
+import argparse
+import functools
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+MODULES = ["numpy", "cv2", "flask", "torch", "ultralytics", "annotator", "tiling", "tracker", "frame_source",
+           "admission", "batcher", "event_recorder", "detection_feed", "detection_filter", "live_stream",
+           "pose_engine", "web_control_stream", "web_stream_v4", "web_stream_segment", "web_stream_v5",
+           "web_stream_pose_v3"]
+
+
+class Warmup:
+    """Named start-up steps run in a background thread, plus a heartbeat for liveness."""
+
+    def __init__(self, stale_after=10.0):
+        self.state = "starting"
+        self.error = None
+        self.steps = {}
+        self.stale_after = stale_after
+        self.started = time.monotonic()
+        self.ready_at = None
+        self._beat = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def start(self, steps, on_ready=None):
+        """Run [(label, fn), ...] in order in a daemon thread, then on_ready()."""
+        def run():
+            try:
+                for label, fn in steps:
+                    t0 = time.perf_counter()
+                    fn()
+                    self.steps[label] = round((time.perf_counter() - t0) * 1000.0, 1)
+                    print(f"Startup: {label} {self.steps[label]:.0f} ms")
+                self.ready_at = time.monotonic()
+                self.state = "ready"
+                print(f"Startup: ready after {time.monotonic() - self.started:.1f} s")
+                if on_ready is not None:
+                    on_ready()
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+
+        thread = threading.Thread(target=run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def beat(self):
+        """Called by the producer on every frame."""
+        self._beat = time.monotonic()
+
+    def alive(self):
+        if self.state == "failed":
+            return False
+        if self.state == "starting":
+            return True
+        # a producer that died before its first frame (camera not opening) goes stale from readiness
+        last = self._beat if self._beat is not None else self.ready_at
+        return time.monotonic() - last < self.stale_after
+
+    def status(self):
+        return {"state": self.state, "error": self.error, "uptime_s": round(time.monotonic() - self.started, 1),
+                "steps_ms": dict(self.steps),
+                "last_frame_s": round(time.monotonic() - self._beat, 2) if self._beat is not None else None}
+
+
+def requires_ready(warmup):
+    """Route decorator: 503 with the warm-up status until the model is loaded."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not warmup.ready:
+                from flask import jsonify
+                return jsonify({"error": f"server {warmup.state}, retry later", "startup": warmup.status()}), 503
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_health_routes(app, warmup):
+    """Register /healthz (liveness) and /readyz (readiness) on a Flask app."""
+    from flask import jsonify
+
+    def healthz():
+        return jsonify(warmup.status()), 200 if warmup.alive() else 503
+
+    def readyz():
+        return jsonify(warmup.status()), 200 if warmup.ready else 503
+
+    app.add_url_rule('/healthz', 'healthz', healthz)
+    app.add_url_rule('/readyz', 'readyz', readyz)
+
+
+def import_cost(module, python=sys.executable, cwd=None):
+    """(cumulative ms from -X importtime, wall ms of the whole interpreter) for one module."""
+    cmd = [python, "-X", "importtime", "-c", f"import {module}"]
+    t0 = time.perf_counter()
+    p = subprocess.run(cmd, capture_output=True, text=True, cwd=cwd, timeout=300,
+                       env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+    wall = (time.perf_counter() - t0) * 1000.0
+    if p.returncode != 0:
+        return None, wall, p.stderr.strip().splitlines()[-1] if p.stderr.strip() else f"exit {p.returncode}"
+    cumulative = None
+    for line in p.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)$", line)
+        if m and m.group(2) == module:
+            cumulative = int(m.group(1)) / 1000.0
+    return cumulative, wall, None
+
+
+def imports(args):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    _, baseline, _ = import_cost("sys", cwd=cwd)
+    print(f"\n=== import cost, fresh interpreter each (interpreter start {baseline:.0f} ms) ===")
+    print(f"{'module':<22} {'import ms':>10} {'wall ms':>9}")
+    for module in args.modules or MODULES:
+        cumulative, wall, error = import_cost(module, cwd=cwd)
+        if error:
+            print(f"{module:<22} {'-':>10} {wall:>9.0f}  {error[:60]}")
+        else:
+            print(f"{module:<22} {cumulative:>10.0f} {wall:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup helpers for the Flask servers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("imports", help="measure the import cost of modules")
+    p.add_argument("modules", nargs="*", help=f"default: {' '.join(MODULES)}")
+    p.set_defaults(func=imports)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
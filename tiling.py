@@ -0,0 +1,156 @@
+# Description: Region-of-interest and tiled inference helpers
+# Instead of upscaling the whole frame (imgsz=1920) to catch small objects, the model runs on
+# crops at a small native size and the detections are merged back with cross-tile NMS.
+# ROIs are stored per camera as normalized [x1, y1, x2, y2] boxes in a JSON file.
+
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def make_tiles(width, height, tile_size=640, overlap=0.2):
+    """Return overlapping (x1, y1, x2, y2) tiles that cover a width x height frame."""
+    tile_size = int(tile_size)
+    step = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        s = list(range(0, length - tile_size, step))
+        # last tile is aligned to the frame edge so nothing is cut off
+        s.append(length - tile_size)
+        return s
+
+    tiles = []
+    for y in starts(height):
+        for x in starts(width):
+            tiles.append((x, y, min(x + tile_size, width), min(y + tile_size, height)))
+    return tiles
+
+
+def rois_to_pixels(rois, width, height):
+    """Convert normalized [x1, y1, x2, y2] ROIs into clipped integer pixel boxes."""
+    regions = []
+    for x1, y1, x2, y2 in rois:
+        px1 = int(round(min(x1, x2) * width))
+        py1 = int(round(min(y1, y2) * height))
+        px2 = int(round(max(x1, x2) * width))
+        py2 = int(round(max(y1, y2) * height))
+        px1, px2 = max(0, px1), min(width, px2)
+        py1, py2 = max(0, py1), min(height, py2)
+        # skip degenerate boxes (e.g. a click without drag in the UI)
+        if px2 - px1 >= 8 and py2 - py1 >= 8:
+            regions.append((px1, py1, px2, py2))
+    return regions
+
+
+def validate_rois(rois):
+    """Return ROIs as a list of normalized 4-float lists, raise ValueError if malformed."""
+    out = []
+    for roi in rois:
+        if len(roi) != 4:
+            raise ValueError("each ROI needs 4 values: x1, y1, x2, y2")
+        vals = [float(v) for v in roi]
+        if any(v < 0.0 or v > 1.0 for v in vals):
+            raise ValueError("ROI values must be normalized to 0..1")
+        out.append(vals)
+    return out
+
+
+class RoiStore:
+    """Thread-safe per-camera ROI configuration backed by a JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._config = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._config = json.load(f)
+            except (OSError, ValueError) as e:
+                print("Could not read ROI config:", e)
+
+    def get(self, camera):
+        with self._lock:
+            return [list(r) for r in self._config.get(str(camera), [])]
+
+    def set(self, camera, rois):
+        """Validate, persist, then apply. Raises OSError (ROIs not applied) if the file cannot be written."""
+        rois = validate_rois(rois)
+        with self._lock:
+            config = dict(self._config, **{str(camera): rois})
+            if self.path:
+                tmp = self.path + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(config, f, indent=2)
+                os.replace(tmp, self.path)
+            self._config = config
+        return rois
+
+
+def nms(boxes, scores, classes=None, iou_thres=0.5):
+    """Vectorized greedy NMS. Returns indices of kept boxes, highest score first.
+
+    If classes are given, boxes of different classes never suppress each other.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    boxes = np.asarray(boxes, dtype=np.float32)
+    if classes is not None:
+        # shift each class into its own coordinate range (class-aware NMS in one pass)
+        offset = np.asarray(classes, dtype=np.float32)[:, None] * (boxes.max() + 1.0)
+        boxes = boxes + offset
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = np.argsort(-np.asarray(scores))
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thres]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def empty_detections():
+    return {
+        "xyxy": np.zeros((0, 4), dtype=np.float32),
+        "conf": np.zeros(0, dtype=np.float32),
+        "cls": np.zeros(0, dtype=np.int64),
+    }
+
+
+def predict_regions(model, frame, regions, imgsz=640, conf=0.25, iou_thres=0.5, classes=None):
+    """Run the model on frame crops in one batch and merge detections into frame coordinates."""
+    if not regions:
+        return empty_detections()
+    crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+    results = model.predict(crops, imgsz=imgsz, conf=conf, classes=classes, save=False, verbose=False)
+
+    all_xyxy, all_conf, all_cls = [], [], []
+    for (x1, y1, _, _), r in zip(regions, results):
+        if r.boxes is None or len(r.boxes) == 0:
+            continue
+        xyxy = r.boxes.xyxy.cpu().numpy().astype(np.float32)
+        xyxy[:, [0, 2]] += x1
+        xyxy[:, [1, 3]] += y1
+        all_xyxy.append(xyxy)
+        all_conf.append(r.boxes.conf.cpu().numpy().astype(np.float32))
+        all_cls.append(r.boxes.cls.cpu().numpy().astype(np.int64))
+    if not all_xyxy:
+        return empty_detections()
+
+    xyxy = np.concatenate(all_xyxy)
+    confs = np.concatenate(all_conf)
+    clss = np.concatenate(all_cls)
+    # objects on tile seams are detected twice; keep the best box per object
+    keep = nms(xyxy, confs, clss, iou_thres)
+    return {"xyxy": xyxy[keep], "conf": confs[keep], "cls": clss[keep]}
+
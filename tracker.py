@@ -0,0 +1,139 @@
+# Description: Lightweight multi-object tracker (IoU association + constant-velocity filter)
+# Assigns persistent IDs to detections so the model can run every N frames and events
+# (e.g. "cup seen") fire once per object instead of once per frame.
+# All per-track state lives in NumPy arrays; association is vectorized IoU + greedy matching.
+
+import numpy as np
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes, returns (N, M)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod((br - tl).clip(0), axis=2)
+    area_a = np.prod((a[:, 2:] - a[:, :2]).clip(0), axis=1)
+    area_b = np.prod((b[:, 2:] - b[:, :2]).clip(0), axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def greedy_match(cost, thres):
+    """Greedy best-first matching on a score matrix. Returns (rows, cols) index arrays."""
+    cost = np.array(cost, dtype=np.float32, copy=True)
+    rows, cols = [], []
+    for _ in range(min(cost.shape) if cost.size else 0):
+        i, j = np.unravel_index(np.argmax(cost), cost.shape)
+        if cost[i, j] < thres:
+            break
+        rows.append(i)
+        cols.append(j)
+        cost[i, :] = -1.0
+        cost[:, j] = -1.0
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+
+class Tracker:
+    """IoU tracker with an alpha-beta (constant velocity) box filter.
+
+    update() is called on frames that ran the detector, predict() on the frames in between.
+    Both return the visible tracks as a dict of arrays: xyxy, conf, cls, id.
+    """
+
+    def __init__(self, iou_thres=0.3, max_age=30, min_hits=1, alpha=0.6, beta=0.2):
+        self.iou_thres = iou_thres
+        self.max_age = max_age      # detection passes a track may be missed before it is dropped
+        self.min_hits = min_hits    # detection passes before a track is reported
+        self.alpha = alpha          # position gain
+        self.beta = beta            # velocity gain
+        self._next_id = 1
+        self._fired = {}
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.vel = np.zeros((0, 4), dtype=np.float32)
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.conf = np.zeros(0, dtype=np.float32)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+        self.since = np.zeros(0, dtype=np.int64)  # frames since the last matched detection
+        self.det_ids = np.zeros(0, dtype=np.int64)  # track id of each detection from the last update()
+
+    def _advance(self):
+        self.boxes += self.vel
+        self.since += 1
+
+    def _keep(self, mask):
+        for tid in self.ids[~mask]:
+            self._fired.pop(int(tid), None)
+        for name in ("ids", "boxes", "vel", "cls", "conf", "hits", "misses", "since"):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def active(self):
+        """Tracks seen in the last detection pass and confirmed by min_hits."""
+        mask = (self.misses == 0) & (self.hits >= self.min_hits)
+        return {
+            "xyxy": self.boxes[mask].copy(),
+            "conf": self.conf[mask].copy(),
+            "cls": self.cls[mask].copy(),
+            "id": self.ids[mask].copy(),
+        }
+
+    def predict(self):
+        """Propagate all tracks one frame without running the detector."""
+        self._advance()
+        return self.active()
+
+    def update(self, xyxy, conf, cls):
+        """Advance one frame and correct the tracks with a new set of detections."""
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        self._advance()
+
+        iou = iou_matrix(self.boxes, xyxy)
+        if iou.size:
+            # never associate boxes of different classes
+            iou[self.cls[:, None] != cls[None, :]] = 0.0
+        ti, di = greedy_match(iou, self.iou_thres)
+        det_ids = np.zeros(len(xyxy), dtype=np.int64)
+        det_ids[di] = self.ids[ti]
+
+        if len(ti):
+            resid = xyxy[di] - self.boxes[ti]
+            self.vel[ti] += self.beta * resid / self.since[ti][:, None]
+            self.boxes[ti] += self.alpha * resid
+            self.conf[ti] = conf[di]
+            self.hits[ti] += 1
+            self.misses[ti] = 0
+            self.since[ti] = 0
+
+        missed = np.ones(len(self.ids), dtype=bool)
+        missed[ti] = False
+        self.misses[missed] += 1
+        self.vel[missed] *= 0.5  # do not let lost tracks drift away
+        self._keep(self.misses <= self.max_age)
+
+        new = np.ones(len(xyxy), dtype=bool)
+        new[di] = False
+        n = int(new.sum())
+        if n:
+            det_ids[new] = np.arange(self._next_id, self._next_id + n)
+            self.ids = np.concatenate([self.ids, det_ids[new]])
+            self._next_id += n
+            self.boxes = np.concatenate([self.boxes, xyxy[new]])
+            self.vel = np.concatenate([self.vel, np.zeros((n, 4), dtype=np.float32)])
+            self.cls = np.concatenate([self.cls, cls[new]])
+            self.conf = np.concatenate([self.conf, conf[new]])
+            self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int64)])
+            self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int64)])
+            self.since = np.concatenate([self.since, np.zeros(n, dtype=np.int64)])
+        self.det_ids = det_ids
+        return self.active()
+
+    def fire_once(self, track_id, event="default"):
+        """Return True the first time an event is fired for a track, False afterwards."""
+        fired = self._fired.setdefault(int(track_id), set())
+        if event in fired:
+            return False
+        fired.add(event)
+        return True
@@ -1,31 +1,44 @@
-
-from ultralytics import YOLO
-import cv2
+import sys
 
 # --- Configuration ---
 # NOTE: This path is *inside* the Docker container's file system
-MODEL_PATH = '/app/yolov8n.engine' 
-
-# --- Inference ---
-# 1. Load the exported TensorRT engine model
-model = YOLO(MODEL_PATH)
+MODEL_PATH = '/app/yolov8n.engine'
 
 # ... (Imports and model loading are the same)
-INPUT_PATH = '/data/dogs.mp4'  # <<< Change this to your video file path
+INPUT_PATH = '/data/dogs.mp4'  # <<< Change this to your video file path (or: python video_inference.py <video>)
 OUTPUT_PATH = '/results/output_video.mp4' # <<< Change the output to a video file
 
-# Run prediction with the 'save=True' flag to save the output video
-# The prediction returns a generator stream for videos/webcams
-results_generator = model.predict(
-    source=INPUT_PATH, 
-    save=True,
-    # CRITICAL CHANGE: Set the 'project' argument to the mounted folder
-    project='/results',
-    # Optional: Set a specific sub-folder name (e.g., 'video_run_1')
-    name='video_output', 
-    exist_ok=True,
-    verbose=False
-)
-# Note: You don't need a loop here; 'save=True' handles the file writing automatically.
-
-print(f"Video inference completed. Output saved to /results/")
\ No newline at end of file
+
+def run(model_path=MODEL_PATH, input_path=INPUT_PATH, project='/results', name='video_output', imgsz=640,
+        conf=0.25, batch=1):
+    """Annotate a video file into <project>/<name>/, returns the number of frames processed."""
+    from ultralytics import YOLO
+
+    # --- Inference ---
+    # 1. Load the exported TensorRT engine model
+    model = YOLO(model_path)
+
+    # Run prediction with the 'save=True' flag to save the output video
+    # stream=True yields one Results per frame instead of keeping the whole video in a list
+    results_generator = model.predict(
+        source=input_path,
+        save=True,
+        stream=True,
+        # CRITICAL CHANGE: Set the 'project' argument to the mounted folder
+        project=project,
+        # Optional: Set a specific sub-folder name (e.g., 'video_run_1')
+        name=name,
+        exist_ok=True,
+        verbose=False,
+        imgsz=imgsz,
+        conf=conf,
+        batch=batch,
+    )
+    # the generator has to be consumed, 'save=True' writes the frames as they come
+    frames = sum(1 for _ in results_generator)
+    print(f"Video inference completed: {frames} frames. Output saved to {project}/{name}/")
+    return frames
+
+
+if __name__ == '__main__':
+    run(input_path=sys.argv[1] if len(sys.argv) > 1 else INPUT_PATH)
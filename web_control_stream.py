@@ -6,10 +6,21 @@ import threading
 from flask import Flask, Response, render_template, jsonify, request
 import cv2
 
+from capture_format import FormatCapture
+from frame_bus import BusCapture
+from sampling_profiler import add_profile_routes
+
 CAM_DEVICE = os.environ.get("CAM_DEVICE", "/dev/video0")
 PORT = int(os.environ.get("STREAM_PORT", "5002"))  # choose different port if needed
+# request MJPEG explicitly, YUYV at 720p is limited to ~10 FPS by USB bandwidth on most cameras
+CAM_FORMAT = os.environ.get("CAM_FORMAT", "MJPG")
+# read frames from a frame_bus.py daemon instead of opening the camera (controls still use v4l2-ctl)
+FRAME_BUS = os.environ.get("FRAME_BUS", "")
+# GET /debug/profile samples all threads on demand (admin only: exists only when PROFILE_TOKEN is set)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
+add_profile_routes(app, PROFILE_TOKEN)
 
 # Shared frame storage
 latest_frame = None
@@ -126,11 +137,11 @@ def set_control(name, value):
 
 def producer():
     global latest_frame, cap
-    cap = cv2.VideoCapture(0)
     # set a reasonable resolution (can be adjusted by client)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    cap.set(cv2.CAP_PROP_FPS, 30)
+    if FRAME_BUS:
+        cap = BusCapture(FRAME_BUS)
+    else:
+        cap = FormatCapture(0, 1280, 720, 30, pixel_format=CAM_FORMAT)
     last_time = time.time()
     while not stop_event.is_set():
         ret, frame = cap.read()
@@ -206,7 +217,7 @@ def video_feed():
 
 if __name__ == '__main__':
     # start producer thread
-    t = threading.Thread(target=producer, daemon=True)
+    t = threading.Thread(target=producer, name="producer", daemon=True)
     t.start()
     try:
         app.run(host='0.0.0.0', port=PORT, threaded=True)
@@ -1,23 +1,57 @@
-from ultralytics import YOLO
-from flask import Flask, Response, render_template_string
+from flask import Flask, Response, render_template_string, jsonify
 import os
 import cv2
 import time
 import threading
 
+from annotator import Annotator
+from frame_source import open_source
+from pose_engine import PoseEngine, draw_pose, pose_to_json
+from sampling_profiler import add_profile_routes
+from startup import Warmup, add_health_routes
+
 # Config (can override via environment)
 MODEL_PATH = os.environ.get("MODEL_PATH", "/app/yolo11n-pose.engine")  # adjust name if needed
 CAMERA_SOURCE = int(os.environ.get("CAMERA_SOURCE", "0"))
 FPS_LIMIT = float(os.environ.get("FPS_LIMIT", "10.0"))  # lower FPS for pose
+PORT = int(os.environ.get("PORT", "5001"))
+IMGSZ = int(os.environ.get("IMGSZ", "1920"))
+# camera pixel format (MJPG | YUYV), "" = driver default; see web_stream_v5.py
+CAPTURE_FORMAT = os.environ.get("CAPTURE_FORMAT", "")
+# capture size, 0 = driver default (set CAPTURE_FORMAT=MJPG with 1920x1080, YUYV 1080p is ~5 FPS over USB)
+CAPTURE_WIDTH = int(os.environ.get("CAPTURE_WIDTH", "0"))
+CAPTURE_HEIGHT = int(os.environ.get("CAPTURE_HEIGHT", "0"))
+CAPTURE_DECODE_SCALE = int(os.environ.get("CAPTURE_DECODE_SCALE", "1"))
+# frame_source spec instead of CAMERA_SOURCE: synthetic, replay:/app/clip.mp4, gst:<pipeline>, csi://0
+FRAME_SOURCE = os.environ.get("FRAME_SOURCE", "")
+# 1 = keep keypoints, smooth them per person and draw ourselves; 0 = plain r.plot() stream
+POSE_ENGINE = os.environ.get("POSE_ENGINE", "1") == "1"
+# run the pose model every N displayed frames, keypoints are extrapolated in between
+POSE_EVERY = int(os.environ.get("POSE_EVERY", "1"))
+# GET /debug/profile samples all threads on demand (admin only: exists only when PROFILE_TOKEN is set)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
 
 app = Flask(__name__)
 
-# load model once; explicitly set task='pose' if using .pt
-# If using a TensorRT engine, YOLO(MODEL_PATH) should work; for .pt use YOLO(MODEL_PATH, task='pose')
-if MODEL_PATH.endswith('.pt'):
-    model = YOLO(MODEL_PATH, task='pose')
-else:
-    model = YOLO(MODEL_PATH)
+# bind the port first, import ultralytics and load the engine in the background (see startup.py)
+warmup = Warmup()
+add_health_routes(app, warmup)
+add_profile_routes(app, PROFILE_TOKEN)
+model = None
+annotator = None
+
+def load_model():
+    """Load the model once (called by the warm-up thread)."""
+    global model, annotator
+    from ultralytics import YOLO
+
+    # explicitly set task='pose' if using .pt
+    # If using a TensorRT engine, YOLO(MODEL_PATH) should work; for .pt use YOLO(MODEL_PATH, task='pose')
+    if MODEL_PATH.endswith('.pt'):
+        model = YOLO(MODEL_PATH, task='pose')
+    else:
+        model = YOLO(MODEL_PATH)
+    annotator = Annotator(model.names)
 
 INDEX_HTML = """
 <!doctype html>
@@ -25,6 +59,18 @@ INDEX_HTML = """
 <h1>YOLO11 Pose Stream</h1>
 <img src="{{ url_for('video_feed') }}" width="1080" />
 <p>FPS_LIMIT</p>
+<p id="startup"></p>
+<script>
+  // served before the model is loaded, show progress until /readyz answers 200
+  async function checkReady(){
+    const res = await fetch('/readyz');
+    const st = await res.json();
+    document.getElementById('startup').textContent = res.ok ? '' :
+      (st.state === 'failed' ? `Model failed to load: ${st.error}` : `Loading model... ${st.uptime_s} s`);
+    if (!res.ok && st.state !== 'failed') setTimeout(checkReady, 1000);
+  }
+  checkReady();
+</script>
 <p>Press Ctrl+C in container to stop server.</p>
 """
 
@@ -37,10 +83,15 @@ stop_event = threading.Event()
 fps_smoothed = 0.0
 last_frame_time = None
 
-def producer():
-    """Single background producer: runs model.predict(stream=True) and updates latest_frame."""
-    global latest_frame, fps_smoothed, last_frame_time
-    try:
+# smoothed keypoints / joint angles of the last displayed frame (served on /pose)
+pose_engine = PoseEngine()
+latest_pose = []
+pose_lock = threading.Lock()
+
+def pose_frames():
+    """Yield annotated frames; with POSE_ENGINE the model only runs every POSE_EVERY frames."""
+    global latest_pose
+    if not POSE_ENGINE and not CAPTURE_FORMAT and not FRAME_SOURCE:
         # ask model to run inference at a larger input size (e.g. 1920)
         # NOTE: larger imgsz => more GPU memory and slower FPS
         results = model.predict(
@@ -48,16 +99,50 @@ def producer():
             stream=True,
             save=False,
             verbose=False,
-            imgsz=1920  # increase model input size
+            imgsz=IMGSZ  # increase model input size
         )
+        for r in results:
+            yield r.plot()
+        return
+
+    cap = open_source(FRAME_SOURCE or CAMERA_SOURCE, CAPTURE_WIDTH, CAPTURE_HEIGHT, pixel_format=CAPTURE_FORMAT,
+                      decode_scale=CAPTURE_DECODE_SCALE)
+    frame_idx = 0
+    try:
+        while not stop_event.is_set():
+            ret, frame, now = cap.read()
+            if not ret:
+                break
+            if frame_idx % max(1, POSE_EVERY) == 0:
+                r = model.predict(frame, save=False, verbose=False, imgsz=IMGSZ)[0]
+                if r.keypoints is not None and len(r.boxes) > 0:
+                    kpts = r.keypoints.xy.cpu().numpy()
+                    # some exports have no per-keypoint confidence; treat (0, 0) as missing
+                    kpt_conf = r.keypoints.conf.cpu().numpy() if r.keypoints.conf is not None else (kpts[..., 0] > 0) * 1.0
+                    state = pose_engine.update(r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(),
+                                               kpts, kpt_conf, now)
+                else:
+                    state = pose_engine.update([], [], [], [], now)
+            else:
+                state = pose_engine.interpolate(now)
+            frame_idx += 1
+            draw_pose(frame, state)
+            with pose_lock:
+                latest_pose = pose_to_json(state)
+            yield frame
+    finally:
+        cap.release()
+
+def producer():
+    """Single background producer: runs pose_frames() and updates latest_frame."""
+    global latest_frame, fps_smoothed, last_frame_time
+    try:
         last_time = 0.0
         last_frame_time = time.time()
-        for r in results:
+        for frame in pose_frames():
             if stop_event.is_set():
                 break
-
-            # get annotated frame from result
-            frame = r.plot()
+            warmup.beat()
 
             # compute instantaneous FPS
             now = time.time()
@@ -68,12 +153,8 @@ def producer():
             fps_smoothed = fps_smoothed * (1.0 - alpha) + inst_fps * alpha if fps_smoothed > 0 else inst_fps
             last_frame_time = now
 
-            # draw FPS on frame (top-left)
-            fps_text = f"FPS: {fps_smoothed:.1f}"
-            # draw semi-transparent rectangle background for readability
-            (tw, th), _ = cv2.getTextSize(fps_text, cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2)
-            cv2.rectangle(frame, (8, 8), (12 + tw, 14 + th), (0, 0, 0), -1)  # black box
-            cv2.putText(frame, fps_text, (10, 12 + th), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2, cv2.LINE_AA)
+            # draw FPS on frame (top-left), cached glyph instead of getTextSize/rectangle/putText
+            frame = annotator.draw(frame, fps=fps_smoothed)
 
             # throttle (keep low to avoid OOM)
             if FPS_LIMIT > 0:
@@ -111,16 +192,30 @@ def mjpeg_generator():
 def index():
     return render_template_string(INDEX_HTML)
 
+@app.route('/pose')
+def pose():
+    """Smoothed keypoints and joint angles of the last displayed frame."""
+    with pose_lock:
+        people = latest_pose
+    return jsonify({"people": people})
+
 @app.route('/video_feed')
 def video_feed():
     return Response(mjpeg_generator(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
-if __name__ == '__main__':
-    prod_thread = threading.Thread(target=producer, daemon=True)
+prod_thread = None
+
+def start_producer():
+    global prod_thread
+    prod_thread = threading.Thread(target=producer, name="producer", daemon=True)
     prod_thread.start()
+
+if __name__ == '__main__':
+    warmup.start([("load model", load_model)], on_ready=start_producer)
     try:
-        app.run(host='0.0.0.0', port=5001, threaded=True)
+        app.run(host='0.0.0.0', port=PORT, threaded=True)
     finally:
         stop_event.set()
-        prod_thread.join(timeout=2.0)
\ No newline at end of file
+        if prod_thread is not None:
+            prod_thread.join(timeout=2.0)
\ No newline at end of file
@@ -3,73 +3,156 @@
 # Description: Web stream using YOLOv11 segmentation model with TensorRT
 # Flask app serving MJPEG stream from camera with YOLOv11 segmentation overlays
 # Uses dockerized environment with TensorRT support
-from ultralytics import YOLO
-from flask import Flask, Response, render_template_string
+from flask import Flask, Response, render_template_string, jsonify, request
 import os
 import cv2
 import time
 import threading
 
+from seg_masks import MaskWriter, encode_masks, masks_from_result, render_masks
+from annotator import Annotator
+from startup import Warmup, add_health_routes
+
 # Change to YOLOv11 segmentation model
 MODEL_PATH = os.environ.get("MODEL_PATH", "/app/yolo11n-seg.engine")
 CAMERA_SOURCE = int(os.environ.get("CAMERA_SOURCE", "0"))
 FPS_LIMIT = float(os.environ.get("FPS_LIMIT", "15.0"))
+# fast = low-res mask composite upsampled once; plot = generic r.plot()
+SEG_RENDER = os.environ.get("SEG_RENDER", "fast")
+MASK_SCALE = float(os.environ.get("MASK_SCALE", "1.0"))  # <1 shrinks masks further before blending
+MASK_ALPHA = float(os.environ.get("MASK_ALPHA", "0.5"))
+MASK_ENCODING = os.environ.get("MASK_ENCODING", "rle")  # rle | polygon | both | none
+MASK_OUTPUT = os.environ.get("MASK_OUTPUT", "")  # e.g. /results/masks.jsonl, empty = do not save
 
 # ...rest of code is identical like object detection web stream
 
 app = Flask(__name__)
 
-# load model once
-model = YOLO(MODEL_PATH)
+# bind the port first, import ultralytics and load the engine in the background (see startup.py)
+warmup = Warmup()
+add_health_routes(app, warmup)
+model = None
+annotator = None
+
+def load_model():
+    """Load the model once (called by the warm-up thread)."""
+    global model, annotator
+    from ultralytics import YOLO
+
+    model = YOLO(MODEL_PATH)
+    annotator = Annotator(model.names)
 
 INDEX_HTML = """
 <!doctype html>
 <title>YOLO Camera Stream</title>
 <h1>YOLO Camera Stream</h1>
-<img src="{{ url_for('video_feed') }}" width="720" />
+<img id="stream" src="{{ url_for('video_feed') }}" width="720" />
+<p><label><input type="checkbox" checked
+   onchange="document.getElementById('stream').src = '{{ url_for('video_feed') }}?masks=' + (this.checked ? 1 : 0)">
+   Show masks</label></p>
+<p id="startup"></p>
+<script>
+  // served before the model is loaded, show progress until /readyz answers 200
+  async function checkReady(){
+    const res = await fetch('/readyz');
+    const st = await res.json();
+    document.getElementById('startup').textContent = res.ok ? '' :
+      (st.state === 'failed' ? `Model failed to load: ${st.error}` : `Loading model... ${st.uptime_s} s`);
+    if (!res.ok && st.state !== 'failed') setTimeout(checkReady, 1000);
+  }
+  checkReady();
+</script>
 <p>Press Ctrl+C in container to stop server.</p>
 """
 
 # Shared state between producer and clients
-latest_frame = None
+# two variants of the same inference result: with mask overlay (True) and boxes only (False)
+latest_frames = {True: None, False: None}
+viewers = {True: 0, False: 0}
 frame_lock = threading.Lock()
 stop_event = threading.Event()
 
+# encoded masks of the last frame (served on /masks)
+latest_masks = {"frame": -1, "masks": []}
+mask_writer = MaskWriter(MASK_OUTPUT) if MASK_OUTPUT else None
+
 def producer():
-    """Run model.predict(stream=True) once and update latest_frame."""
-    global latest_frame
+    """Run model.predict(stream=True) once and update latest_frames."""
+    global latest_masks
     try:
         results = model.predict(source=CAMERA_SOURCE, stream=True, save=False, verbose=False)
         last_time = 0.0
-        for r in results:
+        for frame_idx, r in enumerate(results):
             if stop_event.is_set():
                 break
-            frame = r.plot()
+            warmup.beat()
+            with frame_lock:
+                wanted = [v for v in (True, False) if viewers[v] > 0]
+
+            if SEG_RENDER == 'plot':
+                frames = {v: r.plot(masks=v) for v in wanted}
+                masks = None
+            else:
+                masks = masks_from_result(r, MASK_SCALE)
+                frames = {}
+                if wanted:
+                    boxes = r.boxes
+                    dets = {
+                        "xyxy": boxes.xyxy.cpu().numpy(),
+                        "conf": boxes.conf.cpu().numpy(),
+                        "cls": boxes.cls.cpu().numpy().astype(int),
+                    }
+                    for v in wanted:
+                        frame = r.orig_img.copy()
+                        if v:
+                            render_masks(frame, masks, dets["cls"], MASK_ALPHA)
+                        frames[v] = annotator.draw(frame, dets)
+
+            if MASK_ENCODING != 'none' and r.boxes is not None:
+                if masks is None:
+                    masks = masks_from_result(r, MASK_SCALE)
+                record = {
+                    "frame": frame_idx,
+                    "time": time.time(),
+                    "frame_size": list(r.orig_img.shape[:2]),
+                    "masks": encode_masks(masks, r.orig_img.shape, r.boxes.cls.cpu().numpy(),
+                                          r.boxes.conf.cpu().numpy(), r.names, MASK_ENCODING),
+                }
+                latest_masks = record
+                if mask_writer is not None:
+                    mask_writer.write(record)
+
             # throttle producer if needed
             if FPS_LIMIT > 0:
                 wait = max(0.0, (1.0 / FPS_LIMIT) - (time.time() - last_time))
                 if wait > 0:
                     time.sleep(wait)
                 last_time = time.time()
-            ret, buf = cv2.imencode('.jpg', frame)
-            if not ret:
-                continue
+            # only encode the variants somebody is watching
+            encoded = {}
+            for v, frame in frames.items():
+                ret, buf = cv2.imencode('.jpg', frame)
+                if ret:
+                    encoded[v] = buf.tobytes()
             with frame_lock:
-                latest_frame = buf.tobytes()
+                latest_frames.update(encoded)
     except Exception as e:
         # optional: log exception to stdout; keep producer alive no-op if needed
         print("Producer error:", e)
     finally:
         stop_event.set()
+        if mask_writer is not None:
+            mask_writer.close()
 
-def mjpeg_generator():
-    """Yield the latest_frame repeatedly for a connected client."""
-    global latest_frame
+def mjpeg_generator(show_masks=True):
+    """Yield the latest frame of the requested variant repeatedly for a connected client."""
     boundary = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+    with frame_lock:
+        viewers[show_masks] += 1
     try:
         while not stop_event.is_set():
             with frame_lock:
-                frame = latest_frame
+                frame = latest_frames[show_masks]
             if frame is None:
                 # no frame yet
                 time.sleep(0.05)
@@ -80,6 +163,9 @@ def mjpeg_generator():
     except GeneratorExit:
         # client disconnected; just return and keep producer running
         return
+    finally:
+        with frame_lock:
+            viewers[show_masks] -= 1
 
 @app.route('/')
 def index():
@@ -87,16 +173,30 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(mjpeg_generator(),
+    # ?masks=0 gives the same stream without the mask overlay (no extra inference)
+    show_masks = request.args.get('masks', '1') != '0'
+    return Response(mjpeg_generator(show_masks),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
-if __name__ == '__main__':
+@app.route('/masks')
+def get_masks():
+    """Encoded masks of the latest frame (RLE counts are column-major at mask resolution)."""
+    return jsonify(latest_masks)
+
+prod_thread = None
+
+def start_producer():
     # start background producer thread
+    global prod_thread
     prod_thread = threading.Thread(target=producer, daemon=True)
     prod_thread.start()
+
+if __name__ == '__main__':
+    warmup.start([("load model", load_model)], on_ready=start_producer)
     try:
         app.run(host='0.0.0.0', port=5001, threaded=True)
     finally:
         # on shutdown signal, request producer stop and wait
         stop_event.set()
-        prod_thread.join(timeout=2.0)
\ No newline at end of file
+        if prod_thread is not None:
+            prod_thread.join(timeout=2.0)
\ No newline at end of file
@@ -1,24 +1,56 @@
-from ultralytics import YOLO
-from flask import Flask, Response, render_template_string
+from flask import Flask, Response, render_template_string, jsonify, request
 import os
 import cv2
 import time
 import threading
 
+from detection_filter import FilterStore
+from startup import Warmup, add_health_routes, requires_ready
+
 MODEL_PATH = os.environ.get("MODEL_PATH", "/app/yolov8n.engine")
 CAMERA_SOURCE = int(os.environ.get("CAMERA_SOURCE", "0"))
 FPS_LIMIT = float(os.environ.get("FPS_LIMIT", "30.0"))  # optional throttle
+# detection filter (see detection_filter.py), adjustable with POST /filter
+FILTER_CLASSES = os.environ.get("FILTER_CLASSES", "")  # e.g. "cup,person", "" = all classes
+FILTER_CONF = float(os.environ.get("FILTER_CONF", "0.6"))
+FILTER_MAX_DET = int(os.environ.get("FILTER_MAX_DET", "300"))
+FILTER_CONFIG = os.environ.get("FILTER_CONFIG", "/app/filter_config.json")
 
 app = Flask(__name__)
 
-# load model once
-model = YOLO(MODEL_PATH)
+# bind the port first, import ultralytics and load the engine in the background (see startup.py)
+warmup = Warmup()
+add_health_routes(app, warmup)
+model = None
+filter_store = None
+
+def load_model():
+    """Load the model once and the filter that needs its class names (called by the warm-up thread)."""
+    global model, filter_store
+    from ultralytics import YOLO
+
+    model = YOLO(MODEL_PATH)
+    filter_store = FilterStore(model.names, FILTER_CONFIG, default={
+        "classes": [c.strip() for c in FILTER_CLASSES.split(",") if c.strip()] or None,
+        "conf": FILTER_CONF, "max_det": FILTER_MAX_DET})
 
 INDEX_HTML = """
 <!doctype html>
 <title>YOLO Camera Stream</title>
 <h1>YOLO Camera Stream</h1>
 <img src="{{ url_for('video_feed') }}" width="1024" />
+<p id="startup"></p>
+<script>
+  // served before the model is loaded, show progress until /readyz answers 200
+  async function checkReady(){
+    const res = await fetch('/readyz');
+    const st = await res.json();
+    document.getElementById('startup').textContent = res.ok ? '' :
+      (st.state === 'failed' ? `Model failed to load: ${st.error}` : `Loading model... ${st.uptime_s} s`);
+    if (!res.ok && st.state !== 'failed') setTimeout(checkReady, 1000);
+  }
+  checkReady();
+</script>
 <p>Press Ctrl+C in container to stop server.</p>
 """
 
@@ -36,46 +68,56 @@ def producer():
     """Single background producer: runs model.predict(stream=True) and updates latest_frame."""
     global latest_frame, fps_smoothed, last_frame_time
     try:
-        # ask model to run inference at a larger input size
+        # ask model to run inference at a larger input size; classes / conf / max_det are
+        # applied inside the predictor's NMS
+        spec = filter_store.get()
         results = model.predict(
             source=CAMERA_SOURCE,
             stream=True,
             save=False,
             verbose=False,
             imgsz=1920,
-            conf=0.55  # only keep detections with confidence > 60%
+            **spec.predict_kwargs()
         )
+        version = filter_store.version
         last_time = 0.0
         last_frame_time = time.time()
         for r in results:
             if stop_event.is_set():
                 break
+            warmup.beat()
 
-            # get annotated frame from result
-            frame = r.plot()
+            spec = filter_store.get()
+            if filter_store.version != version and model.predictor is not None:
+                # the streaming predictor reads its args on every frame
+                for key, value in spec.predict_kwargs().items():
+                    setattr(model.predictor.args, key, value)
+                version = filter_store.version
 
-            # extract and print detections with confidence > 0.6
+            # per-class thresholds as one mask, before anything is plotted
+            detections = []
             if r.boxes is not None and len(r.boxes) > 0:
-                detections = []
-                for box in r.boxes:
-                    conf = float(box.conf[0])  # confidence score
-                    cls_id = int(box.cls[0])    # class id
-                    cls_name = r.names[cls_id]  # class name
-                    
-                    # filter by confidence threshold
-                    if conf > 0.6:
-                        detections.append({
-                            'class': cls_name,
-                            'confidence': conf,
-                            'box': box.xyxy[0].tolist()  # [x1, y1, x2, y2]
-                        })
-                
+                conf = r.boxes.conf.cpu().numpy()
+                cls = r.boxes.cls.cpu().numpy()
+                keep = spec.keep(conf, cls)
+                if len(keep) < len(conf):
+                    r = r[keep]
+                xyxy = r.boxes.xyxy.cpu().numpy()
+                detections = [{'class': r.names[int(cls[i])], 'confidence': float(conf[i]), 'box': xyxy[j].tolist()}
+                              for j, i in enumerate(keep)]
+
                 # print detections to console
                 if detections:
                     print(f"\n--- Frame Detection ---")
                     for det in detections:
                         print(f"  Class: {det['class']:<15} | Confidence: {det['confidence']:.2%}")
-                    print(f"Total detections (conf > 60%): {len(detections)}")
+                    print(f"Total detections: {len(detections)}")
+
+            # get annotated frame from result
+            t_plot = time.perf_counter()
+            frame = r.plot()
+            filter_store.record(postprocess=r.speed.get('postprocess', 0.0),
+                                plot=(time.perf_counter() - t_plot) * 1000.0, detections=len(detections))
 
             # compute instantaneous FPS
             now = time.time()
@@ -140,18 +182,42 @@ def mjpeg_generator():
 def index():
     return render_template_string(INDEX_HTML)
 
+@app.route('/filter', methods=['GET'])
+@requires_ready(warmup)
+def get_filter():
+    """Current filter spec and mean postprocess / plot ms per frame since it was set."""
+    return jsonify({"filter": filter_store.get().to_dict(), "timing_ms": filter_store.timing()})
+
+@app.route('/filter', methods=['POST'])
+@requires_ready(warmup)
+def set_filter():
+    try:
+        spec = filter_store.set(request.json or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except OSError as e:
+        return jsonify({"error": f"filter not applied, cannot save {filter_store.path}: {e}"}), 500
+    return jsonify({"filter": spec.to_dict()})
+
 @app.route('/video_feed')
 def video_feed():
     return Response(mjpeg_generator(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
-if __name__ == '__main__':
+prod_thread = None
+
+def start_producer():
     # start background producer thread
+    global prod_thread
     prod_thread = threading.Thread(target=producer, daemon=True)
     prod_thread.start()
+
+if __name__ == '__main__':
+    warmup.start([("load model", load_model)], on_ready=start_producer)
     try:
         app.run(host='0.0.0.0', port=5001, threaded=True)
     finally:
         # on shutdown signal, request producer stop and wait
         stop_event.set()
-        prod_thread.join(timeout=2.0)
\ No newline at end of file
+        if prod_thread is not None:
+            prod_thread.join(timeout=2.0)
\ No newline at end of file
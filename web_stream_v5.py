@@ -3,28 +3,343 @@
 # Program allow recognize object using yolo pretrained model and stream video with detections over web server
 # It save detected cups as images
 
-from ultralytics import YOLO
-from flask import Flask, Response, render_template_string
+from flask import Flask, Response, render_template_string, jsonify, request
+import concurrent.futures
 import os
 import cv2
 import time
 import threading
 
+from admission import MemoryBudget, ViewerHub
+from annotator import Annotator
+from batcher import MicroBatcher, Overloaded, decode_upload
+from detection_feed import DetectionFeed
+from detection_filter import FilterStore
+from device_pipeline import export_max_batch
+from frame_source import open_source
+from live_stream import LiveStream, codec_string
+from startup import Warmup, add_health_routes, requires_ready
+from event_recorder import EventRecorder
+from frame_trace import Tracer
+from sampling_profiler import add_profile_routes
+from tiling import RoiStore, empty_detections, make_tiles, rois_to_pixels, predict_regions
+from tracker import Tracker
+
 MODEL_PATH = os.environ.get("MODEL_PATH", "/app/yolov8n.engine")
 CAMERA_SOURCE = int(os.environ.get("CAMERA_SOURCE", "0"))
 FPS_LIMIT = float(os.environ.get("FPS_LIMIT", "30.0"))  # optional throttle
+PORT = int(os.environ.get("PORT", "5001"))
+# model input size of INFERENCE_MODE=full (the whole frame is upscaled to it)
+IMGSZ = int(os.environ.get("IMGSZ", "1920"))
+# camera pixel format (MJPG | YUYV), "" = let ultralytics open the camera with driver defaults
+CAPTURE_FORMAT = os.environ.get("CAPTURE_FORMAT", "")
+# capture size, 0 = driver default (set CAPTURE_FORMAT=MJPG with 1920x1080, YUYV 1080p is ~5 FPS over USB)
+CAPTURE_WIDTH = int(os.environ.get("CAPTURE_WIDTH", "0"))
+CAPTURE_HEIGHT = int(os.environ.get("CAPTURE_HEIGHT", "0"))
+# decode MJPEG at 1/N size in libjpeg (1, 2, 4, 8), YUYV supports 1 or 2
+CAPTURE_DECODE_SCALE = int(os.environ.get("CAPTURE_DECODE_SCALE", "1"))
+# frame_source spec instead of CAMERA_SOURCE: synthetic, replay:/app/clip.mp4, gst:<pipeline>, csi://0
+FRAME_SOURCE = os.environ.get("FRAME_SOURCE", "")
+# detection filter applied inside predict (classes, lowest threshold, max_det) and as one vectorized
+# mask (per-class thresholds); changed at runtime with POST /filter, persisted in FILTER_CONFIG
+FILTER_CLASSES = os.environ.get("FILTER_CLASSES", "")  # e.g. "cup,person", "" = all classes
+FILTER_CONF = float(os.environ.get("FILTER_CONF", "0.6"))
+FILTER_MAX_DET = int(os.environ.get("FILTER_MAX_DET", "300"))
+FILTER_CONFIG = os.environ.get("FILTER_CONFIG", "/app/filter_config.json")
+# full  = whole frame upscaled to IMGSZ (1920, original behaviour)
+# roi   = only the regions configured in the web UI, at TILE_SIZE
+# tiles = overlapping TILE_SIZE tiles over the whole frame, merged with NMS
+INFERENCE_MODE = os.environ.get("INFERENCE_MODE", "full")
+TILE_SIZE = int(os.environ.get("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.environ.get("TILE_OVERLAP", "0.2"))
+ROI_CONFIG = os.environ.get("ROI_CONFIG", "/app/roi_config.json")
+# run the detector every N frames, the tracker propagates boxes in between
+DETECT_EVERY = int(os.environ.get("DETECT_EVERY", "1"))
+TRACK_IOU = float(os.environ.get("TRACK_IOU", "0.3"))
+TRACK_MAX_AGE = int(os.environ.get("TRACK_MAX_AGE", "30"))
+# annotate and stream at this width (e.g. 1024 to match the page), 0 = camera resolution
+STREAM_WIDTH = int(os.environ.get("STREAM_WIDTH", "0"))
+# record PRE seconds before and POST seconds after each new cup track into EVENT_DIR
+EVENT_RECORDING = os.environ.get("EVENT_RECORDING", "0") == "1"
+EVENT_DIR = os.environ.get("EVENT_DIR", "/results/events")
+EVENT_PRE = float(os.environ.get("EVENT_PRE", "5.0"))
+EVENT_POST = float(os.environ.get("EVENT_POST", "5.0"))
+EVENT_MAX_MB = float(os.environ.get("EVENT_MAX_MB", "2048"))
+# POST /predict: concurrent requests are gathered into batches of up to PREDICT_MAX_BATCH,
+# waiting at most PREDICT_MAX_WAIT_MS for the batch to fill. A TensorRT engine caps it at its export
+# batch: 1 for the default static engine, batching needs `yolo export ... batch=8 dynamic=True`
+PREDICT_MAX_BATCH = int(os.environ.get("PREDICT_MAX_BATCH", "8"))
+PREDICT_MAX_WAIT_MS = float(os.environ.get("PREDICT_MAX_WAIT_MS", "10"))
+PREDICT_QUEUE = int(os.environ.get("PREDICT_QUEUE", "256"))
+PREDICT_IMGSZ = int(os.environ.get("PREDICT_IMGSZ", "640"))
+PREDICT_CONF = float(os.environ.get("PREDICT_CONF", "0.25"))
+# admission control: /video_feed answers 503 beyond MAX_VIEWERS; above SHED_VIEWERS new viewers
+# start at half frame rate. Slow viewers drop to lower fps / half resolution, never the detector.
+MAX_VIEWERS = int(os.environ.get("MAX_VIEWERS", "8"))
+SHED_VIEWERS = int(os.environ.get("SHED_VIEWERS", "4"))
+VIEWER_SNDBUF_KB = int(os.environ.get("VIEWER_SNDBUF_KB", "256"))
+# one budget for the viewer frame cache, queued /predict images and the event pre-buffer, 0 = unlimited
+MEMORY_BUDGET_MB = float(os.environ.get("MEMORY_BUDGET_MB", "512"))
+# server = boxes drawn into the JPEGs, client = plain video and the page draws boxes from /events
+OVERLAY = os.environ.get("OVERLAY", "server")
+# JPEG quality of the stream, default 95 (OpenCV) with server overlay and 70 with client overlay
+STREAM_QUALITY = int(os.environ.get("STREAM_QUALITY", "70" if OVERLAY == "client" else "95"))
+MAX_EVENT_CLIENTS = int(os.environ.get("MAX_EVENT_CLIENTS", "32"))
+# longest wait of a /snapshot.jpg?after=<seq> long-poll before it answers 304
+SNAPSHOT_MAX_WAIT = float(os.environ.get("SNAPSHOT_MAX_WAIT", "30"))
+# H.264 / fragmented MP4 stream on /live.mp4 (page: /live), encoded by ffmpeg only while watched
+LIVE_STREAM = os.environ.get("LIVE_STREAM", "0") == "1"
+LIVE_FPS = float(os.environ.get("LIVE_FPS", str(FPS_LIMIT if FPS_LIMIT > 0 else 15.0)))
+LIVE_WIDTH = int(os.environ.get("LIVE_WIDTH", "1280"))
+LIVE_BITRATE = os.environ.get("LIVE_BITRATE", "1M")
+LIVE_ENCODER = os.environ.get("LIVE_ENCODER", "auto")  # auto | h264_nvmpi | h264_v4l2m2m | h264_nvenc | libx264
+LIVE_FFMPEG = os.environ.get("LIVE_FFMPEG", "ffmpeg")
+MAX_LIVE_CLIENTS = int(os.environ.get("MAX_LIVE_CLIENTS", "8"))
+# per-frame latency tracing capture -> socket write: histograms on /trace, optional X-Frame-Trace
+# multipart headers, every TRACE_SAMPLE-th frame into a Chrome trace (/trace/chrome.json, TRACE_FILE)
+FRAME_TRACE = os.environ.get("FRAME_TRACE", "1") == "1"
+TRACE_HEADERS = os.environ.get("TRACE_HEADERS", "0") == "1"
+TRACE_SAMPLE = int(os.environ.get("TRACE_SAMPLE", "0"))
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+# GET /debug/profile samples all threads on demand (admin only: exists only when PROFILE_TOKEN is set)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
 
 app = Flask(__name__)
 
-# load model once
-model = YOLO(MODEL_PATH)
+# the port is bound right away; ultralytics import and engine load run in the warm-up thread
+# (/healthz = liveness, /readyz = readiness, model routes answer 503 until ready)
+warmup = Warmup()
+add_health_routes(app, warmup)
+add_profile_routes(app, PROFILE_TOKEN)
+
+memory_budget = MemoryBudget(MEMORY_BUDGET_MB * 1024 * 1024)
+tracer = Tracer(enabled=FRAME_TRACE, headers=TRACE_HEADERS, sample_every=TRACE_SAMPLE, path=TRACE_FILE)
+viewers = ViewerHub(max_viewers=MAX_VIEWERS, shed_viewers=SHED_VIEWERS,
+                    send_buffer=VIEWER_SNDBUF_KB * 1024, budget=memory_budget, tracer=tracer)
+
+# model and everything that needs its class names, set by the warm-up steps below
+model = None
+filter_store = None   # classes / thresholds / max detections, editable through /filter
+annotator = None      # draws boxes, labels, FPS and the detection list in one pass (replaces r.plot() + putText)
+detection_feed = None  # per-frame detection records for /events subscribers
+YOLO = None
+
+def import_ultralytics():
+    global YOLO
+    from ultralytics import YOLO
+
+def load_model():
+    """Load the model once and build the objects that depend on its class names."""
+    global model, filter_store, annotator, detection_feed
+    model = YOLO(MODEL_PATH)
+    filter_store = FilterStore(model.names, FILTER_CONFIG, default={
+        "classes": [c.strip() for c in FILTER_CLASSES.split(",") if c.strip()] or None,
+        "conf": FILTER_CONF, "max_det": FILTER_MAX_DET})
+    annotator = Annotator(model.names)
+    detection_feed = DetectionFeed(model.names, max_subscribers=MAX_EVENT_CLIENTS)
+
+def warm_predictor():
+    """First inference (TensorRT context, CUDA kernels) before the camera opens."""
+    import numpy as np
+    frame = np.zeros((CAPTURE_HEIGHT or 1080, CAPTURE_WIDTH or 1920, 3), dtype=np.uint8)
+    model.predict(frame, save=False, verbose=False,
+                  imgsz=IMGSZ if INFERENCE_MODE == 'full' else TILE_SIZE)
+
+# per-camera regions of interest, editable from the index page
+roi_store = RoiStore(ROI_CONFIG)
+
+# persistent IDs across frames (producer thread only)
+tracker = Tracker(iou_thres=TRACK_IOU, max_age=TRACK_MAX_AGE)
+
+live = None
+if LIVE_STREAM:
+    live = LiveStream(fps=LIVE_FPS, width=LIVE_WIDTH, bitrate=LIVE_BITRATE, encoder=LIVE_ENCODER,
+                      ffmpeg=LIVE_FFMPEG, max_clients=MAX_LIVE_CLIENTS)
+
+# ring buffer of the streamed JPEGs, flushed to disk only around events
+event_recorder = None
+if EVENT_RECORDING:
+    event_recorder = EventRecorder(EVENT_DIR, pre_seconds=EVENT_PRE, post_seconds=EVENT_POST,
+                                   fps=FPS_LIMIT if FPS_LIMIT > 0 else 15.0,
+                                   max_bytes=EVENT_MAX_MB * 1024 * 1024, budget=memory_budget)
+
+# second model instance for /predict, owned by the batcher thread: an Ultralytics predictor
+# must not be shared between threads and the camera loop keeps using `model`
+predict_model = None
+
+def predict_batch(images):
+    """Run one micro-batch of uploaded images, detections per image."""
+    global predict_model
+    if predict_model is None:
+        predict_model = YOLO(MODEL_PATH)
+    results = predict_model.predict(images, imgsz=PREDICT_IMGSZ, conf=PREDICT_CONF, verbose=False)
+    out = []
+    for r in results:
+        arrays = boxes_to_arrays(r.boxes)
+        out.append([{'class': predict_model.names[int(k)], 'confidence': round(float(c), 4),
+                     'box': [round(float(v), 1) for v in b]}
+                    for b, c, k in zip(arrays['xyxy'], arrays['conf'], arrays['cls'])])
+    return out
+
+engine_batch = export_max_batch(MODEL_PATH)
+if engine_batch is not None and PREDICT_MAX_BATCH > engine_batch:
+    print(f"/predict batches capped at {engine_batch} for {MODEL_PATH}: "
+          + ("engine export batch" if engine_batch > 1 else "static TensorRT engine, re-export with batch=N dynamic=True"))
+batcher = MicroBatcher(predict_batch, max_batch=min(PREDICT_MAX_BATCH, engine_batch or PREDICT_MAX_BATCH),
+                       max_wait_ms=PREDICT_MAX_WAIT_MS, max_queue=PREDICT_QUEUE, budget=memory_budget)
 
 INDEX_HTML = """
 <!doctype html>
 <title>YOLO Camera Stream</title>
 <h1>YOLO Camera Stream</h1>
-<img src="{{ url_for('video_feed') }}" width="1024" />
+<div style="position:relative; display:inline-block">
+  <img id="stream" src="{{ url_for('video_feed') }}" width="1024" />
+  <canvas id="det" style="position:absolute; left:0; top:0; pointer-events:none"></canvas>
+  <canvas id="roi" style="position:absolute; left:0; top:0; cursor:crosshair"></canvas>
+</div>
+<p id="startup"></p>
+<p>Inference mode: <b>{{ mode }}</b>. Drag on the image to add a region of interest (used when INFERENCE_MODE=roi).
+<button onclick="saveRois()">Save ROIs</button>
+<button onclick="clearRois()">Clear</button>
+<span id="roi_status"></span></p>
+{% if live %}<p><a href="{{ url_for('live_page') }}">H.264 live stream</a> (less bandwidth than this MJPEG view)</p>{% endif %}
 <p>Press Ctrl+C in container to stop server.</p>
+<script>
+  const img = document.getElementById('stream');
+  const canvas = document.getElementById('roi');
+  const ctx = canvas.getContext('2d');
+  let rois = [];
+  let start = null;
+
+  function draw(tmp){
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.strokeStyle = '#ff8000';
+    ctx.lineWidth = 2;
+    for (const r of (tmp ? rois.concat([tmp]) : rois)){
+      ctx.strokeRect(r[0] * canvas.width, r[1] * canvas.height,
+                     (r[2] - r[0]) * canvas.width, (r[3] - r[1]) * canvas.height);
+    }
+  }
+  function resize(){
+    // MJPEG images do not fire load reliably, so keep the overlay in sync by polling
+    if (canvas.width !== img.clientWidth || canvas.height !== img.clientHeight){
+      canvas.width = img.clientWidth;
+      canvas.height = img.clientHeight;
+      draw();
+    }
+  }
+  function pos(e){
+    const b = canvas.getBoundingClientRect();
+    return [Math.min(Math.max((e.clientX - b.left) / b.width, 0), 1),
+            Math.min(Math.max((e.clientY - b.top) / b.height, 0), 1)];
+  }
+  canvas.onmousedown = e => { start = pos(e); };
+  canvas.onmousemove = e => { if (start){ const p = pos(e); draw([start[0], start[1], p[0], p[1]]); } };
+  canvas.onmouseup = e => {
+    if (!start) return;
+    const p = pos(e);
+    rois.push([Math.min(start[0], p[0]), Math.min(start[1], p[1]), Math.max(start[0], p[0]), Math.max(start[1], p[1])]);
+    start = null;
+    draw();
+  };
+  async function loadRois(){
+    const res = await fetch('/rois');
+    rois = (await res.json()).rois;
+    draw();
+  }
+  async function saveRois(){
+    const res = await fetch('/rois', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({rois})});
+    document.getElementById('roi_status').textContent = res.ok ? 'saved' : 'error';
+  }
+  function clearRois(){ rois = []; draw(); }
+
+  setInterval(resize, 500);
+  loadRois();
+
+  // the page is served before the model is loaded, show progress until /readyz answers 200
+  async function checkReady(){
+    const res = await fetch('/readyz');
+    const st = await res.json();
+    document.getElementById('startup').textContent = res.ok ? '' :
+      (st.state === 'failed' ? `Model failed to load: ${st.error}` : `Loading model... ${st.uptime_s} s`);
+    if (!res.ok && st.state !== 'failed') setTimeout(checkReady, 1000);
+  }
+  checkReady();
+
+  // OVERLAY=client: boxes come from /events (same ?classes=&conf= filters as the page URL)
+  if ('{{ overlay }}' === 'client'){
+    const det = document.getElementById('det');
+    const dctx = det.getContext('2d');
+    let names = [];
+    const events = new EventSource('/events' + location.search);
+    events.addEventListener('names', e => { names = JSON.parse(e.data); });
+    events.onmessage = e => {
+      const rec = JSON.parse(e.data);
+      det.width = img.clientWidth;
+      det.height = img.clientHeight;
+      const sx = det.width / rec.w, sy = det.height / rec.h;
+      dctx.lineWidth = 2;
+      dctx.font = '14px sans-serif';
+      for (const [k, conf, x1, y1, x2, y2, id] of rec.d){
+        dctx.strokeStyle = dctx.fillStyle = `hsl(${(k * 47) % 360}, 90%, 50%)`;
+        dctx.strokeRect(x1 * sx, y1 * sy, (x2 - x1) * sx, (y2 - y1) * sy);
+        const label = `${id >= 0 ? '#' + id + ' ' : ''}${names[k] || k} ${(conf * 100).toFixed(0)}%`;
+        dctx.fillRect(x1 * sx, y1 * sy - 18, dctx.measureText(label).width + 6, 18);
+        dctx.fillStyle = '#fff';
+        dctx.fillText(label, x1 * sx + 3, y1 * sy - 4);
+      }
+    };
+  }
+</script>
+"""
+
+LIVE_HTML = """
+<!doctype html>
+<title>YOLO Camera Stream (H.264)</title>
+<h1>YOLO Camera Stream (H.264)</h1>
+<video id="video" autoplay muted playsinline width="1024"></video>
+<p id="info"></p>
+<script>
+  const video = document.getElementById('video');
+  const info = document.getElementById('info');
+
+  async function start(){
+    const res = await fetch('{{ url_for('live_mp4') }}');
+    if (!res.ok){ info.textContent = (await res.json()).error; return; }
+    const type = `video/mp4; codecs="${res.headers.get('X-Codec')}"`;
+    if (!window.MediaSource || !MediaSource.isTypeSupported(type)){
+      video.src = '{{ url_for('live_mp4') }}';  // progressive playback, higher latency
+      return;
+    }
+    const ms = new MediaSource();
+    video.src = URL.createObjectURL(ms);
+    await new Promise(r => ms.addEventListener('sourceopen', r, {once: true}));
+    const sb = ms.addSourceBuffer(type);
+    const pending = [];
+    sb.addEventListener('updateend', () => {
+      if (pending.length) sb.appendBuffer(pending.shift());
+      else if (video.buffered.length && video.currentTime - video.buffered.start(0) > 30)
+        sb.remove(video.buffered.start(0), video.currentTime - 10);
+    });
+    const reader = res.body.getReader();
+    while (true){
+      const {value, done} = await reader.read();
+      if (done) break;
+      if (sb.updating || pending.length) pending.push(value); else sb.appendBuffer(value);
+    }
+  }
+  setInterval(async () => {
+    // stay at the live edge
+    if (video.buffered.length){
+      const end = video.buffered.end(video.buffered.length - 1);
+      if (end - video.currentTime > 0.5) video.currentTime = end - 0.05;
+    }
+    const st = await (await fetch('{{ url_for('live_stats') }}')).json();
+    info.textContent = `${st.encoder} ${st.size ? st.size.join('x') : ''}: ${st.kbit_s} kbit/s ` +
+      `(MJPEG ~${st.mjpeg_kbit_s} kbit/s), frame to fragment ${st.latency_ms_p50} ms p50 / ${st.latency_ms_p95} ms p95`;
+  }, 1000);
+  start();
+</script>
 """
 
 # Shared state between producer and clients
@@ -37,52 +352,117 @@ stop_event = threading.Event()
 fps_smoothed = 0.0
 last_frame_time = None
 
-def producer():
-    """Single background producer: runs model.predict(stream=True) and updates latest_frame."""
-    global latest_frame, fps_smoothed, last_frame_time
-    try:
+def boxes_to_arrays(boxes):
+    """Convert an ultralytics Boxes object into plain xyxy/conf/cls NumPy arrays."""
+    if boxes is None or len(boxes) == 0:
+        return empty_detections()
+    return {
+        "xyxy": boxes.xyxy.cpu().numpy(),
+        "conf": boxes.conf.cpu().numpy(),
+        "cls": boxes.cls.cpu().numpy().astype(int),
+    }
+
+def detect(frame, regions):
+    """Run one detection pass on a frame read by inference_stream()."""
+    spec = filter_store.get()
+    if INFERENCE_MODE == 'full':
+        r = model.predict(frame, save=False, verbose=False, imgsz=IMGSZ, **spec.predict_kwargs())[0]
+        filter_store.record(postprocess=r.speed.get('postprocess', 0.0))
+        return spec.apply(boxes_to_arrays(r.boxes))
+    return spec.apply(predict_regions(model, frame, regions, imgsz=TILE_SIZE, conf=spec.min_conf(),
+                                      classes=spec.classes))
+
+def inference_stream():
+    """Yield (frame, tracks, regions, stamps) for the configured INFERENCE_MODE.
+
+    tracks holds xyxy/conf/cls/id arrays; the detector only runs every DETECT_EVERY frames
+    and the tracker propagates the boxes on the frames in between. stamps are the
+    time.monotonic() capture / infer_start / infer_end times for frame_trace.
+    """
+    if INFERENCE_MODE == 'full' and DETECT_EVERY <= 1 and not CAPTURE_FORMAT and not FRAME_SOURCE:
         # ask model to run inference at a larger input size
+        spec = filter_store.get()
         results = model.predict(
             source=CAMERA_SOURCE,
             stream=True,
             save=False,
             verbose=False,
-            imgsz=1920,
-            conf=0.55  # only keep detections with confidence > 60%
+            imgsz=IMGSZ,
+            **spec.predict_kwargs()
         )
+        version = filter_store.version
+        for r in results:
+            spec = filter_store.get()
+            if filter_store.version != version and model.predictor is not None:
+                # the streaming predictor reads its args on every frame
+                for key, value in spec.predict_kwargs().items():
+                    setattr(model.predictor.args, key, value)
+                version = filter_store.version
+            filter_store.record(postprocess=r.speed.get('postprocess', 0.0))
+            tracks = tracker.update(**spec.apply(boxes_to_arrays(r.boxes)))
+            # the camera is read inside ultralytics: inference start is back-computed from r.speed
+            t_end = time.monotonic()
+            t_start = t_end - sum(v or 0.0 for v in r.speed.values()) / 1000.0
+            yield r.orig_img, tracks, [], {"infer_start": t_start, "infer_end": t_end}
+        return
+
+    # read frames ourselves so the model can skip frames or run on crops at native TILE_SIZE
+    cap = open_source(FRAME_SOURCE or CAMERA_SOURCE, CAPTURE_WIDTH, CAPTURE_HEIGHT, pixel_format=CAPTURE_FORMAT,
+                      decode_scale=CAPTURE_DECODE_SCALE)
+    frame_idx = 0
+    try:
+        while not stop_event.is_set():
+            ret, frame, t_capture = cap.read()
+            if not ret:
+                break
+            t_start = time.monotonic()
+            h, w = frame.shape[:2]
+            if INFERENCE_MODE == 'tiles':
+                regions = make_tiles(w, h, TILE_SIZE, TILE_OVERLAP)
+            elif INFERENCE_MODE == 'roi':
+                # no ROI configured yet -> whole frame at native size
+                regions = rois_to_pixels(roi_store.get(CAMERA_SOURCE), w, h) or [(0, 0, w, h)]
+            else:
+                regions = []
+            if frame_idx % max(1, DETECT_EVERY) == 0:
+                tracks = tracker.update(**detect(frame, regions))
+            else:
+                tracks = tracker.predict()
+            frame_idx += 1
+            yield frame, tracks, regions, {"capture": t_capture, "infer_start": t_start,
+                                           "infer_end": time.monotonic()}
+    finally:
+        cap.release()
+
+def producer():
+    """Single background producer: runs inference_stream() and updates latest_frame."""
+    global latest_frame, fps_smoothed, last_frame_time
+    try:
         last_time = 0.0
         last_frame_time = time.time()
-        for r in results:
+        frame_seq = 0
+        for frame, dets, regions, stamps in inference_stream():
             if stop_event.is_set():
                 break
+            frame_seq += 1
+            warmup.beat()
+            trace = tracer.begin(frame_seq, **stamps)
+            detection_feed.publish(frame_seq, frame.shape[1], frame.shape[0], dets)
+
+            # dets already passed the filter spec (in predict and filter_store.get().apply)
+            detections = [{
+                'class': model.names[int(cls_id)],
+                'confidence': float(conf),
+                'box': xyxy.tolist(),  # [x1, y1, x2, y2]
+                'track_id': int(track_id)
+            } for xyxy, conf, cls_id, track_id in zip(dets['xyxy'], dets['conf'], dets['cls'], dets['id'])]
 
-            # get annotated frame from result
-            frame = r.plot()
-
-            detections = []
-
-            # extract and print detections with confidence > 0.6
-            if r.boxes is not None and len(r.boxes) > 0:
-               
-                for box in r.boxes:
-                    conf = float(box.conf[0])  # confidence score
-                    cls_id = int(box.cls[0])    # class id
-                    cls_name = r.names[cls_id]  # class name
-                    
-                    # filter by confidence threshold
-                    if conf > 0.6:
-                        detections.append({
-                            'class': cls_name,
-                            'confidence': conf,
-                            'box': box.xyxy[0].tolist()  # [x1, y1, x2, y2]
-                        })
-                
-                # print detections to console
-                if detections:
-                    print(f"\n--- Frame Detection ---")
-                    for det in detections:
-                        print(f"  Class: {det['class']:<15} | Confidence: {det['confidence']:.2%}")
-                    print(f"Total detections (conf > 60%): {len(detections)}")
+            # print detections to console
+            if detections:
+                print(f"\n--- Frame Detection ---")
+                for det in detections:
+                    print(f"  Class: {det['class']:<15} | Confidence: {det['confidence']:.2%}")
+                print(f"Total detections: {len(detections)}")
 
             # compute instantaneous FPS
             now = time.time()
@@ -93,24 +473,31 @@ def producer():
             fps_smoothed = fps_smoothed * (1.0 - alpha) + inst_fps * alpha if fps_smoothed > 0 else inst_fps
             last_frame_time = now
 
-            # draw FPS on frame (top-left)
-            fps_text = f"FPS: {fps_smoothed:.1f}"
-            # draw semi-transparent rectangle background for readability
-            (tw, th), _ = cv2.getTextSize(fps_text, cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2)
-            cv2.rectangle(frame, (8, 8), (12 + tw, 14 + th), (0, 0, 0), -1)  # black box
-            cv2.putText(frame, fps_text, (10, 12 + th), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2, cv2.LINE_AA)
+            # boxes, labels, FPS (top-left) and detection list in one pass
+            lines = [f"{det['class']}: {det['confidence']:.1%}" for det in detections]
+            raw = frame
+            t_draw = time.perf_counter()
+            if OVERLAY == 'client':
+                # the browser draws the boxes, only scale to the stream width
+                frame = annotator.draw(frame, None, out_width=STREAM_WIDTH)
+            else:
+                frame = annotator.draw(frame, dets, fps=fps_smoothed, lines=lines,
+                                       out_width=STREAM_WIDTH, regions=regions)
+            filter_store.record(annotate=(time.perf_counter() - t_draw) * 1000.0, detections=len(detections))
+            if trace is not None:
+                trace.mark("plot")
 
-            # optionally draw detection text on frame
-            y_offset = 60
             for det in detections:
-                text = f"{det['class']}: {det['confidence']:.1%}"
-                cv2.putText(frame, text, (20, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 170), 2)
-                y_offset += 25
-                if det['class'] == 'cup':
+                # save once per tracked cup, not on every frame it stays visible
+                if det['class'] == 'cup' and tracker.fire_once(det['track_id'], 'cup_saved'):
                     print("Cup detected with confidence:", det['confidence'])
-                    save_path = f"/app/detected_cup_{int(time.time())}.jpg"
-                    cv2.imwrite(save_path, frame)
+                    save_path = f"/app/detected_cup_{det['track_id']}_{int(time.time())}.jpg"
+                    saved = frame if OVERLAY != 'client' else annotator.draw(raw.copy(), dets, lines=lines)
+                    cv2.imwrite(save_path, saved)
                     print("Saved detected cup frame to:", save_path)
+                    if event_recorder is not None:
+                        event_recorder.trigger('cup', info={'track_id': det['track_id'],
+                                                           'confidence': det['confidence']})
 
             # throttle (keep low to avoid OOM)
             if FPS_LIMIT > 0:
@@ -118,52 +505,253 @@ def producer():
                 if wait > 0:
                     time.sleep(wait)
                 last_time = time.time()
+            if trace is not None:
+                trace.mark("throttle")
 
-            ret, buf = cv2.imencode('.jpg', frame)
+            ret, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, STREAM_QUALITY])
             if not ret:
                 continue
+            jpeg = buf.tobytes()
+            if trace is not None:
+                trace.mark("encode")
+            if event_recorder is not None:
+                event_recorder.add(time.time(), jpeg)
             with frame_lock:
-                latest_frame = buf.tobytes()
+                latest_frame = jpeg
+            if trace is not None:
+                trace.mark("enqueue")  # before publish: viewers read the stamps from here on
+            viewers.publish(jpeg, frame, seq=frame_seq, trace=trace)
+            tracer.finish(trace)
+            if live is not None:
+                live.push(frame)
     except Exception as e:
         print("Producer error:", e)
     finally:
         stop_event.set()
+        viewers.stop()
+        if detection_feed is not None:
+            detection_feed.stop()
+        if event_recorder is not None:
+            event_recorder.close()
 
-def mjpeg_generator():
-    """Yield the latest_frame repeatedly for a connected client."""
-    global latest_frame
-    boundary = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
-    try:
-        while not stop_event.is_set():
-            with frame_lock:
-                frame = latest_frame
-            if frame is None:
-                # no frame yet
-                time.sleep(0.05)
-                continue
-            yield boundary + frame + b'\r\n'
-            # small sleep to avoid busy loop; adjust to control client FPS
-            time.sleep(0.01)
-    except GeneratorExit:
-        # client disconnected; just return and keep producer running
-        return
+def mjpeg_generator(viewer_id):
+    """Stream each new frame once to an admitted client (drop-to-latest, adaptive fps/size)."""
+    return viewers.stream(viewer_id, base_fps=FPS_LIMIT if FPS_LIMIT > 0 else 30.0)
 
 @app.route('/')
 def index():
-    return render_template_string(INDEX_HTML)
+    return render_template_string(INDEX_HTML, mode=INFERENCE_MODE, overlay=OVERLAY, live=live is not None)
+
+@app.route('/rois', methods=['GET'])
+def get_rois():
+    return jsonify({"camera": str(CAMERA_SOURCE), "mode": INFERENCE_MODE, "rois": roi_store.get(CAMERA_SOURCE)})
+
+@app.route('/rois', methods=['POST'])
+def set_rois():
+    data = request.json or {}
+    try:
+        rois = roi_store.set(CAMERA_SOURCE, data.get('rois', []))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except OSError as e:
+        return jsonify({"error": f"ROIs not applied, cannot save {roi_store.path}: {e}"}), 500
+    return jsonify({"camera": str(CAMERA_SOURCE), "mode": INFERENCE_MODE, "rois": rois})
+
+@app.route('/filter', methods=['GET'])
+@requires_ready(warmup)
+def get_filter():
+    """Current filter spec and mean postprocess / annotate ms per frame since it was set."""
+    return jsonify({"filter": filter_store.get().to_dict(), "timing_ms": filter_store.timing()})
+
+@app.route('/filter', methods=['POST'])
+@requires_ready(warmup)
+def set_filter():
+    try:
+        spec = filter_store.set(request.json or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except OSError as e:
+        return jsonify({"error": f"filter not applied, cannot save {filter_store.path}: {e}"}), 500
+    return jsonify({"filter": spec.to_dict()})
+
+@app.route('/predict', methods=['POST'])
+@requires_ready(warmup)
+def predict():
+    """Detections for one uploaded image (multipart 'image', JPEG/PNG/.npy body, or raw bytes with ?shape=h,w,3)."""
+    upload = request.files.get('image')
+    data = upload.read() if upload else request.get_data()
+    if not data:
+        return jsonify({"error": "no image in request (multipart field 'image' or request body)"}), 400
+    try:
+        shape = request.args.get('shape')
+        img = decode_upload(data, request.content_type or "",
+                            tuple(int(v) for v in shape.split(',')) if shape else None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        detections, info = batcher(img)
+    except Overloaded as e:
+        return jsonify({"error": f"overloaded, retry later ({e})"}), 503
+    except concurrent.futures.TimeoutError:
+        return jsonify({"error": "inference timed out, retry later"}), 504
+    return jsonify({"width": img.shape[1], "height": img.shape[0], "detections": detections, **info})
+
+@app.route('/predict/stats')
+def predict_stats():
+    return jsonify(batcher.snapshot())
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(mjpeg_generator(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+    viewer_id = viewers.admit(request.environ)
+    if viewer_id is None:
+        return jsonify({"error": f"too many viewers ({MAX_VIEWERS}), retry later"}), 503
+    response = Response(mjpeg_generator(viewer_id), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # the generator's finally never runs if the body is not iterated (HEAD, early disconnect)
+    response.call_on_close(lambda: viewers.release(viewer_id))
+    return response
 
-if __name__ == '__main__':
-    # start background producer thread
-    prod_thread = threading.Thread(target=producer, daemon=True)
+@app.route('/events')
+@requires_ready(warmup)
+def events():
+    """SSE stream of per-frame detections, ?classes=cup,person&conf=0.5&fps=5&changes=1"""
+    try:
+        class_ids = detection_feed.class_ids(request.args.get('classes', ''))
+        min_conf = float(request.args.get('conf', '0'))
+        max_fps = float(request.args.get('fps', '0'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    sid = detection_feed.subscribe()
+    if sid is None:
+        return jsonify({"error": f"too many event clients ({MAX_EVENT_CLIENTS}), retry later"}), 503
+    stream = detection_feed.stream(sid, class_ids, min_conf, max_fps, request.args.get('changes') == '1')
+    response = Response(stream, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(lambda: detection_feed.release(sid))
+    return response
+
+def _snapshot_wait():
+    """(after, timeout) of a long-poll request: ?after=<seq>[&timeout=s], or (None, 0)."""
+    after = request.args.get('after')
+    if after is None:
+        return None, 0.0
+    return int(after), min(float(request.args.get('timeout', SNAPSHOT_MAX_WAIT)), SNAPSHOT_MAX_WAIT)
+
+def _not_modified(seq):
+    return seq is not None and request.if_none_match.contains(str(seq))
+
+@app.route('/snapshot.jpg')
+def snapshot_jpg():
+    """Latest streamed JPEG from memory. ETag = frame seq (304 if unchanged), ?after=<seq> long-polls."""
+    try:
+        after, timeout = _snapshot_wait()
+    except ValueError:
+        return jsonify({"error": "after and timeout must be numbers"}), 400
+    seq, jpeg = viewers.latest(after, timeout)
+    if jpeg is None:
+        return jsonify({"error": "no frame yet"}), 503
+    headers = {'ETag': f'"{seq}"', 'X-Frame-Seq': str(seq), 'Cache-Control': 'no-cache'}
+    if (after is not None and seq <= after) or _not_modified(seq):
+        return Response(status=304, headers=headers)
+    return Response(jpeg, mimetype='image/jpeg', headers=headers)
+
+@app.route('/snapshot.json')
+@requires_ready(warmup)
+def snapshot_json():
+    """Latest detections without any image encode, same ETag / ?after= semantics, ?classes=&conf= filters."""
+    try:
+        after, timeout = _snapshot_wait()
+        class_ids = detection_feed.class_ids(request.args.get('classes', ''))
+        min_conf = float(request.args.get('conf', '0'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    record = detection_feed.latest(after, timeout)
+    if record is None:
+        return jsonify({"error": "no frame yet"}), 503
+    seq = record["seq"]
+    headers = {'ETag': f'"{seq}"', 'X-Frame-Seq': str(seq), 'Cache-Control': 'no-cache'}
+    if (after is not None and seq <= after) or _not_modified(seq):
+        return Response(status=304, headers=headers)
+    record = detection_feed.select(record, class_ids, min_conf)
+    record["names"] = {int(k): detection_feed.names[k] for k in {r[0] for r in record["d"]}}
+    return jsonify(record), 200, headers
+
+@app.route('/live')
+def live_page():
+    return render_template_string(LIVE_HTML)
+
+def stream_with_init(init, stream):
+    """Re-attach the already fetched init segment (closing the response closes `stream`)."""
+    yield init
+    yield from stream
+
+@app.route('/live.mp4')
+def live_mp4():
+    """H.264 in fragmented MP4: init segment, then one fragment per frame from the newest keyframe."""
+    if live is None:
+        return jsonify({"error": "live stream disabled, start with LIVE_STREAM=1"}), 404
+    try:
+        if not live.connect():
+            return jsonify({"error": f"too many live clients ({MAX_LIVE_CLIENTS}), retry later"}), 503
+    except RuntimeError as e:
+        return jsonify({"error": f"live stream unavailable: {e}"}), 503
+    stream = live.stream()
+    init = next(stream)
+    return Response(stream_with_init(init, stream), mimetype='video/mp4',
+                    headers={'Cache-Control': 'no-cache', 'X-Codec': codec_string(init)})
+
+@app.route('/live/stats')
+def live_stats():
+    if live is None:
+        return jsonify({"error": "live stream disabled, start with LIVE_STREAM=1"}), 404
+    stats = live.stats()
+    # what the same frames cost as MJPEG at the current producer rate
+    _, jpeg = viewers.latest()
+    stats["mjpeg_kbit_s"] = round(len(jpeg) * 8 * fps_smoothed / 1000.0, 1) if jpeg else None
+    return jsonify(stats)
+
+@app.route('/admission')
+@requires_ready(warmup)
+def admission_stats():
+    stats = viewers.snapshot()
+    stats["predict_queued"] = batcher.snapshot()["queued"]
+    stats["events"] = detection_feed.snapshot()
+    if event_recorder is not None:
+        stats["event_buffer_dropped"] = event_recorder.dropped
+        stats["event_write_dropped"] = event_recorder.write_dropped
+    return jsonify(stats)
+
+@app.route('/trace')
+def trace_stats():
+    """Latency histograms per span (ms), capture_to_write = how old a frame is when a viewer gets it."""
+    stats = tracer.snapshot()
+    if request.args.get('reset') == '1':
+        tracer.reset()
+    return jsonify(stats)
+
+@app.route('/trace/chrome.json')
+def trace_chrome():
+    """Sampled frames as a Chrome trace (TRACE_SAMPLE=N), open in chrome://tracing or ui.perfetto.dev."""
+    if not tracer.sample_every:
+        return jsonify({"error": "no frames sampled, start with TRACE_SAMPLE=<every nth frame>"}), 404
+    return jsonify(tracer.chrome_trace()), 200, {'Content-Disposition': 'attachment; filename=frame_trace.json'}
+
+prod_thread = None
+
+def start_producer():
+    """Start the background producer thread (called by the warm-up thread once the model is ready)."""
+    global prod_thread
+    prod_thread = threading.Thread(target=producer, name="producer", daemon=True)
     prod_thread.start()
+
+if __name__ == '__main__':
+    warmup.start([("import ultralytics", import_ultralytics), ("load model", load_model),
+                  ("warm up predictor", warm_predictor)], on_ready=start_producer)
     try:
-        app.run(host='0.0.0.0', port=5001, threaded=True)
+        app.run(host='0.0.0.0', port=PORT, threaded=True)
     finally:
         # on shutdown signal, request producer stop and wait
         stop_event.set()
-        prod_thread.join(timeout=2.0)
\ No newline at end of file
+        if prod_thread is not None:
+            prod_thread.join(timeout=2.0)
+        if tracer.dump():
+            print("Frame trace written to", TRACE_FILE)